@@ -0,0 +1,305 @@
+"""
+ActivityLog writing and querying.
+
+Request handlers hand activity entries to ``activity_sink`` instead of
+committing an ActivityLog row themselves. A background thread drains the
+bounded queue and bulk-inserts entries in batches, updating the daily
+rollups in the same transaction, and flushes when a batch is full or when
+the flush interval elapses. When the queue is full, new entries are
+dropped and counted rather than blocking the request.
+
+The query helpers below back the admin log views: a username-joined
+projection, keyset cursors over (created_at, id) and cached counts, so
+paging through millions of rows never needs COUNT(*) or per-row lookups.
+"""
+
+import atexit
+import base64
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import ActivityLog, User, db
+from admin.rollups import count_entries, upsert_rollups
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_QUEUE_SIZE = 10000
+
+ACTIONS_CACHE_SECONDS = 60
+COUNT_CACHE_SECONDS = 60
+
+_STOP = object()
+
+
+class ActivityLogSink:
+    """Queues activity entries in memory and writes them in batches"""
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.enabled = True
+        self.app = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('ACTIVITY_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.flush_interval = app.config.get('ACTIVITY_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        self.queue_size = app.config.get('ACTIVITY_LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        self.enabled = app.config.get('ACTIVITY_LOG_ASYNC', True)
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        atexit.register(self.shutdown)
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """Queue one entry; returns False if it had to be dropped"""
+        entry.setdefault('created_at', datetime.utcnow())
+        if not self.enabled or self.app is None:
+            self._write_now([entry])
+            return True
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Activity log queue full, {self.dropped} entries dropped so far")
+            return False
+
+    def submit_many(self, entries: List[Dict[str, Any]]) -> int:
+        """Queue several entries; returns how many were accepted
+        
+        With the writer thread disabled they are written in a single
+        transaction rather than one commit per entry.
+        """
+        created_at = datetime.utcnow()
+        for entry in entries:
+            entry.setdefault('created_at', created_at)
+        if not self.enabled or self.app is None:
+            self._write_now(entries)
+            return len(entries)
+        return sum(self.submit(entry) for entry in entries)
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything queued so far has been written"""
+        if self._thread is None or not self._thread.is_alive():
+            self._drain_synchronously()
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def shutdown(self, timeout: float = 10.0):
+        """Flush pending entries and stop the writer thread"""
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        self._thread = None
+        self._drain_synchronously()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed
+        }
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so pre-forking servers start one per worker
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                item = None
+
+            stop = item is _STOP
+            if item is not None and not stop:
+                batch.append(item)
+
+            if batch and (stop or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write_batch(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+            if stop:
+                self._queue.task_done()
+                return
+
+    def _drain_synchronously(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+            self._queue.task_done()
+        for start in range(0, len(batch), self.batch_size):
+            self._write_batch(batch[start:start + self.batch_size])
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        if self.app is None:
+            return
+        try:
+            with self.app.app_context():
+                db.session.execute(db.insert(ActivityLog), batch)
+                upsert_rollups(count_entries(batch))
+                db.session.commit()
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Error writing {len(batch)} activity log entries: {str(e)}")
+
+    def _write_now(self, entries: List[Dict[str, Any]]):
+        if not entries:
+            return
+        try:
+            db.session.add_all([ActivityLog(**entry) for entry in entries])
+            upsert_rollups(count_entries(entries))
+            db.session.commit()
+            self.written += len(entries)
+        except Exception as e:
+            db.session.rollback()
+            self.failed += len(entries)
+            logger.error(f"Error logging activity: {str(e)}")
+
+
+activity_sink = ActivityLogSink()
+
+
+# Small in-process TTL cache for values that are expensive to compute but
+# fine to serve slightly stale (distinct actions, approximate totals)
+_cached_values = {}
+_cached_lock = threading.Lock()
+
+
+def _cached(key: str, ttl: float, compute):
+    now = time.monotonic()
+    with _cached_lock:
+        entry = _cached_values.get(key)
+        if entry and entry[1] > now:
+            return entry[0]
+    value = compute()
+    with _cached_lock:
+        if len(_cached_values) >= 1024:
+            _cached_values.clear()
+        _cached_values[key] = (value, now + ttl)
+    return value
+
+
+def matching_actions(fragment: str) -> List[str]:
+    """Resolve a substring filter to the exact action names it matches
+    
+    There are only a few dozen distinct actions, so filtering on
+    ``action IN (...)`` lets the (action, created_at, id) index serve the
+    query where ``LIKE '%x%'`` would scan the table.
+    """
+    actions = _cached('activity_actions', ACTIONS_CACHE_SECONDS, lambda: [
+        row.action for row in db.session.query(ActivityLog.action).distinct()
+    ])
+    fragment = fragment.lower()
+    return [action for action in actions if fragment in action.lower()]
+
+
+def activity_log_query(user_id: Optional[int] = None, action: str = ''):
+    """Projection of activity logs with the author's username joined in"""
+    query = db.session.query(
+        ActivityLog.id,
+        ActivityLog.user_id,
+        User.username,
+        ActivityLog.action,
+        ActivityLog.details,
+        ActivityLog.ip_address,
+        ActivityLog.user_agent,
+        ActivityLog.created_at
+    ).outerjoin(User, User.id == ActivityLog.user_id)
+
+    if user_id:
+        query = query.filter(ActivityLog.user_id == user_id)
+
+    if action:
+        actions = matching_actions(action)
+        if actions:
+            query = query.filter(ActivityLog.action.in_(actions))
+        else:
+            # Possibly an action newer than the cached list
+            query = query.filter(ActivityLog.action.like(f'%{action}%'))
+
+    return query
+
+
+def serialize_log_row(row) -> Dict[str, Any]:
+    return {
+        'id': row.id,
+        'user_id': row.user_id,
+        'username': row.username or 'Unknown',
+        'action': row.action,
+        'details': row.details,
+        'ip_address': row.ip_address,
+        'user_agent': row.user_agent,
+        'created_at': row.created_at.isoformat()
+    }
+
+
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{log_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, log_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def apply_cursor(query, cursor: Tuple[datetime, int]):
+    """Restrict a newest-first query to rows strictly after the cursor"""
+    created_at, log_id = cursor
+    return query.filter(db.or_(
+        ActivityLog.created_at < created_at,
+        db.and_(ActivityLog.created_at == created_at, ActivityLog.id < log_id)
+    ))
+
+
+def approximate_log_count(user_id: Optional[int] = None, action: str = '') -> int:
+    """Row count for a filter, cached for COUNT_CACHE_SECONDS"""
+    key = f"activity_count:{user_id or ''}:{action}"
+    return _cached(key, COUNT_CACHE_SECONDS, lambda: activity_log_query(user_id, action).order_by(None).count())
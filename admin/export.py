@@ -0,0 +1,114 @@
+"""
+Streaming exports of activity logs and members.
+
+Rows are read through server-side cursors in ``EXPORT_CHUNK_SIZE`` batches
+and encoded one at a time, so memory stays flat whatever the table size.
+The same generators back the admin export endpoints and
+``manage.py export-data``.
+"""
+
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from models import ActivityLog, User, db
+from admin.activity import activity_log_query
+
+EXPORT_CHUNK_SIZE = 1000
+
+ACTIVITY_LOG_COLUMNS = [
+    'id', 'user_id', 'username', 'action', 'details', 'ip_address', 'user_agent', 'created_at'
+]
+
+# Never export OAuth tokens or password hashes
+USER_COLUMNS = [
+    'id', 'username', 'email', 'discord_id', 'discord_username', 'role',
+    'character_name', 'character_class', 'equipment_score', 'family_name',
+    'is_validated', 'is_active', 'last_login', 'created_at', 'updated_at'
+]
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def apply_user_filters(query, search: str = '', role: str = ''):
+    """Filters shared by the admin user list and the user export"""
+    if search:
+        query = query.filter(
+            User.username.like(f'%{search}%') |
+            User.email.like(f'%{search}%') |
+            User.discord_username.like(f'%{search}%')
+        )
+
+    if role:
+        query = query.filter(User.role == role)
+
+    return query
+
+
+def _stream(query) -> Iterator[Any]:
+    return query.execution_options(stream_results=True).yield_per(EXPORT_CHUNK_SIZE)
+
+
+def iter_activity_logs(user_id: Optional[int] = None, action: str = '') -> Iterator[Dict[str, Any]]:
+    query = activity_log_query(user_id, action).order_by(ActivityLog.id)
+    for row in _stream(query):
+        yield dict(row._mapping)
+
+
+def iter_users(search: str = '', role: str = '') -> Iterator[Dict[str, Any]]:
+    query = db.session.query(*[getattr(User, column) for column in USER_COLUMNS])
+    query = apply_user_filters(query, search, role).order_by(User.id)
+    for row in _stream(query):
+        yield dict(row._mapping)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, default=_json_default, ensure_ascii=False) + '\n'
+
+
+def encode_csv(rows: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow([
+            json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list))
+            else value.isoformat() if isinstance(value, (datetime, date))
+            else value
+            for value in (row.get(column) for column in columns)
+        ])
+        # Emit in chunks rather than one tiny write per row
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def encode(rows: Iterable[Dict[str, Any]], columns: List[str], fmt: str) -> Iterator[str]:
+    if fmt == 'csv':
+        return encode_csv(rows, columns)
+    return encode_ndjson(rows)
+
+
+def write_export(chunks: Iterable[str], path: str):
+    """Write encoded chunks to ``path``, gzipped when it ends in .gz"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8', newline='') as output:
+        for chunk in chunks:
+            output.write(chunk)
@@ -0,0 +1,187 @@
+"""
+Daily ActivityLog rollups and raw-log retention.
+
+Every batch written by the activity sink also bumps per-(day, action, user)
+counters in ``activity_daily_rollups`` inside the same transaction, so
+statistics read a few hundred small rows instead of range-scanning the raw
+log. Raw rows older than the retention window can then be archived and
+deleted in short chunks without losing the aggregates.
+"""
+
+import gzip
+import json
+import logging
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import func
+from models import ActivityDailyRollup, ActivityLog, db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 180
+DEFAULT_PRUNE_CHUNK_SIZE = 5000
+
+
+def count_entries(entries: Iterable[Dict[str, Any]]) -> Counter:
+    """Aggregate activity entries into (day, action, user_id) counts"""
+    return Counter(
+        (entry['created_at'].date(), entry['action'], entry['user_id'])
+        for entry in entries
+    )
+
+
+def upsert_rollups(counts: Counter):
+    """Add counts to the rollup table in the current transaction"""
+    if not counts:
+        return
+
+    rows = [
+        {'day': day, 'action': action, 'user_id': user_id, 'count': count, 'updated_at': datetime.utcnow()}
+        for (day, action, user_id), count in counts.items()
+    ]
+    table = ActivityDailyRollup.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            count=table.c.count + stmt.inserted['count'],
+            updated_at=stmt.inserted['updated_at']
+        )
+        db.session.execute(stmt)
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['day', 'action', 'user_id'],
+            set_={'count': table.c.count + stmt.excluded['count'], 'updated_at': stmt.excluded['updated_at']}
+        )
+        db.session.execute(stmt)
+    else:
+        for row in rows:
+            updated = db.session.query(ActivityDailyRollup).filter_by(
+                day=row['day'], action=row['action'], user_id=row['user_id']
+            ).update({ActivityDailyRollup.count: ActivityDailyRollup.count + row['count']})
+            if not updated:
+                db.session.add(ActivityDailyRollup(**row))
+
+
+def activity_totals(days: int = 30) -> Dict[str, Any]:
+    """Activity counts over the last ``days`` days, read from the rollups"""
+    since = datetime.utcnow().date() - timedelta(days=days)
+    by_action = db.session.query(
+        ActivityDailyRollup.action, func.sum(ActivityDailyRollup.count)
+    ).filter(ActivityDailyRollup.day >= since).group_by(ActivityDailyRollup.action).all()
+
+    by_action = {action: int(total) for action, total in by_action}
+    return {
+        'total': sum(by_action.values()),
+        'by_action': by_action
+    }
+
+
+def rebuild_rollups(since: Optional[date] = None, chunk_size: int = 1000) -> int:
+    """Recompute rollups from the raw log (for backfills or repairs)
+
+    Only days still covered by raw logs can be recomputed: ``since``
+    defaults to the oldest raw log day and an earlier date is refused, so a
+    rebuild never wipes rollups that outlived their pruned raw rows.
+    """
+    oldest = db.session.query(func.min(ActivityLog.created_at)).scalar()
+    if oldest is None:
+        return 0
+    if since is None:
+        since = oldest.date()
+    elif since < oldest.date():
+        raise ValueError(f"Raw activity logs start on {oldest.date().isoformat()}; "
+                         f"rollups before that day cannot be rebuilt")
+
+    db.session.query(ActivityDailyRollup).filter(ActivityDailyRollup.day >= since).delete(synchronize_session=False)
+
+    day = func.date(ActivityLog.created_at)
+    query = db.session.query(
+        day, ActivityLog.action, ActivityLog.user_id, func.count(ActivityLog.id)
+    ).filter(
+        ActivityLog.created_at >= datetime.combine(since, datetime.min.time())
+    ).group_by(day, ActivityLog.action, ActivityLog.user_id)
+
+    rows = 0
+    counts = Counter()
+    # Grouped rows are small (days x actions x users), so fetch them up front
+    # rather than streaming while upserting on the same connection
+    for row_day, action, user_id, count in query.all():
+        if isinstance(row_day, str):
+            row_day = date.fromisoformat(row_day)
+        counts[(row_day, action, user_id)] = count
+        if len(counts) >= chunk_size:
+            upsert_rollups(counts)
+            rows += len(counts)
+            counts = Counter()
+    upsert_rollups(counts)
+    rows += len(counts)
+    db.session.commit()
+    return rows
+
+
+def prune_activity_logs(retention_days: int = DEFAULT_RETENTION_DAYS,
+                        archive_path: Optional[str] = None,
+                        chunk_size: int = DEFAULT_PRUNE_CHUNK_SIZE,
+                        pause: float = 0.05) -> int:
+    """Delete raw activity logs older than the retention window
+
+    Rows are removed oldest-first in chunks of ``chunk_size`` primary keys,
+    each in its own short transaction, so the table is never locked for long.
+    When ``archive_path`` is given, rows are appended to it as gzipped NDJSON
+    before being deleted. The cutoff is rounded down to midnight so the raw
+    log always holds whole days, which ``rebuild_rollups`` relies on.
+    """
+    cutoff = datetime.combine((datetime.utcnow() - timedelta(days=retention_days)).date(), datetime.min.time())
+    archive = gzip.open(archive_path, 'at', encoding='utf-8') if archive_path else None
+    deleted = 0
+    last_id = 0
+
+    try:
+        while True:
+            query = db.session.query(ActivityLog if archive else ActivityLog.id).filter(
+                ActivityLog.created_at < cutoff,
+                ActivityLog.id > last_id
+            )
+            rows = query.order_by(ActivityLog.id).limit(chunk_size).all()
+            if not rows:
+                break
+
+            ids = [row.id for row in rows]
+            if archive:
+                for row in rows:
+                    archive.write(json.dumps({
+                        'id': row.id,
+                        'user_id': row.user_id,
+                        'action': row.action,
+                        'details': row.details,
+                        'ip_address': row.ip_address,
+                        'user_agent': row.user_agent,
+                        'created_at': row.created_at.isoformat()
+                    }) + '\n')
+                archive.flush()
+
+            db.session.query(ActivityLog).filter(ActivityLog.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            db.session.expunge_all()
+
+            deleted += len(ids)
+            last_id = ids[-1]
+            logger.info(f"Pruned {deleted} activity log rows so far")
+            if pause:
+                time.sleep(pause)
+    finally:
+        if archive:
+            archive.close()
+
+    return deleted
@@ -1,98 +1,67 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from models import User, ActivityLog, GuildEvent, ForumPost, WikiArticle, db
+from auth.principals import invalidate_principal
+from auth.permissions import is_valid_role, is_super_admin
+from utils import token_required, admin_required, super_admin_required, log_activity
+from admin.activity import (
+    activity_log_query, serialize_log_row, encode_cursor, decode_cursor,
+    apply_cursor, approximate_log_count
+)
+from admin.rollups import activity_totals
+from members.search import member_index
+from admin.export import (
+    ACTIVITY_LOG_COLUMNS, USER_COLUMNS, CONTENT_TYPES, apply_user_filters,
+    iter_activity_logs, iter_users, encode
+)
 from datetime import datetime, timedelta
 import logging
-import jwt
-import os
-from functools import wraps
 import cloudinary.uploader
 from werkzeug.utils import secure_filename
 
 admin_bp = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
-        
-        try:
-            if token.startswith('Bearer '):
-                token = token.split(' ')[1]
-            
-            data = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
-            current_user_id = data['user_id']
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user:
-                return jsonify({'message': 'User not found'}), 401
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Token is invalid'}), 401
-            
-        return f(current_user, *args, **kwargs)
-    return decorated
-
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(current_user, *args, **kwargs):
-        admin_roles = ['SuperAdmin', 'Maître', 'Conseiller']
-        if current_user.role not in admin_roles:
-            return jsonify({'message': 'Admin access required'}), 403
-        return f(current_user, *args, **kwargs)
-    return decorated_function
-
-def super_admin_required(f):
-    @wraps(f)
-    def decorated_function(current_user, *args, **kwargs):
-        if current_user.role != 'SuperAdmin':
-            return jsonify({'message': 'SuperAdmin access required'}), 403
-        return f(current_user, *args, **kwargs)
-    return decorated_function
-
 @admin_bp.route('/users', methods=['GET'])
 @token_required
 @admin_required
 def get_all_users(current_user):
-    """Get all users with admin privileges"""
+    """Get all users with admin privileges
+    
+    Searches (and class filters) are answered by the in-process member
+    index and ranked by match quality; plain listings stay newest first.
+    """
     try:
-        page = request.args.get('page', 1, type=int)
+        page = max(request.args.get('page', 1, type=int), 1)
         per_page = request.args.get('per_page', 20, type=int)
         search = request.args.get('search', '')
         role_filter = request.args.get('role', '')
+        class_filter = request.args.get('class', '')
         
-        query = User.query
-        
-        if search:
-            query = query.filter(
-                User.username.like(f'%{search}%') |
-                User.email.like(f'%{search}%') |
-                User.discord_username.like(f'%{search}%')
+        if search or class_filter:
+            total, page_ids = member_index.search(
+                search, role=role_filter or None, character_class=class_filter or None,
+                offset=(page - 1) * per_page, limit=per_page
             )
-        
-        if role_filter:
-            query = query.filter_by(role=role_filter)
-        
-        users = query.order_by(User.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+            users_by_id = {user.id: user for user in User.query.filter(User.id.in_(page_ids))} if page_ids else {}
+            items = [users_by_id[user_id] for user_id in page_ids if user_id in users_by_id]
+        else:
+            users = apply_user_filters(User.query, role=role_filter).order_by(User.created_at.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            items, total = users.items, users.total
         
         users_data = []
-        for user in users.items:
+        for user in items:
             user_data = user.to_dict()
             user_data['last_login'] = user.last_login.isoformat() if user.last_login else None
             users_data.append(user_data)
         
         return jsonify({
             'users': users_data,
-            'total': users.total,
-            'pages': users.pages,
-            'current_page': users.page,
-            'per_page': users.per_page
+            'total': total,
+            'pages': (total + per_page - 1) // per_page if per_page > 0 else 0,
+            'current_page': page,
+            'per_page': per_page
         })
         
     except Exception as e:
@@ -117,21 +86,14 @@ def validate_user(current_user, user_id):
             user.role = 'Membre'  # Auto-promote validated recruits to members
         
         db.session.commit()
+        invalidate_principal(user.id)
         
         # Log the validation activity
-        activity_log = ActivityLog(
-            user_id=current_user.id,
-            action='validate_user',
-            details={
-                'target_user_id': user_id,
-                'validated': is_validated,
-                'username': user.username
-            },
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-        db.session.add(activity_log)
-        db.session.commit()
+        log_activity(current_user.id, 'validate_user', {
+            'target_user_id': user_id,
+            'validated': is_validated,
+            'username': user.username
+        })
         
         return jsonify({
             'message': f'User {"validated" if is_validated else "invalidated"} successfully',
@@ -156,12 +118,11 @@ def update_user_role(current_user, user_id):
         if not new_role:
             return jsonify({'message': 'Role is required'}), 400
         
-        valid_roles = ['Invité', 'Recrue', 'Membre', 'Quartier-Maître', 'Officier', 'Conseiller', 'Maître', 'SuperAdmin']
-        if new_role not in valid_roles:
+        if not is_valid_role(new_role):
             return jsonify({'message': 'Invalid role'}), 400
         
         # Prevent demoting yourself
-        if user.id == current_user.id and new_role != 'SuperAdmin':
+        if user.id == current_user.id and not is_super_admin(new_role):
             return jsonify({'message': 'Cannot demote yourself'}), 400
         
         old_role = user.role
@@ -169,22 +130,15 @@ def update_user_role(current_user, user_id):
         user.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_principal(user.id)
         
         # Log the role change activity
-        activity_log = ActivityLog(
-            user_id=current_user.id,
-            action='change_user_role',
-            details={
-                'target_user_id': user_id,
-                'old_role': old_role,
-                'new_role': new_role,
-                'username': user.username
-            },
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-        db.session.add(activity_log)
-        db.session.commit()
+        log_activity(current_user.id, 'change_user_role', {
+            'target_user_id': user_id,
+            'old_role': old_role,
+            'new_role': new_role,
+            'username': user.username
+        })
         
         return jsonify({
             'message': f'User role updated from {old_role} to {new_role}',
@@ -231,19 +185,11 @@ def upload_user_avatar(current_user, user_id):
             db.session.commit()
             
             # Log the avatar upload activity
-            activity_log = ActivityLog(
-                user_id=current_user.id,
-                action='upload_user_avatar',
-                details={
-                    'target_user_id': user_id,
-                    'image_url': user.profile_image,
-                    'username': user.username
-                },
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get('User-Agent')
-            )
-            db.session.add(activity_log)
-            db.session.commit()
+            log_activity(current_user.id, 'upload_user_avatar', {
+                'target_user_id': user_id,
+                'image_url': user.profile_image,
+                'username': user.username
+            })
             
             return jsonify({
                 'message': 'Avatar uploaded successfully',
@@ -263,50 +209,110 @@ def upload_user_avatar(current_user, user_id):
 @token_required
 @admin_required
 def get_activity_logs(current_user):
-    """Get activity logs"""
+    """Get activity logs
+    
+    Pass ``cursor`` (the ``next_cursor`` of the previous response) for keyset
+    pagination; ``page`` is still accepted. Totals are cached approximations,
+    and are only computed in cursor mode when ``include_total`` is set.
+    """
     try:
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
         user_id = request.args.get('user_id', type=int)
         action = request.args.get('action', '')
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'false').lower() in ['true', '1', 'yes']
         
-        query = ActivityLog.query
+        query = activity_log_query(user_id, action).order_by(
+            ActivityLog.created_at.desc(), ActivityLog.id.desc()
+        )
         
-        if user_id:
-            query = query.filter_by(user_id=user_id)
+        if cursor:
+            position = decode_cursor(cursor)
+            if position is None:
+                return jsonify({'message': 'Invalid cursor'}), 400
+            query = apply_cursor(query, position)
+        else:
+            query = query.offset((max(page, 1) - 1) * per_page)
+        
+        # Fetch one extra row to know whether another page exists
+        rows = query.limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        
+        response = {
+            'logs': [serialize_log_row(row) for row in rows],
+            'per_page': per_page,
+            'has_next': has_next,
+            'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].id) if has_next else None
+        }
+        
+        if not cursor or include_total:
+            total = approximate_log_count(user_id, action)
+            response['total'] = total
+            response['pages'] = (total + per_page - 1) // per_page
+        if not cursor:
+            response['current_page'] = page
+        
+        return jsonify(response)
         
-        if action:
-            query = query.filter(ActivityLog.action.like(f'%{action}%'))
+    except Exception as e:
+        logger.error(f"Error fetching activity logs: {str(e)}")
+        return jsonify({'message': 'Error fetching activity logs'}), 500
+
+def _export_response(rows, columns, name):
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in CONTENT_TYPES:
+        return jsonify({'message': 'Format must be ndjson or csv'}), 400
+    
+    filename = f"{name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return Response(
+        stream_with_context(encode(rows, columns, fmt)),
+        mimetype=CONTENT_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@admin_bp.route('/export/activity-logs', methods=['GET'])
+@token_required
+@admin_required
+def export_activity_logs(current_user):
+    """Stream all activity logs matching the activity-logs filters"""
+    try:
+        user_id = request.args.get('user_id', type=int)
+        action = request.args.get('action', '')
         
-        logs = query.order_by(ActivityLog.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        log_activity(current_user.id, 'export_activity_logs', {
+            'user_id': user_id,
+            'action': action,
+            'format': request.args.get('format', 'ndjson')
+        })
         
-        logs_data = []
-        for log in logs.items:
-            log_data = {
-                'id': log.id,
-                'user_id': log.user_id,
-                'username': log.user.username if log.user else 'Unknown',
-                'action': log.action,
-                'details': log.details,
-                'ip_address': log.ip_address,
-                'user_agent': log.user_agent,
-                'created_at': log.created_at.isoformat()
-            }
-            logs_data.append(log_data)
+        return _export_response(iter_activity_logs(user_id, action), ACTIVITY_LOG_COLUMNS, 'activity_logs')
         
-        return jsonify({
-            'logs': logs_data,
-            'total': logs.total,
-            'pages': logs.pages,
-            'current_page': logs.page,
-            'per_page': logs.per_page
+    except Exception as e:
+        logger.error(f"Error exporting activity logs: {str(e)}")
+        return jsonify({'message': 'Error exporting activity logs'}), 500
+
+@admin_bp.route('/export/users', methods=['GET'])
+@token_required
+@admin_required
+def export_users(current_user):
+    """Stream all users matching the user list filters"""
+    try:
+        search = request.args.get('search', '')
+        role_filter = request.args.get('role', '')
+        
+        log_activity(current_user.id, 'export_users', {
+            'search': search,
+            'role': role_filter,
+            'format': request.args.get('format', 'ndjson')
         })
         
+        return _export_response(iter_users(search, role_filter), USER_COLUMNS, 'users')
+        
     except Exception as e:
-        logger.error(f"Error fetching activity logs: {str(e)}")
-        return jsonify({'message': 'Error fetching activity logs'}), 500
+        logger.error(f"Error exporting users: {str(e)}")
+        return jsonify({'message': 'Error exporting users'}), 500
 
 @admin_bp.route('/statistics', methods=['GET'])
 @token_required
@@ -340,10 +346,8 @@ def get_guild_statistics(current_user):
         # Wiki statistics
         total_wiki_articles = WikiArticle.query.filter_by(is_published=True).count()
         
-        # Activity statistics
-        recent_activities = ActivityLog.query.filter(
-            ActivityLog.created_at >= datetime.utcnow() - timedelta(days=30)
-        ).count()
+        # Activity statistics (from the daily rollups, not the raw log)
+        recent_activity = activity_totals(days=30)
         
         return jsonify({
             'users': {
@@ -364,7 +368,8 @@ def get_guild_statistics(current_user):
                 'total_articles': total_wiki_articles
             },
             'activity': {
-                'recent_activities': recent_activities
+                'recent_activities': recent_activity['total'],
+                'by_action': recent_activity['by_action']
             }
         })
         
@@ -389,20 +394,13 @@ def delete_user(current_user, user_id):
         user.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_principal(user.id)
         
         # Log the deletion activity
-        activity_log = ActivityLog(
-            user_id=current_user.id,
-            action='delete_user',
-            details={
-                'target_user_id': user_id,
-                'username': user.username
-            },
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-        db.session.add(activity_log)
-        db.session.commit()
+        log_activity(current_user.id, 'delete_user', {
+            'target_user_id': user_id,
+            'username': user.username
+        })
         
         return jsonify({'message': 'User deleted successfully'})
         
@@ -1,5 +1,4 @@
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_socketio import SocketIO, emit, join_room, leave_room
@@ -30,9 +29,49 @@ app.config['DISCORD_GUILD_ID'] = os.getenv('DISCORD_GUILD_ID')
 app.config['CLOUDINARY_CLOUD_NAME'] = os.getenv('CLOUDINARY_CLOUD_NAME')
 app.config['CLOUDINARY_API_KEY'] = os.getenv('CLOUDINARY_API_KEY')
 app.config['CLOUDINARY_API_SECRET'] = os.getenv('CLOUDINARY_API_SECRET')
+app.config['PRINCIPAL_CACHE_SIZE'] = int(os.getenv('PRINCIPAL_CACHE_SIZE', 2048))
+app.config['PRINCIPAL_CACHE_TTL'] = int(os.getenv('PRINCIPAL_CACHE_TTL', 60))
+app.config['PRINCIPAL_CACHE_CHECK_SECONDS'] = float(os.getenv('PRINCIPAL_CACHE_CHECK_SECONDS', 5))
+app.config['PERMISSION_REFRESH_SECONDS'] = int(os.getenv('PERMISSION_REFRESH_SECONDS', 300))
+app.config['ACTIVITY_LOG_BATCH_SIZE'] = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', 200))
+app.config['ACTIVITY_LOG_FLUSH_INTERVAL'] = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', 2.0))
+app.config['ACTIVITY_LOG_QUEUE_SIZE'] = int(os.getenv('ACTIVITY_LOG_QUEUE_SIZE', 10000))
+app.config['MEMBER_SEARCH_REBUILD_SECONDS'] = int(os.getenv('MEMBER_SEARCH_REBUILD_SECONDS', 600))
+app.config['LEADERBOARD_REBUILD_SECONDS'] = int(os.getenv('LEADERBOARD_REBUILD_SECONDS', 600))
+app.config['EVENT_TIMEZONE'] = os.getenv('EVENT_TIMEZONE', 'Europe/Paris')
+app.config['ICS_VERSION_CHECK_SECONDS'] = int(os.getenv('ICS_VERSION_CHECK_SECONDS', 30))
+app.config['ICS_PAST_DAYS'] = int(os.getenv('ICS_PAST_DAYS', 30))
+app.config['ICS_FUTURE_DAYS'] = int(os.getenv('ICS_FUTURE_DAYS', 180))
+app.config['GUILD_REGION'] = os.getenv('GUILD_REGION', 'EU')
+app.config['BOSS_TIMEZONE'] = os.getenv('BOSS_TIMEZONE')
+app.config['BOSS_TIMERS_WINDOW'] = int(os.getenv('BOSS_TIMERS_WINDOW', 10))
+app.config['BOSS_ALERT_MINUTES'] = int(os.getenv('BOSS_ALERT_MINUTES', 5))
+app.config['FORUM_VIEW_FLUSH_SECONDS'] = float(os.getenv('FORUM_VIEW_FLUSH_SECONDS', 5.0))
+app.config['FORUM_VIEW_DEDUPE_SECONDS'] = int(os.getenv('FORUM_VIEW_DEDUPE_SECONDS', 1800))
+app.config['SEARCH_DOC_COUNT_FLUSH_SECONDS'] = float(os.getenv('SEARCH_DOC_COUNT_FLUSH_SECONDS', 5.0))
+app.config['WIKI_SNAPSHOT_INTERVAL'] = int(os.getenv('WIKI_SNAPSHOT_INTERVAL', 20))
+app.config['WIKI_RENDER_CACHE_SIZE'] = int(os.getenv('WIKI_RENDER_CACHE_SIZE', 512))
+app.config['WIKI_RENDER_CACHE_TTL'] = int(os.getenv('WIKI_RENDER_CACHE_TTL', 7 * 24 * 3600))
+
+# Import models
+from models import db, User, GuildEvent, WikiArticle, ForumPost, ForumReply, Message, GuildRole, ActivityLog
+from auth.principals import configure_principal_cache, invalidate_principal
+from auth.permissions import configure_permissions
+from admin.activity import activity_sink
+from forum.search import doc_count_buffer
+from forum.views import view_counter
+from wiki.render import render_cache
+from utils import token_required, has_permission, log_activities
+from members.search import configure_member_search
+from events.ics import configure_ics_feeds
+from bosses.schedule import configure_boss_schedule
+from bosses.live import ROOM as BOSS_TIMERS_ROOM, broadcaster as boss_timers, configure_boss_timers
+from members.batch import BatchError, apply_member_patches
+from members.leaderboard import configure_leaderboard, leaderboard
+from members.roster import roster_version, roster_etag, serialize_member, iter_active_members, stream_members_json
 
 # Initialize extensions
-db = SQLAlchemy(app)
+db.init_app(app)
 migrate = Migrate(app, db)
 login_manager = LoginManager(app)
 login_manager.login_view = 'auth.login'
@@ -63,72 +102,37 @@ logger = logging.getLogger(__name__)
 with app.app_context():
     db.create_all()
 
-# Import models
-from models import User, GuildEvent, WikiArticle, ForumPost, ForumReply, Message, GuildRole, ActivityLog
+configure_principal_cache(app)
+configure_permissions(app)
+activity_sink.init_app(app)
+configure_member_search(app)
+configure_leaderboard(app)
+configure_ics_feeds(app)
+configure_boss_schedule(app)
+configure_boss_timers(app, socketio)
+view_counter.init_app(app, redis_client)
+doc_count_buffer.init_app(app)
+render_cache.init_app(app, redis_client)
 
 # Import and register blueprints
 from auth.routes import auth_bp
 from admin.routes import admin_bp
+from events.routes import events_bp
+from bosses.routes import bosses_bp
+from forum.routes import forum_bp
+from wiki.routes import wiki_bp
 
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
+app.register_blueprint(events_bp, url_prefix='/api/events')
+app.register_blueprint(bosses_bp, url_prefix='/api/bosses')
+app.register_blueprint(forum_bp, url_prefix='/api/forum')
+app.register_blueprint(wiki_bp, url_prefix='/api/wiki')
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-# Utility functions
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
-        
-        try:
-            if token.startswith('Bearer '):
-                token = token.split(' ')[1]
-            
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            current_user_id = data['user_id']
-            current_user = User.query.get(current_user_id)
-            
-            if not current_user:
-                return jsonify({'message': 'User not found'}), 401
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Token is invalid'}), 401
-            
-        return f(current_user, *args, **kwargs)
-    return decorated
-
-def role_required(min_role):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(current_user, *args, **kwargs):
-            role_hierarchy = {
-                'Invité': 1,
-                'Recrue': 2,
-                'Membre': 3,
-                'Quartier-Maître': 4,
-                'Officier': 5,
-                'Conseiller': 6,
-                'Maître': 7,
-                'SuperAdmin': 8
-            }
-            
-            user_role_level = role_hierarchy.get(current_user.role, 1)
-            required_level = role_hierarchy.get(min_role, 1)
-            
-            if user_role_level < required_level:
-                return jsonify({'message': 'Insufficient permissions'}), 403
-                
-            return f(current_user, *args, **kwargs)
-        return decorated_function
-    return decorator
-
 # API Routes
 
 # Members API
@@ -136,58 +140,67 @@ def role_required(min_role):
 @token_required
 def get_members(current_user):
     try:
-        members = User.query.filter_by(is_active=True).all()
-        members_data = []
+        version = roster_version()
+        etag = roster_etag(version)
         
-        for member in members:
-            members_data.append({
-                'id': member.id,
-                'username': member.username,
-                'email': member.email,
-                'discord_id': member.discord_id,
-                'discord_username': member.discord_username,
-                'role': member.role,
-                'character_name': member.character_name,
-                'character_class': member.character_class,
-                'equipment_score': member.equipment_score,
-                'family_name': member.family_name,
-                'bio': member.bio,
-                'profile_image': member.profile_image,
-                'is_validated': member.is_validated,
-                'created_at': member.created_at.isoformat(),
-                'updated_at': member.updated_at.isoformat()
-            })
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(
+                stream_with_context(stream_members_json(iter_active_members())),
+                mimetype='application/json'
+            )
         
-        return jsonify({'members': members_data})
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        if version[0]:
+            response.last_modified = version[0]
+        return response
     except Exception as e:
         logger.error(f"Error fetching members: {str(e)}")
         return jsonify({'message': 'Error fetching members'}), 500
 
+@app.route('/api/members/leaderboard', methods=['GET'])
+@token_required
+def get_gear_leaderboard(current_user):
+    try:
+        limit = min(request.args.get('limit', 10, type=int), 100)
+        character_class = request.args.get('class')
+        
+        return jsonify({'leaderboard': leaderboard.top(limit, character_class)})
+    except Exception as e:
+        logger.error(f"Error fetching leaderboard: {str(e)}")
+        return jsonify({'message': 'Error fetching leaderboard'}), 500
+
+@app.route('/api/members/gear-stats', methods=['GET'])
+@token_required
+def get_gear_stats(current_user):
+    try:
+        return jsonify(leaderboard.histogram())
+    except Exception as e:
+        logger.error(f"Error fetching gear statistics: {str(e)}")
+        return jsonify({'message': 'Error fetching gear statistics'}), 500
+
+@app.route('/api/members/<int:member_id>/gear-rank', methods=['GET'])
+@token_required
+def get_member_gear_rank(current_user, member_id):
+    try:
+        rank = leaderboard.rank_of(member_id)
+        if rank is None:
+            return jsonify({'message': 'Member has no equipment score'}), 404
+        
+        return jsonify({'rank': rank})
+    except Exception as e:
+        logger.error(f"Error fetching gear rank: {str(e)}")
+        return jsonify({'message': 'Error fetching gear rank'}), 500
+
 @app.route('/api/members/<int:member_id>', methods=['GET'])
 @token_required
 def get_member(current_user, member_id):
     try:
         member = User.query.get_or_404(member_id)
         
-        member_data = {
-            'id': member.id,
-            'username': member.username,
-            'email': member.email,
-            'discord_id': member.discord_id,
-            'discord_username': member.discord_username,
-            'role': member.role,
-            'character_name': member.character_name,
-            'character_class': member.character_class,
-            'equipment_score': member.equipment_score,
-            'family_name': member.family_name,
-            'bio': member.bio,
-            'profile_image': member.profile_image,
-            'is_validated': member.is_validated,
-            'created_at': member.created_at.isoformat(),
-            'updated_at': member.updated_at.isoformat()
-        }
-        
-        return jsonify({'member': member_data})
+        return jsonify({'member': serialize_member(member)})
     except Exception as e:
         logger.error(f"Error fetching member: {str(e)}")
         return jsonify({'message': 'Error fetching member'}), 500
@@ -199,7 +212,7 @@ def update_member(current_user, member_id):
         member = User.query.get_or_404(member_id)
         
         # Check if user can update this member
-        if current_user.id != member_id and current_user.role not in ['SuperAdmin', 'Maître', 'Conseiller']:
+        if current_user.id != member_id and not has_permission(current_user, 'manage_members'):
             return jsonify({'message': 'Insufficient permissions'}), 403
         
         data = request.get_json()
@@ -210,14 +223,19 @@ def update_member(current_user, member_id):
         if 'character_class' in data:
             member.character_class = data['character_class']
         if 'equipment_score' in data:
-            member.equipment_score = data['equipment_score']
+            score = data['equipment_score']
+            if score is not None:
+                if isinstance(score, bool) or not str(score).strip().isdigit():
+                    return jsonify({'message': 'equipment_score must be a non-negative integer'}), 400
+                score = int(score)
+            member.equipment_score = score
         if 'family_name' in data:
             member.family_name = data['family_name']
         if 'bio' in data:
             member.bio = data['bio']
         
         # Admin-only fields
-        if current_user.role in ['SuperAdmin', 'Maître', 'Conseiller']:
+        if has_permission(current_user, 'manage_members'):
             if 'role' in data:
                 member.role = data['role']
             if 'is_validated' in data:
@@ -225,63 +243,44 @@ def update_member(current_user, member_id):
         
         member.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_principal(member.id)
         
         return jsonify({'message': 'Member updated successfully'})
     except Exception as e:
         logger.error(f"Error updating member: {str(e)}")
         return jsonify({'message': 'Error updating member'}), 500
 
-# Events API
-@app.route('/api/events', methods=['GET'])
+@app.route('/api/members/batch', methods=['PATCH'])
 @token_required
-def get_events(current_user):
+def batch_update_members(current_user):
+    """Apply many member patches in one transaction
+    
+    Body: {"members": [{"id": 1, "equipment_score": 710, "role": "Membre"}, ...],
+    "atomic": false}. Returns one result per item.
+    """
     try:
-        events = GuildEvent.query.filter(GuildEvent.event_date >= datetime.utcnow().date()).all()
-        events_data = []
-        
-        for event in events:
-            events_data.append({
-                'id': event.id,
-                'title': event.title,
-                'description': event.description,
-                'event_date': event.event_date.isoformat(),
-                'event_time': event.event_time.strftime('%H:%M'),
-                'event_type': event.event_type,
-                'max_participants': event.max_participants,
-                'participants': [p.user_id for p in event.participants],
-                'created_by': event.created_by,
-                'created_at': event.created_at.isoformat()
-            })
+        data = request.get_json() or {}
         
-        return jsonify({'events': events_data})
-    except Exception as e:
-        logger.error(f"Error fetching events: {str(e)}")
-        return jsonify({'message': 'Error fetching events'}), 500
-
-@app.route('/api/events', methods=['POST'])
-@token_required
-@role_required('Officier')
-def create_event(current_user):
-    try:
-        data = request.get_json()
+        try:
+            results, activity = apply_member_patches(current_user, data.get('members'), bool(data.get('atomic')))
+        except BatchError as e:
+            return jsonify({'message': str(e)}), 400
         
-        new_event = GuildEvent(
-            title=data['title'],
-            description=data.get('description', ''),
-            event_date=datetime.strptime(data['event_date'], '%Y-%m-%d').date(),
-            event_time=datetime.strptime(data['event_time'], '%H:%M').time(),
-            event_type=data['event_type'],
-            max_participants=data.get('max_participants'),
-            created_by=current_user.id
-        )
+        # Log all changes in one batch
+        log_activities(current_user.id, activity)
         
-        db.session.add(new_event)
-        db.session.commit()
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
         
-        return jsonify({'message': 'Event created successfully', 'event_id': new_event.id}), 201
+        return jsonify({
+            'results': results,
+            'updated': counts.get('updated', 0),
+            'counts': counts
+        })
     except Exception as e:
-        logger.error(f"Error creating event: {str(e)}")
-        return jsonify({'message': 'Error creating event'}), 500
+        logger.error(f"Error batch updating members: {str(e)}")
+        return jsonify({'message': 'Error updating members'}), 500
 
 # Socket.IO Events
 @socketio.on('connect')
@@ -296,13 +295,19 @@ def handle_disconnect():
 def handle_join_room(data):
     room = data['room']
     join_room(room)
+    if room == BOSS_TIMERS_ROOM:
+        # Snapshot to this client only; the room then receives deltas and alerts.
+        # No room-wide status: a reconnect storm would cost O(clients²) messages
+        emit('boss_timers:snapshot', boss_timers.snapshot())
+        return
     emit('status', {'msg': f'Joined room {room}'}, room=room)
 
 @socketio.on('leave_room')
 def handle_leave_room(data):
     room = data['room']
     leave_room(room)
-    emit('status', {'msg': f'Left room {room}'}, room=room)
+    if room != BOSS_TIMERS_ROOM:
+        emit('status', {'msg': f'Left room {room}'}, room=room)
 
 @socketio.on('send_message')
 def handle_message(data):
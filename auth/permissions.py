@@ -0,0 +1,197 @@
+"""
+Role and permission engine backed by the GuildRole table.
+
+GuildRole rows are compiled into an immutable ``PermissionSnapshot``: every
+permission name gets a bit, every role an integer mask and a hierarchy
+level, so checks are a dict lookup plus a bitwise AND. The snapshot is
+swapped atomically once a transaction changing GuildRole rows commits in
+this process, and is refreshed periodically to pick up changes made
+elsewhere.
+"""
+
+import logging
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from flask import has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import GuildRole, db
+
+logger = logging.getLogger(__name__)
+
+ALL_PERMISSIONS = 'all'
+ALL_MASK = -1  # every bit set, including permissions added later
+
+# Used when the guild_roles table is empty or a role has no permissions set.
+# Mirrors the roles created by `manage.py seed-data`.
+DEFAULT_ROLES = (
+    ('Invité', 1, ['read_public']),
+    ('Recrue', 2, ['read_public', 'read_member']),
+    ('Membre', 3, ['read_public', 'read_member', 'write_forum', 'write_wiki']),
+    ('Quartier-Maître', 4, ['read_public', 'read_member', 'write_forum', 'write_wiki', 'manage_events']),
+    ('Officier', 5, ['read_public', 'read_member', 'write_forum', 'write_wiki', 'manage_events', 'moderate_forum']),
+    ('Conseiller', 6, ['read_public', 'read_member', 'write_forum', 'write_wiki', 'manage_events', 'moderate_forum', 'manage_members']),
+    ('Maître', 7, ['read_public', 'read_member', 'write_forum', 'write_wiki', 'manage_events', 'moderate_forum', 'manage_members', 'admin_access']),
+    ('SuperAdmin', 8, [ALL_PERMISSIONS])
+)
+
+DEFAULT_REFRESH_SECONDS = 300
+
+_SESSION_KEY = 'guild_roles_changed'
+
+
+class RoleSpec(NamedTuple):
+    name: str
+    level: int
+    mask: int
+    permissions: Tuple[str, ...]
+
+
+class PermissionSnapshot:
+    """Immutable compiled view of roles and permissions"""
+
+    __slots__ = ('roles', 'bits', 'lowest', 'loaded_at')
+
+    def __init__(self, roles: Dict[str, RoleSpec], bits: Dict[str, int]):
+        self.roles = MappingProxyType(roles)
+        self.bits = MappingProxyType(bits)
+        # Unknown roles are treated as the lowest role in the hierarchy
+        self.lowest = min(roles.values(), key=lambda spec: spec.level, default=RoleSpec('', 1, 0, ()))
+        self.loaded_at = time.monotonic()
+
+    @property
+    def role_names(self) -> Tuple[str, ...]:
+        return tuple(self.roles)
+
+    def spec(self, role: Optional[str]) -> RoleSpec:
+        return self.roles.get(role, self.lowest)
+
+    def level(self, role: Optional[str]) -> int:
+        return self.spec(role).level
+
+    def mask(self, role: Optional[str]) -> int:
+        return self.spec(role).mask
+
+    def permissions(self, role: Optional[str]) -> Tuple[str, ...]:
+        return self.spec(role).permissions
+
+    def has(self, role: Optional[str], permission: str) -> bool:
+        mask = self.mask(role)
+        if mask == ALL_MASK:
+            return True
+        bit = self.bits.get(permission)
+        return bit is not None and mask & bit == bit
+
+    def is_super_admin(self, role: Optional[str]) -> bool:
+        return self.mask(role) == ALL_MASK
+
+
+def compile_roles(rows: Iterable[Tuple[str, int, Optional[list]]]) -> PermissionSnapshot:
+    """Compile (name, hierarchy_level, permissions) tuples into a snapshot"""
+    defaults = {name: permissions for name, _, permissions in DEFAULT_ROLES}
+    rows = [(name, level, permissions or defaults.get(name, [])) for name, level, permissions in rows]
+
+    names = sorted({p for _, _, permissions in rows for p in permissions if p != ALL_PERMISSIONS})
+    bits = {name: 1 << index for index, name in enumerate(names)}
+
+    roles = {}
+    for name, level, permissions in sorted(rows, key=lambda row: row[1]):
+        if ALL_PERMISSIONS in permissions:
+            mask = ALL_MASK
+        else:
+            mask = 0
+            for permission in permissions:
+                mask |= bits[permission]
+        roles[name] = RoleSpec(name, level, mask, tuple(permissions))
+
+    return PermissionSnapshot(roles, bits)
+
+
+class PermissionEngine:
+    """Holds the current snapshot and reloads it when roles change"""
+
+    def __init__(self, refresh_seconds: float = DEFAULT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = compile_roles(DEFAULT_ROLES)
+        self._dirty = True
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> PermissionSnapshot:
+        snapshot = self._snapshot
+        if has_app_context() and (self._dirty or time.monotonic() - snapshot.loaded_at > self.refresh_seconds):
+            snapshot = self.reload()
+        return snapshot
+
+    def reload(self) -> PermissionSnapshot:
+        with self._lock:
+            # Cleared first, so a commit landing during the query triggers another reload
+            self._dirty = False
+            try:
+                rows = db.session.query(
+                    GuildRole.name, GuildRole.hierarchy_level, GuildRole.permissions
+                ).all()
+                snapshot = compile_roles(rows) if rows else compile_roles(DEFAULT_ROLES)
+            except Exception as e:
+                logger.error(f"Error loading guild roles, keeping previous snapshot: {str(e)}")
+                # Same roles, new loaded_at, so the next attempt waits a full interval
+                snapshot = PermissionSnapshot(dict(self._snapshot.roles), dict(self._snapshot.bits))
+            self._snapshot = snapshot
+            return snapshot
+
+    def mark_dirty(self):
+        self._dirty = True
+
+
+permission_engine = PermissionEngine()
+
+
+def configure_permissions(app):
+    """Apply the refresh interval from the app config"""
+    permission_engine.refresh_seconds = app.config.get('PERMISSION_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+    permission_engine.mark_dirty()
+
+
+@event.listens_for(GuildRole, 'after_insert')
+@event.listens_for(GuildRole, 'after_update')
+@event.listens_for(GuildRole, 'after_delete')
+def _guild_role_flushed(mapper, connection, target):
+    # Reloading now could see rows that are later rolled back, or, from
+    # another request, miss them until they commit; wait for the commit
+    session = Session.object_session(target)
+    if session is not None:
+        session.info[_SESSION_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    if session.info.pop(_SESSION_KEY, None):
+        permission_engine.mark_dirty()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _session_rolled_back(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop(_SESSION_KEY, None)
+
+
+def role_level(role: Optional[str]) -> int:
+    return permission_engine.snapshot().level(role)
+
+
+def role_permissions(role: Optional[str]) -> Tuple[str, ...]:
+    return permission_engine.snapshot().permissions(role)
+
+
+def has_permission(role: Optional[str], permission: str) -> bool:
+    return permission_engine.snapshot().has(role, permission)
+
+
+def is_super_admin(role: Optional[str]) -> bool:
+    return permission_engine.snapshot().is_super_admin(role)
+
+
+def is_valid_role(role: Optional[str]) -> bool:
+    return role in permission_engine.snapshot().roles
@@ -0,0 +1,181 @@
+"""
+Principal resolution for authenticated requests.
+
+Every authenticated request needs a handful of user attributes (id, role,
+active flag) but not the full ORM row. Principals are cached in-process,
+keyed by user id and stamped with the row's ``updated_at``, so most
+requests never hit the database. Routes that change a user call
+``invalidate_principal`` after committing.
+
+Changes made by other processes (other workers, the Discord bot) are
+picked up by polling: at most every ``PRINCIPAL_CACHE_CHECK_SECONDS``,
+one query lists the users whose ``updated_at`` moved and their entries
+are dropped. A role change or deactivation therefore stops authorizing
+everywhere within that interval; the TTL is only a backstop.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from models import User, db
+
+DEFAULT_CACHE_SIZE = 2048
+DEFAULT_CACHE_TTL = 60
+DEFAULT_CHECK_SECONDS = 5
+# updated_at is stamped by different hosts; rescan this far back to absorb clock skew
+CLOCK_SKEW_MARGIN = timedelta(seconds=30)
+
+
+class Principal(NamedTuple):
+    """Immutable snapshot of the user attributes needed for authorization"""
+    id: int
+    username: str
+    role: str
+    discord_id: Optional[str]
+    is_active: bool
+    is_validated: bool
+    updated_at: Optional[datetime]
+
+
+class PrincipalCache:
+    """Bounded, thread-safe LRU of principals with a TTL"""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE, ttl: float = DEFAULT_CACHE_TTL,
+                 check_seconds: float = DEFAULT_CHECK_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.check_seconds = check_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        self._high_water: Optional[datetime] = None
+        self.hits = 0
+        self.misses = 0
+        self.remote_invalidations = 0
+
+    def sync(self):
+        """Drop entries of users changed by any process since the last check"""
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now  # one thread polls; the others keep serving
+            high_water = self._high_water
+
+        if high_water is None:
+            latest = db.session.query(db.func.max(User.updated_at)).scalar()
+            with self._lock:
+                self._entries.clear()
+                self._high_water = latest or datetime.min
+            return
+
+        changed = db.session.query(User.id, User.updated_at).filter(
+            User.updated_at >= high_water - CLOCK_SKEW_MARGIN
+        ).all()
+        with self._lock:
+            for user_id, updated_at in changed:
+                entry = self._entries.get(user_id)
+                # Rows at or past the previous high-water mark are dropped even when the
+                # stamps match: DATETIME columns may store whole seconds only
+                if entry is not None and (entry[0].updated_at != updated_at or updated_at >= high_water):
+                    del self._entries[user_id]
+                    self.remote_invalidations += 1
+                if updated_at and updated_at > self._high_water:
+                    self._high_water = updated_at
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, expires_at = entry
+            if expires_at < now:
+                del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return principal
+
+    def put(self, principal: Principal):
+        with self._lock:
+            current = self._entries.get(principal.id)
+            # Never replace a fresher snapshot with an older one
+            if current and current[0].updated_at and principal.updated_at \
+                    and current[0].updated_at > principal.updated_at:
+                return
+            self._entries[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'remote_invalidations': self.remote_invalidations
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+def configure_principal_cache(app):
+    """Apply cache sizing from the app config"""
+    principal_cache.maxsize = app.config.get('PRINCIPAL_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+    principal_cache.ttl = app.config.get('PRINCIPAL_CACHE_TTL', DEFAULT_CACHE_TTL)
+    principal_cache.check_seconds = app.config.get('PRINCIPAL_CACHE_CHECK_SECONDS', DEFAULT_CHECK_SECONDS)
+    principal_cache.clear()
+
+
+def principal_from_row(row) -> Principal:
+    """Build a principal from a User instance or a projected row"""
+    return Principal(
+        id=row.id,
+        username=row.username,
+        role=row.role,
+        discord_id=row.discord_id,
+        is_active=bool(row.is_active),
+        is_validated=bool(row.is_validated),
+        updated_at=row.updated_at
+    )
+
+
+def load_principal(user_id: int) -> Optional[Principal]:
+    """Resolve a principal from the cache, falling back to a single-row projection"""
+    principal_cache.sync()
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    row = db.session.query(
+        User.id, User.username, User.role, User.discord_id,
+        User.is_active, User.is_validated, User.updated_at
+    ).filter(User.id == user_id).first()
+    if row is None:
+        return None
+
+    principal = principal_from_row(row)
+    principal_cache.put(principal)
+    return principal
+
+
+def invalidate_principal(user_id: int):
+    """Drop a cached principal after the user row changed"""
+    principal_cache.invalidate(user_id)
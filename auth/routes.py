@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, redirect, url_for, session
 from flask_login import login_user, logout_user, login_required, current_user
-from models import User, ActivityLog, db
+from models import User, db
+from auth.principals import invalidate_principal
+from utils import log_activity
 from datetime import datetime, timedelta
 import jwt
 import requests
@@ -106,17 +108,10 @@ def discord_callback():
             user.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_principal(user.id)
         
         # Log the login activity
-        activity_log = ActivityLog(
-            user_id=user.id,
-            action='login',
-            details={'method': 'discord_oauth'},
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-        db.session.add(activity_log)
-        db.session.commit()
+        log_activity(user.id, 'login', {'method': 'discord_oauth'})
         
         # Generate JWT token
         payload = {
@@ -182,15 +177,7 @@ def logout():
                 user_id = payload['user_id']
                 
                 # Log the logout activity
-                activity_log = ActivityLog(
-                    user_id=user_id,
-                    action='logout',
-                    details={'method': 'manual'},
-                    ip_address=request.remote_addr,
-                    user_agent=request.headers.get('User-Agent')
-                )
-                db.session.add(activity_log)
-                db.session.commit()
+                log_activity(user_id, 'logout', {'method': 'manual'})
                 
             except jwt.InvalidTokenError:
                 pass  # Token is invalid, but we can still log out
@@ -0,0 +1 @@
+# Boss timers blueprint package
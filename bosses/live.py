@@ -0,0 +1,145 @@
+"""
+Live boss timers over Socket.IO.
+
+One background task walks the spawn schedule and pushes changes to the
+``boss_timers`` room, instead of every dashboard polling. A client that
+joins receives a snapshot of the next spawns once; after that the room only
+gets:
+
+- ``boss_timers:delta`` when a spawn passes: the spawn that dropped off the
+  list and the one appended at its end,
+- ``boss_timers:alert`` ``BOSS_ALERT_MINUTES`` before each spawn.
+
+Broadcasts go to the room as a whole, so server work grows with the number
+of spawns, not with clients times polls. Every message carries a ``version``
+so clients can detect a missed delta and rejoin for a fresh snapshot.
+"""
+
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import pytz
+
+from bosses import schedule as boss_schedule
+
+logger = logging.getLogger(__name__)
+
+ROOM = 'boss_timers'
+DEFAULT_WINDOW = 10
+DEFAULT_ALERT_MINUTES = 5
+MAX_SLEEP_SECONDS = 60  # re-check the clock at least this often
+
+
+class BossTimerBroadcaster:
+    """Next spawns for the ``boss_timers`` room, advanced by one task"""
+
+    def __init__(self, socketio=None, window: int = DEFAULT_WINDOW, alert_minutes: int = DEFAULT_ALERT_MINUTES):
+        self.socketio = socketio
+        self.window = window
+        self.alert_minutes = alert_minutes
+        self._lock = threading.Lock()
+        self._upcoming: deque = deque()
+        self._spawns = None
+        self._alerted: Optional[datetime] = None  # latest spawn time already alerted
+        self._version = 0
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._started = False
+
+    def start(self):
+        """Start the broadcast task once, on the first join"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._reset(datetime.now(pytz.utc))
+        self.socketio.start_background_task(self._run)
+
+    def _reset(self, now: datetime):
+        schedule = boss_schedule.schedule
+        self._spawns = schedule.iter_spawns(now)
+        self._upcoming = deque(next(self._spawns) for _ in range(self.window))
+        # Spawns already inside the alert lead time when we start are not alerted late
+        self._alerted = max(
+            (spawn.at for spawn in self._upcoming if spawn.at - self._lead() <= now), default=None
+        )
+        self._version += 1
+        self._snapshot = None
+
+    def _lead(self) -> timedelta:
+        return timedelta(minutes=self.alert_minutes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Initial state for a joining client (rebuilt only after a change)"""
+        self.start()
+        with self._lock:
+            if self._snapshot is None:
+                schedule = boss_schedule.schedule
+                self._snapshot = {
+                    'version': self._version,
+                    'region': schedule.region,
+                    'timezone': schedule.timezone.zone,
+                    'alert_minutes': self.alert_minutes,
+                    'spawns': [spawn.to_dict() for spawn in self._upcoming]
+                }
+            return dict(self._snapshot, server_time=datetime.now(pytz.utc).isoformat())
+
+    def _run(self):
+        while True:
+            try:
+                delay = self._tick(datetime.now(pytz.utc))
+            except Exception as e:
+                logger.error(f"Boss timer broadcast error: {e}")
+                delay = 5
+            self.socketio.sleep(min(max(delay, 0.05), MAX_SLEEP_SECONDS))
+
+    def _tick(self, now: datetime) -> float:
+        """Emit due alerts and deltas; return seconds until the next one"""
+        messages = []
+        with self._lock:
+            for spawn in self._upcoming:
+                if spawn.at - self._lead() > now:
+                    break
+                if self._alerted is None or spawn.at > self._alerted:
+                    self._alerted = spawn.at
+                    messages.append(('boss_timers:alert', dict(
+                        spawn.to_dict(), minutes=max(int((spawn.at - now).total_seconds() // 60), 0),
+                        version=self._version
+                    )))
+
+            while self._upcoming and self._upcoming[0].at <= now:
+                removed = self._upcoming.popleft()
+                added = next(self._spawns)
+                self._upcoming.append(added)
+                self._version += 1
+                self._snapshot = None
+                messages.append(('boss_timers:delta', {
+                    'version': self._version,
+                    'removed': removed.to_dict(),
+                    'added': added.to_dict()
+                }))
+
+            upcoming = [spawn.at for spawn in self._upcoming]
+            if self._alerted is not None:
+                pending_alerts = [at - self._lead() for at in upcoming if at > self._alerted]
+            else:
+                pending_alerts = [at - self._lead() for at in upcoming]
+
+        for event, payload in messages:
+            self.socketio.emit(event, payload, room=ROOM)
+
+        candidates = upcoming[:1] + pending_alerts[:1]
+        if not candidates:
+            return MAX_SLEEP_SECONDS
+        return (min(candidates) - now).total_seconds()
+
+
+broadcaster = BossTimerBroadcaster()
+
+
+def configure_boss_timers(app, socketio):
+    broadcaster.socketio = socketio
+    broadcaster.window = app.config.get('BOSS_TIMERS_WINDOW', DEFAULT_WINDOW)
+    broadcaster.alert_minutes = app.config.get('BOSS_ALERT_MINUTES', DEFAULT_ALERT_MINUTES)
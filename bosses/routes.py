@@ -0,0 +1,68 @@
+from flask import Blueprint, request, jsonify
+from models import BDOBossTimer
+from utils import token_required
+from bosses.schedule import schedule
+from datetime import datetime
+import pytz
+import logging
+
+bosses_bp = Blueprint('bosses', __name__)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPAWN_COUNT = 10
+MAX_SPAWN_COUNT = 200
+
+def _boss_info(row):
+    return {
+        'id': row.id,
+        'boss_name': row.boss_name,
+        'location': row.location,
+        'difficulty': row.difficulty,
+        'rewards': row.rewards
+    }
+
+@bosses_bp.route('', methods=['GET'])
+@token_required
+def get_bosses(current_user):
+    """Get world bosses with their next spawn"""
+    try:
+        now = datetime.now(pytz.utc)
+        bosses = []
+        for row in BDOBossTimer.query.order_by(BDOBossTimer.boss_name).all():
+            spawn = schedule.next_spawn(row.boss_name, now)
+            bosses.append(dict(_boss_info(row), next_spawn=spawn.at.isoformat() if spawn else None))
+        bosses.sort(key=lambda boss: (boss['next_spawn'] is None, boss['next_spawn'] or ''))
+        
+        return jsonify({'region': schedule.region, 'timezone': schedule.timezone.zone, 'bosses': bosses})
+    except Exception as e:
+        logger.error(f"Error fetching bosses: {str(e)}")
+        return jsonify({'message': 'Error fetching bosses'}), 500
+
+@bosses_bp.route('/schedule', methods=['GET'])
+@token_required
+def get_boss_schedule(current_user):
+    """Get the next spawns
+    
+    ``count`` spawns after ``after`` (ISO 8601, default now), optionally for
+    a single ``boss``. Computed from the weekly rotation, without a query.
+    """
+    try:
+        after = None
+        if request.args.get('after'):
+            try:
+                after = datetime.fromisoformat(request.args['after'].replace('Z', '+00:00'))
+            except ValueError:
+                return jsonify({'message': 'after must be an ISO 8601 datetime'}), 400
+        count = min(max(request.args.get('count', DEFAULT_SPAWN_COUNT, type=int), 1), MAX_SPAWN_COUNT)
+        boss = request.args.get('boss')
+        if boss and boss not in schedule.bosses:
+            return jsonify({'message': f'Unknown boss: {boss}'}), 404
+        
+        return jsonify({
+            'region': schedule.region,
+            'timezone': schedule.timezone.zone,
+            'spawns': [spawn.to_dict() for spawn in schedule.next_spawns(after, count, boss)]
+        })
+    except Exception as e:
+        logger.error(f"Error fetching boss schedule: {str(e)}")
+        return jsonify({'message': 'Error fetching boss schedule'}), 500
@@ -0,0 +1,152 @@
+"""
+World boss spawn schedule.
+
+BDO world bosses follow a fixed weekly rotation in the game region's server
+time. The rotation is compiled once into a sorted table of minute-of-week
+offsets (plus one table per boss), so "next N spawns after t" is a binary
+search into that table followed by a walk forward, wrapping into the next
+week. No database round trip is involved; ``BDOBossTimer`` rows only carry
+boss metadata (location, difficulty, rewards).
+
+Spawn times are local to the region (``GUILD_REGION``) and converted to UTC
+per spawn, so daylight-saving changes are handled by the timezone database.
+
+This module is plain Python with no Flask or database imports so the
+Discord bot can use it too.
+"""
+
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import pytz
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+# Server timezone of each game region
+REGION_TIMEZONES = {
+    'EU': 'Europe/Berlin',
+    'NA': 'America/Los_Angeles',
+    'SA': 'America/Sao_Paulo',
+    'MENA': 'Asia/Dubai',
+    'SEA': 'Asia/Singapore',
+    'TH': 'Asia/Bangkok',
+    'JP': 'Asia/Tokyo',
+    'KR': 'Asia/Seoul',
+    'TW': 'Asia/Taipei'
+}
+DEFAULT_REGION = 'EU'
+
+# Daily spawn slots (server time) and the bosses appearing in each slot, per
+# weekday. Bosses sharing a slot are separated by '/'; '' means no spawn.
+SLOTS = ('00:15', '02:00', '05:00', '09:00', '12:00', '16:00', '19:00', '22:15', '23:15')
+WEEKLY_ROTATION = {
+    'MO': ('Kutum/Kzarka', 'Karanda', 'Kzarka', 'Kzarka', 'Offin Tett', 'Kutum', 'Nouver', 'Garmoth', 'Karanda/Kzarka'),
+    'TU': ('Karanda', 'Kutum', 'Kzarka', 'Nouver', 'Kutum', 'Nouver', 'Karanda', 'Garmoth', 'Kutum/Kzarka'),
+    'WE': ('Kutum/Kzarka', 'Karanda', 'Kzarka', 'Karanda', '', 'Kutum/Offin Tett', 'Vell', 'Garmoth', 'Quint/Muraka'),
+    'TH': ('Nouver', 'Kutum', 'Nouver', 'Kutum', 'Nouver', 'Kzarka', 'Kutum', 'Garmoth', 'Karanda/Kzarka'),
+    'FR': ('Kzarka/Nouver', 'Karanda', 'Kutum', 'Karanda', 'Nouver', 'Kzarka', 'Kzarka', 'Garmoth', 'Kutum/Karanda'),
+    'SA': ('Karanda', 'Offin Tett', 'Nouver', 'Kutum', 'Nouver', 'Quint/Muraka', 'Karanda/Kzarka', 'Rednose', ''),
+    'SU': ('Kutum/Kzarka', 'Kutum', 'Kzarka', 'Nouver', 'Kutum', 'Vell', 'Garmoth', 'Kzarka/Nouver', 'Vell')
+}
+
+class Spawn(NamedTuple):
+    at: datetime  # UTC, timezone-aware
+    bosses: Tuple[str, ...]
+
+    def to_dict(self) -> dict:
+        return {'at': self.at.isoformat(), 'bosses': list(self.bosses)}
+
+
+def compile_rotation(rotation: Mapping[str, Sequence[str]] = WEEKLY_ROTATION,
+                     slots: Sequence[str] = SLOTS) -> Dict[int, Tuple[str, ...]]:
+    """{minute of week: bosses} from a weekday -> per-slot table"""
+    table = {}
+    for day, entries in rotation.items():
+        if len(entries) != len(slots):
+            raise ValueError(f"{day}: expected {len(slots)} slots, got {len(entries)}")
+        for slot, entry in zip(slots, entries):
+            bosses = tuple(name.strip() for name in entry.split('/') if name.strip())
+            if bosses:
+                hours, minutes = map(int, slot.split(':'))
+                table[WEEKDAYS.index(day) * 1440 + hours * 60 + minutes] = bosses
+    return table
+
+
+class SpawnSchedule:
+    """Compiled weekly rotation for one region"""
+
+    def __init__(self, region: str = DEFAULT_REGION, timezone: Optional[str] = None,
+                 rotation: Mapping[str, Sequence[str]] = WEEKLY_ROTATION, slots: Sequence[str] = SLOTS):
+        self.configure(region, timezone)
+
+        table = compile_rotation(rotation, slots)
+        self._minutes = array('H', sorted(table))
+        self._bosses = tuple(table[minute] for minute in self._minutes)
+        self._slot = {minute: index for index, minute in enumerate(self._minutes)}
+        self._by_boss: Dict[str, array] = {}
+        for minute in self._minutes:
+            for boss in table[minute]:
+                self._by_boss.setdefault(boss, array('H')).append(minute)
+
+    def configure(self, region: str, timezone: Optional[str] = None):
+        """Switch region; ``timezone`` overrides the region's server timezone"""
+        self.region = region.upper()
+        self.timezone = pytz.timezone(timezone or REGION_TIMEZONES.get(self.region, REGION_TIMEZONES[DEFAULT_REGION]))
+
+    @property
+    def bosses(self) -> List[str]:
+        return sorted(self._by_boss)
+
+    def _week_position(self, after: datetime) -> Tuple[datetime, int]:
+        """(local naive Monday 00:00 of after's week, whole minutes into that week)"""
+        local = after.astimezone(self.timezone).replace(tzinfo=None)
+        week_start = (local - timedelta(days=local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        return week_start, int((local - week_start).total_seconds() // 60)
+
+    def iter_spawns(self, after: Optional[datetime] = None, boss: Optional[str] = None) -> Iterator[Spawn]:
+        """Spawns strictly after ``after`` (default now), in order; unbounded"""
+        after = after or datetime.now(pytz.utc)
+        if after.tzinfo is None:
+            after = pytz.utc.localize(after)
+        minutes = self._minutes if boss is None else self._by_boss.get(boss)
+        if not minutes:
+            return
+
+        week_start, position = self._week_position(after)
+        index = bisect_right(minutes, position)
+        week = 0
+        while True:
+            if index == len(minutes):
+                index, week = 0, week + 1
+            minute = minutes[index]
+            index += 1
+            naive = week_start + timedelta(weeks=week, minutes=minute)
+            at = self.timezone.normalize(self.timezone.localize(naive)).astimezone(pytz.utc)
+            if at <= after:
+                continue  # repeated local hour when clocks go back
+            bosses = self._bosses[self._slot[minute]]
+            yield Spawn(at, bosses if boss is None else (boss,))
+
+    def next_spawns(self, after: Optional[datetime] = None, count: int = 5,
+                    boss: Optional[str] = None) -> List[Spawn]:
+        return list(islice(self.iter_spawns(after, boss), count))
+
+    def next_spawn(self, boss: str, after: Optional[datetime] = None) -> Optional[Spawn]:
+        return next(self.iter_spawns(after, boss), None)
+
+    def spawns_between(self, start: datetime, end: datetime, boss: Optional[str] = None) -> Iterator[Spawn]:
+        """Spawns in (start, end]"""
+        for spawn in self.iter_spawns(start, boss):
+            if spawn.at > end:
+                return
+            yield spawn
+
+
+schedule = SpawnSchedule()
+
+
+def configure_boss_schedule(app):
+    schedule.configure(app.config.get('GUILD_REGION', DEFAULT_REGION), app.config.get('BOSS_TIMEZONE'))
@@ -1,4 +1,5 @@
 import os
+import sys
 import discord
 from discord.ext import commands, tasks
 import asyncio
@@ -11,6 +12,13 @@ import aiohttp
 import mysql.connector
 from mysql.connector import Error
 
+# The repository root, for code shared with the web app (events.recurrence)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from events import recurrence
+from bosses.schedule import SpawnSchedule
+from reminders import ReminderScheduler, load_occurrences, parse_offsets
+
 # Load environment variables
 load_dotenv()
 
@@ -43,6 +51,14 @@ DB_CONFIG = {
 API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:5000/api')
 GUILD_ID = int(os.getenv('DISCORD_GUILD_ID', '0'))
 
+# Event reminders: minutes before the start, e.g. "60,15,0"
+EVENT_REMINDER_OFFSETS = parse_offsets(os.getenv('EVENT_REMINDER_OFFSETS', '60,15,0'))
+EVENT_TIMEZONE = os.getenv('EVENT_TIMEZONE', 'Europe/Paris')
+EVENT_SYNC_SECONDS = int(os.getenv('EVENT_SYNC_SECONDS', 60))
+
+# World boss rotation in the guild's game region
+boss_schedule = SpawnSchedule(os.getenv('GUILD_REGION', 'EU'), os.getenv('BOSS_TIMEZONE'))
+
 class DatabaseManager:
     """Database connection manager"""
     
@@ -93,6 +109,22 @@ class DatabaseManager:
         except Error as e:
             logger.error(f"Update execution error: {e}")
             return False
+    
+    def execute_update_count(self, query, params=None):
+        """Execute an update query and return the affected row count (None on error)"""
+        if not self.connection or not self.connection.is_connected():
+            self.connect()
+        
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(query, params)
+            self.connection.commit()
+            count = cursor.rowcount
+            cursor.close()
+            return count
+        except Error as e:
+            logger.error(f"Update execution error: {e}")
+            return None
 
 # Global database manager
 db_manager = DatabaseManager()
@@ -103,8 +135,9 @@ async def on_ready():
     logger.info(f'{bot.user} has connected to Discord!')
     
     # Start background tasks
-    sync_member_status.start()
-    check_events.start()
+    if not sync_member_status.is_running():
+        sync_member_status.start()
+    reminder_scheduler.start()
     
     # Set bot status
     activity = discord.Game(name="Black Desert Online")
@@ -137,7 +170,8 @@ async def on_member_remove(member):
     logger.info(f'Member left: {member.name}#{member.discriminator}')
     
     # Update database
-    query = "UPDATE users SET is_active = FALSE WHERE discord_id = %s"
+    # updated_at lets the web app's principal cache notice the change
+    query = "UPDATE users SET is_active = FALSE, updated_at = UTC_TIMESTAMP() WHERE discord_id = %s"
     db_manager.execute_update(query, (str(member.id),))
 
 @bot.command(name='register')
@@ -198,16 +232,11 @@ async def profile_command(ctx, member: discord.Member = None):
 @bot.command(name='events')
 async def events_command(ctx):
     """Show upcoming guild events"""
-    query = """
-    SELECT e.title, e.description, e.event_date, e.event_time, e.event_type, u.username
-    FROM guild_events e
-    JOIN users u ON e.created_by = u.id
-    WHERE e.event_date >= CURDATE()
-    ORDER BY e.event_date, e.event_time
-    LIMIT 5
-    """
-    
-    results = db_manager.execute_query(query)
+    # One-off events and occurrences of recurring ones, merged in start order
+    results = load_occurrences(
+        db_manager, "e.title, e.description, e.event_type, u.username",
+        datetime.now().date(), limit=5, joins="JOIN users u ON e.created_by = u.id"
+    )
     
     if not results:
         await ctx.send("No upcoming events scheduled.")
@@ -218,18 +247,20 @@ async def events_command(ctx):
         color=0x10b981
     )
     
-    for event in results:
+    for event, occurrence in results:
         event_type_emoji = {
             'pvp': '⚔️',
             'pve': '🗡️',
             'meeting': '🏛️',
             'raid': '🐉',
             'other': '📅'
-        }.get(event[4], '📅')
+        }.get(event[6], '📅')
+        values = recurrence.apply_override({'title': event[4], 'description': event[5]}, occurrence)
+        repeats = " 🔁" if occurrence.occurrence_date else ""
         
         embed.add_field(
-            name=f"{event_type_emoji} {event[0]}",
-            value=f"**Date:** {event[2]}\n**Time:** {event[3]}\n**Type:** {event[4].upper()}\n**Organizer:** {event[5]}\n**Description:** {event[1][:100]}...",
+            name=f"{event_type_emoji} {values['title']}{repeats}",
+            value=f"**Date:** {occurrence.event_date}\n**Time:** {occurrence.event_time.strftime('%H:%M')}\n**Type:** {event[6].upper()}\n**Organizer:** {event[7]}\n**Description:** {(values['description'] or '')[:100]}...",
             inline=False
         )
     
@@ -238,37 +269,38 @@ async def events_command(ctx):
 @bot.command(name='bosses')
 async def bosses_command(ctx):
     """Show boss timers"""
-    query = """
-    SELECT boss_name, next_spawn, location, difficulty
-    FROM bdo_boss_timers
-    ORDER BY next_spawn
-    LIMIT 10
-    """
-    
-    results = db_manager.execute_query(query)
+    spawns = boss_schedule.next_spawns(count=10)
     
-    if not results:
+    if not spawns:
         await ctx.send("No boss timers available.")
         return
     
+    # Spawn times come from the rotation; the table only holds boss details
+    details = {
+        row[0]: row[1:]
+        for row in db_manager.execute_query("SELECT boss_name, location, difficulty FROM bdo_boss_timers") or []
+    }
+    
     embed = discord.Embed(
         title="BDO Boss Timers",
         color=0xdc2626
     )
     
-    for boss in results:
-        difficulty_emoji = {
-            'Easy': '🟢',
-            'Medium': '🟡',
-            'Hard': '🟠',
-            'Very Hard': '🔴'
-        }.get(boss[3], '⚪')
-        
-        embed.add_field(
-            name=f"{difficulty_emoji} {boss[0]}",
-            value=f"**Next Spawn:** {boss[1]}\n**Location:** {boss[2]}\n**Difficulty:** {boss[3]}",
-            inline=True
-        )
+    for spawn in spawns:
+        for boss in spawn.bosses:
+            location, difficulty = details.get(boss, (None, None))
+            difficulty_emoji = {
+                'Easy': '🟢',
+                'Medium': '🟡',
+                'Hard': '🟠',
+                'Very Hard': '🔴'
+            }.get(difficulty, '⚪')
+            
+            embed.add_field(
+                name=f"{difficulty_emoji} {boss}",
+                value=f"**Next Spawn:** <t:{int(spawn.at.timestamp())}:R>\n**Location:** {location or '-'}\n**Difficulty:** {difficulty or '-'}",
+                inline=True
+            )
     
     await ctx.send(embed=embed)
 
@@ -306,7 +338,7 @@ async def stats_command(ctx):
 @commands.has_any_role('SuperAdmin', 'Maître', 'Conseiller', 'Officier')
 async def validate_command(ctx, member: discord.Member):
     """Validate a member (Officers+ only)"""
-    query = "UPDATE users SET is_validated = TRUE WHERE discord_id = %s"
+    query = "UPDATE users SET is_validated = TRUE, updated_at = UTC_TIMESTAMP() WHERE discord_id = %s"
     success = db_manager.execute_update(query, (str(member.id),))
     
     if success:
@@ -340,21 +372,8 @@ async def sync_member_status():
         query = "UPDATE users SET last_login = NOW() WHERE discord_id = %s AND is_active = TRUE"
         db_manager.execute_update(query, (str(member.id),))
 
-@tasks.loop(hours=1)
-async def check_events():
-    """Check for upcoming events and send notifications"""
-    query = """
-    SELECT e.title, e.description, e.event_date, e.event_time, e.event_type
-    FROM guild_events e
-    WHERE e.event_date = CURDATE() 
-    AND e.event_time BETWEEN NOW() AND DATE_ADD(NOW(), INTERVAL 1 HOUR)
-    """
-    
-    results = db_manager.execute_query(query)
-    
-    if not results:
-        return
-    
+async def send_event_reminder(event, offset):
+    """Post a reminder for an event in the events channel"""
     guild = bot.get_guild(GUILD_ID)
     if not guild:
         return
@@ -364,17 +383,32 @@ async def check_events():
     if not events_channel:
         return
     
-    for event in results:
-        embed = discord.Embed(
-            title=f"Event Starting Soon: {event[0]}",
-            description=event[1],
-            color=0xf59e0b
-        )
-        
-        embed.add_field(name="Time", value=f"{event[2]} at {event[3]}", inline=True)
-        embed.add_field(name="Type", value=event[4].upper(), inline=True)
-        
-        await events_channel.send("@everyone", embed=embed)
+    if offset > 0:
+        title = f"Event Starting in {offset} Minutes: {event.title}"
+    else:
+        title = f"Event Starting Now: {event.title}"
+    
+    embed = discord.Embed(
+        title=title,
+        description=event.description,
+        color=0xf59e0b
+    )
+    
+    embed.add_field(name="Time", value=f"<t:{int(event.starts_at.timestamp())}:F>", inline=True)
+    embed.add_field(name="Type", value=event.event_type.upper(), inline=True)
+    if event.location:
+        embed.add_field(name="Location", value=event.location, inline=True)
+    
+    await events_channel.send("@everyone", embed=embed)
+
+# Replaces the former hourly check_events poll
+reminder_scheduler = ReminderScheduler(
+    db_manager,
+    send_event_reminder,
+    offsets=EVENT_REMINDER_OFFSETS,
+    timezone=EVENT_TIMEZONE,
+    sync_seconds=EVENT_SYNC_SECONDS
+)
 
 @bot.event
 async def on_command_error(ctx, error):
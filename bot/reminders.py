@@ -0,0 +1,360 @@
+"""
+Event reminder scheduler for the Discord bot.
+
+Replaces the hourly ``check_events`` poll. Upcoming events are loaded once
+into a min-heap of (due time, event, offset) reminders and a single asyncio
+task sleeps until the earliest one is due, so reminders fire within a second
+of their due time. Event changes are picked up with one cheap aggregate
+query every ``sync_seconds``; only events edited since the last sync are
+re-read, and a full reload happens when events are deleted or the horizon
+moves.
+
+Sent reminders are recorded in ``event_reminders``. A reminder is claimed
+with ``INSERT IGNORE`` before it is posted, so restarts and a second bot
+instance never post it twice. Rescheduling an event gives its reminders a
+new key, so they fire again for the new time.
+
+Recurring events are expanded within the horizon with events.recurrence;
+each occurrence is scheduled on its own and keyed by its original date.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import pytz
+
+from events import recurrence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OFFSETS = (60, 15, 0)
+DEFAULT_HORIZON_DAYS = 7
+DEFAULT_SYNC_SECONDS = 60
+DEFAULT_GRACE_SECONDS = 300
+FULL_RELOAD_SECONDS = 3600
+CLAIM_RETRY_SECONDS = 15
+
+EVENT_COLUMNS = "e.title, e.description, e.event_type, e.location, e.updated_at"
+OCCURRENCE_COLUMNS = "e.id, e.event_date, e.event_time, e.recurrence_rule"
+OVERRIDE_COLUMNS = "event_id, occurrence_date, is_cancelled, event_date, event_time, " + ', '.join(recurrence.OVERRIDE_FIELDS)
+
+
+class ReminderEvent(NamedTuple):
+    id: int
+    title: str
+    description: Optional[str]
+    event_date: date
+    event_time: object  # datetime.time, or timedelta as returned by mysql.connector
+    event_type: str
+    location: Optional[str]
+    updated_at: Optional[datetime]
+    starts_at: datetime  # timezone-aware
+    occurrence_date: Optional[date] = None  # original date, for occurrences of recurring events
+
+
+def parse_offsets(value: Optional[str]) -> Tuple[int, ...]:
+    """'60,15,0' -> (60, 15, 0); minutes before the event start"""
+    if not value:
+        return DEFAULT_OFFSETS
+    return tuple(sorted({int(part) for part in value.split(',') if part.strip()}, reverse=True))
+
+
+def _as_time(value):
+    """mysql.connector returns TIME columns as timedelta"""
+    if isinstance(value, timedelta):
+        return (datetime.min + value).time()
+    return value
+
+
+def load_occurrences(db_manager, columns: str, start: date, end: Optional[date] = None,
+                     limit: Optional[int] = None, joins: str = '') -> Optional[List[Tuple[Any, recurrence.Occurrence]]]:
+    """(row, occurrence) pairs for one-off events and series occurrences, in start order
+
+    Rows hold ``OCCURRENCE_COLUMNS`` followed by ``columns``; ``joins`` may
+    join other tables to ``guild_events e``. Open-ended listings must pass
+    ``limit``. Returns None when the database is unavailable.
+    """
+    if end is None and limit is None:
+        raise ValueError('An end date or a limit is required')
+    select = f"SELECT {OCCURRENCE_COLUMNS}, {columns} FROM guild_events e {joins}"
+    until = " AND e.event_date <= %s" if end is not None else ""
+    bounds = (start, end) if end is not None else (start,)
+
+    one_offs = db_manager.execute_query(
+        select + f" WHERE e.recurrence_rule IS NULL AND e.event_date >= %s{until} "
+        "ORDER BY e.event_date, e.event_time, e.id" + (f" LIMIT {int(limit)}" if limit else ""),
+        bounds
+    )
+    series = db_manager.execute_query(
+        select + f" WHERE e.recurrence_rule IS NOT NULL "
+        f"AND (e.recurrence_end IS NULL OR e.recurrence_end >= %s){until}",
+        bounds
+    )
+    if one_offs is None or series is None:
+        return None
+
+    overrides: Dict[int, Dict[date, recurrence.Override]] = {}
+    if series:
+        ids = [row[0] for row in series]
+        window = "BETWEEN %s AND %s" if end is not None else ">= %s"
+        rows = db_manager.execute_query(
+            f"SELECT {OVERRIDE_COLUMNS} FROM event_occurrence_overrides "
+            f"WHERE event_id IN ({', '.join(['%s'] * len(ids))}) "
+            f"AND (occurrence_date {window} OR event_date {window})",
+            tuple(ids) + bounds + bounds
+        ) or []
+        for event_id, occurrence_date, cancelled, event_date, event_time, *fields in rows:
+            overrides.setdefault(event_id, {})[occurrence_date] = recurrence.Override(
+                occurrence_date, bool(cancelled), event_date, _as_time(event_time),
+                dict(zip(recurrence.OVERRIDE_FIELDS, fields))
+            )
+
+    rows = {row[0]: row for row in one_offs}
+    streams = [(recurrence.Occurrence(row[1], _as_time(row[2]), row[0], None) for row in one_offs)]
+    for row in series:
+        rows[row[0]] = row
+        streams.append(recurrence.expand(
+            row[0], row[1], _as_time(row[2]), recurrence.parse_rule(row[3]),
+            overrides.get(row[0], {}), start, end
+        ))
+    return [(rows[occurrence.event_id], occurrence)
+            for occurrence in islice(recurrence.merge(*streams), limit)]
+
+
+class ReminderScheduler:
+    """Heap of pending reminders, driven by one asyncio task"""
+
+    def __init__(self, db_manager, send: Callable[[ReminderEvent, int], Awaitable[None]],
+                 offsets: Iterable[int] = DEFAULT_OFFSETS, timezone: str = 'Europe/Paris',
+                 horizon_days: int = DEFAULT_HORIZON_DAYS, sync_seconds: float = DEFAULT_SYNC_SECONDS,
+                 grace_seconds: float = DEFAULT_GRACE_SECONDS):
+        self.db = db_manager
+        self.send = send
+        self.offsets = tuple(offsets)
+        self.timezone = pytz.timezone(timezone)
+        self.horizon_days = horizon_days
+        self.sync_seconds = sync_seconds
+        self.grace_seconds = grace_seconds
+
+        # (due timestamp, event key, offset, start)
+        self._heap: List[Tuple[float, Tuple[int, date], int, datetime]] = []
+        self._events: Dict[Tuple[int, date], ReminderEvent] = {}
+        self._sent: Set[Tuple[int, int, datetime]] = set()
+        self._seen_version: Optional[Tuple] = None
+        self._last_full_load = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # Lifecycle
+
+    def start(self):
+        """Start the scheduler task (safe to call again on reconnect)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def notify_changed(self):
+        """Force a sync on the next loop iteration"""
+        self._seen_version = None
+        self._wakeup.set()
+
+    async def _run(self):
+        self._full_load()
+        next_sync = time.monotonic() + self.sync_seconds
+        while True:
+            try:
+                if time.monotonic() >= next_sync or self._seen_version is None:
+                    self._sync()
+                    next_sync = time.monotonic() + self.sync_seconds
+
+                await self._fire_due()
+
+                delay = next_sync - time.monotonic()
+                if self._heap:
+                    delay = min(delay, self._heap[0][0] - time.time())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0))
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reminder scheduler error: {e}")
+                await asyncio.sleep(5)
+
+    # Loading
+
+    def _localize(self, event_date: date, event_time) -> datetime:
+        return self.timezone.localize(datetime.combine(event_date, _as_time(event_time)))
+
+    @staticmethod
+    def _key(event: ReminderEvent) -> Tuple[int, date]:
+        return event.id, event.occurrence_date or date.min
+
+    def _build(self, row, occurrence: recurrence.Occurrence) -> ReminderEvent:
+        event_id, _, _, _, title, description, event_type, location, updated_at = row
+        values = recurrence.apply_override(
+            {'title': title, 'description': description, 'location': location}, occurrence
+        )
+        return ReminderEvent(
+            event_id, values['title'], values['description'], occurrence.event_date, occurrence.event_time,
+            event_type, values['location'], updated_at,
+            self._localize(occurrence.event_date, occurrence.event_time), occurrence.occurrence_date
+        )
+
+    def _full_load(self):
+        occurrences = load_occurrences(
+            self.db, EVENT_COLUMNS,
+            date.today() - timedelta(days=1), date.today() + timedelta(days=self.horizon_days)
+        )
+        if occurrences is None:
+            return
+        sent = self.db.execute_query(
+            "SELECT event_id, offset_minutes, event_start FROM event_reminders WHERE event_start >= %s",
+            (datetime.utcnow() - timedelta(days=1),)
+        ) or []
+
+        self._sent = {(event_id, offset, start) for event_id, offset, start in sent}
+        self._events = {}
+        self._heap = []
+        for row, occurrence in occurrences:
+            self._schedule(self._build(row, occurrence))
+        self._seen_version = self._version()
+        self._last_full_load = time.monotonic()
+        logger.info(f"Reminder scheduler loaded {len(self._events)} events, {len(self._heap)} reminders pending")
+
+    def _version(self) -> Optional[Tuple]:
+        result = self.db.execute_query("SELECT MAX(updated_at), COUNT(*) FROM guild_events")
+        return tuple(result[0]) if result else None
+
+    def _sync(self):
+        version = self._version()
+        if version is None:
+            return
+        previous = self._seen_version
+        if previous is None or version[1] < previous[1] or \
+                time.monotonic() - self._last_full_load > FULL_RELOAD_SECONDS:
+            # Deletions (or a new day at the horizon): reload everything
+            self._full_load()
+            return
+        if version == previous:
+            return
+
+        rows = self.db.execute_query(
+            f"SELECT {OCCURRENCE_COLUMNS}, {EVENT_COLUMNS} FROM guild_events e WHERE e.updated_at >= %s",
+            (previous[0] or datetime.min,)
+        ) or []
+        if any(row[3] for row in rows):
+            # A series or one of its occurrences changed: re-expand everything
+            self._full_load()
+            self._wakeup.set()
+            return
+        for row in rows:
+            self._schedule(self._build(row, recurrence.Occurrence(row[1], _as_time(row[2]), row[0], None)))
+        self._seen_version = version
+        self._wakeup.set()
+
+    def _schedule(self, event: ReminderEvent):
+        starts_at = event.starts_at
+        key = self._key(event)
+        known = self._events.get(key)
+        self._events[key] = event
+        if known is not None and known.starts_at == starts_at:
+            return  # queued reminders read the updated event when they fire
+        horizon = datetime.now(pytz.utc) + timedelta(days=self.horizon_days)
+        if starts_at > horizon:
+            return
+        start_key = starts_at.astimezone(pytz.utc).replace(tzinfo=None)
+        for offset in self.offsets:
+            if (event.id, offset, start_key) in self._sent:
+                continue
+            due = (starts_at - timedelta(minutes=offset)).timestamp()
+            if due < time.time() - self.grace_seconds:
+                continue  # too late to be useful
+            heapq.heappush(self._heap, (due, key, offset, starts_at))
+
+    # Firing
+
+    async def _fire_due(self):
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            due, key, offset, starts_at = heapq.heappop(self._heap)
+            event = self._events.get(key)
+            # Entries for edited or deleted events are dropped lazily here
+            if event is None or event.starts_at != starts_at:
+                continue
+            if now - due > self.grace_seconds:
+                continue
+            if not self._still_scheduled(event):
+                self.notify_changed()
+                continue
+            claimed = self._claim(event, offset)
+            if claimed is None:
+                # Database error: try again shortly, for as long as the reminder is still useful
+                retry_at = time.time() + CLAIM_RETRY_SECONDS
+                if retry_at - (starts_at - timedelta(minutes=offset)).timestamp() <= self.grace_seconds:
+                    heapq.heappush(self._heap, (retry_at, key, offset, starts_at))
+                continue
+            if not claimed:
+                continue
+            try:
+                await self.send(event, offset)
+            except Exception as e:
+                logger.error(f"Error sending reminder for event {event.id}: {e}")
+
+    def _still_scheduled(self, event: ReminderEvent) -> bool:
+        """Primary-key check that the event was not deleted or moved since the last sync"""
+        result = self.db.execute_query(
+            "SELECT event_date, event_time, recurrence_rule FROM guild_events WHERE id = %s", (event.id,)
+        )
+        if not result:
+            return False
+        event_date, event_time, rule = result[0]
+        if event.occurrence_date is None:
+            return rule is None and self._localize(event_date, event_time) == event.starts_at
+
+        if rule is None or not recurrence.is_occurrence(event_date, recurrence.parse_rule(rule), event.occurrence_date):
+            return False
+        override = self.db.execute_query(
+            "SELECT is_cancelled, event_date, event_time FROM event_occurrence_overrides "
+            "WHERE event_id = %s AND occurrence_date = %s", (event.id, event.occurrence_date)
+        )
+        if override is None:
+            return False
+        if override:
+            cancelled, new_date, new_time = override[0]
+            if cancelled:
+                return False
+            event_date = new_date or event.occurrence_date
+            event_time = new_time if new_time is not None else event_time
+        else:
+            event_date = event.occurrence_date
+        return self._localize(event_date, event_time) == event.starts_at
+
+    def _claim(self, event: ReminderEvent, offset: int) -> Optional[bool]:
+        """Record the reminder as sent; False if it already was, None on a database error"""
+        start_key = event.starts_at.astimezone(pytz.utc).replace(tzinfo=None)
+        key = (event.id, offset, start_key)
+        if key in self._sent:
+            return False
+        claimed = self.db.execute_update_count(
+            "INSERT IGNORE INTO event_reminders (event_id, offset_minutes, event_start, sent_at) "
+            "VALUES (%s, %s, %s, %s)",
+            (event.id, offset, start_key, datetime.utcnow())
+        )
+        if claimed is None:
+            return None
+        self._sent.add(key)
+        return bool(claimed)
+
+    def pending(self) -> int:
+        return len(self._heap)
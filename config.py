@@ -59,6 +59,24 @@ class Config:
     # Application specific settings
     GUILD_NAME = os.getenv('GUILD_NAME', 'Wild Wolf Guild')
     GUILD_REGION = os.getenv('GUILD_REGION', 'EU')
+    # Server timezone for boss spawns; defaults to the GUILD_REGION's
+    BOSS_TIMEZONE = os.getenv('BOSS_TIMEZONE')
+    # Socket.IO boss_timers room: spawns in the snapshot, and alert lead time
+    BOSS_TIMERS_WINDOW = int(os.getenv('BOSS_TIMERS_WINDOW', 10))
+    BOSS_ALERT_MINUTES = int(os.getenv('BOSS_ALERT_MINUTES', 5))
+    
+    # Forum view counters: flush interval and per-member dedupe window
+    FORUM_VIEW_FLUSH_SECONDS = float(os.getenv('FORUM_VIEW_FLUSH_SECONDS', 5.0))
+    FORUM_VIEW_DEDUPE_SECONDS = int(os.getenv('FORUM_VIEW_DEDUPE_SECONDS', 1800))
+    
+    # Search term document counts (forum and wiki): batched write interval
+    SEARCH_DOC_COUNT_FLUSH_SECONDS = float(os.getenv('SEARCH_DOC_COUNT_FLUSH_SECONDS', 5.0))
+    
+    # Wiki revisions: a full snapshot at least every N revisions, deltas in between
+    WIKI_SNAPSHOT_INTERVAL = int(os.getenv('WIKI_SNAPSHOT_INTERVAL', 20))
+    # Rendered articles: in-process LRU entries, and Redis TTL in seconds
+    WIKI_RENDER_CACHE_SIZE = int(os.getenv('WIKI_RENDER_CACHE_SIZE', 512))
+    WIKI_RENDER_CACHE_TTL = int(os.getenv('WIKI_RENDER_CACHE_TTL', 7 * 24 * 3600))
     GUILD_WEBSITE = os.getenv('GUILD_WEBSITE', 'https://wildwolfguild.com')
     
     # Pagination defaults
@@ -71,6 +89,34 @@ class Config:
     CACHE_REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/2')
     CACHE_DEFAULT_TIMEOUT = 300
     
+    # Principal cache (authenticated user lookups)
+    PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', 2048))
+    PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', 60))
+    PRINCIPAL_CACHE_CHECK_SECONDS = float(os.getenv('PRINCIPAL_CACHE_CHECK_SECONDS', 5))
+    
+    # Seconds between permission snapshot reloads from the guild_roles table
+    PERMISSION_REFRESH_SECONDS = int(os.getenv('PERMISSION_REFRESH_SECONDS', 300))
+    
+    # Activity log writer (batched inserts from a background thread)
+    ACTIVITY_LOG_ASYNC = True
+    ACTIVITY_LOG_BATCH_SIZE = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', 200))
+    ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', 2.0))
+    ACTIVITY_LOG_QUEUE_SIZE = int(os.getenv('ACTIVITY_LOG_QUEUE_SIZE', 10000))
+    
+    # Raw activity logs older than this are pruned by `manage.py prune-activity`
+    ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv('ACTIVITY_LOG_RETENTION_DAYS', 180))
+    
+    # Seconds between full rebuilds of the in-process member search index and leaderboard
+    MEMBER_SEARCH_REBUILD_SECONDS = int(os.getenv('MEMBER_SEARCH_REBUILD_SECONDS', 600))
+    LEADERBOARD_REBUILD_SECONDS = int(os.getenv('LEADERBOARD_REBUILD_SECONDS', 600))
+    
+    # Calendar: timezone of event dates/times, and how often ICS feeds check for changes
+    EVENT_TIMEZONE = os.getenv('EVENT_TIMEZONE', 'Europe/Paris')
+    ICS_VERSION_CHECK_SECONDS = int(os.getenv('ICS_VERSION_CHECK_SECONDS', 30))
+    ICS_PAST_DAYS = int(os.getenv('ICS_PAST_DAYS', 30))
+    # How far ahead recurring events are expanded in ICS feeds
+    ICS_FUTURE_DAYS = int(os.getenv('ICS_FUTURE_DAYS', 180))
+    
     # Session configuration
     SESSION_TYPE = 'redis'
     SESSION_REDIS = os.getenv('REDIS_URL', 'redis://localhost:6379/3')
@@ -144,6 +190,9 @@ class TestingConfig(Config):
     
     # Disable rate limiting for tests
     RATELIMIT_ENABLED = False
+    
+    # Write activity logs synchronously so tests can assert on them
+    ACTIVITY_LOG_ASYNC = False
 
 # Configuration dictionary
 config = {
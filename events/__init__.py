@@ -0,0 +1 @@
+# Events blueprint package
\ No newline at end of file
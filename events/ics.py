@@ -0,0 +1,363 @@
+"""
+iCalendar (ICS) feeds for guild events.
+
+Calendar apps poll feeds every few minutes, so feeds are rendered once and
+served from memory with a content-hash ETag and Last-Modified. Each event's
+VEVENT is rendered once per ``updated_at`` and cached; when events change,
+only the changed VEVENTs are re-rendered and the guild feed is reassembled
+from the cached blocks. Personal feeds (events the member RSVP'd to) are
+assembled lazily from the same blocks and dropped whenever participations
+change.
+
+Recurring events are expanded into one VEVENT per occurrence between the
+past-days cutoff and ``ICS_FUTURE_DAYS`` ahead, with overrides applied;
+a series is re-rendered when it changes or the window moves.
+
+Event times are stored in ``EVENT_TIMEZONE`` local time and written as UTC
+(``...Z``), converted per occurrence so DST changes are honoured. A
+``TZID`` parameter would need a matching VTIMEZONE (RFC 5545 section
+3.2.19), which strict clients enforce.
+
+Change detection is a single aggregate query over events and participants,
+run at most every ``ICS_VERSION_CHECK_SECONDS`` and immediately after a
+commit in this process touched events or RSVPs. ``updated_at`` only has
+whole seconds, so events changed by such a commit are re-rendered whatever
+their timestamp says, and a block rendered within ``SETTLE_SECONDS`` of its
+``updated_at`` is rendered once more at the next check, in case another
+process edited it again within the same second.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import pytz
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from models import EventOccurrenceOverride, EventParticipant, GuildEvent, db
+from events import recurrence
+from events.queries import load_overrides
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEZONE = 'Europe/Paris'
+DEFAULT_VERSION_CHECK_SECONDS = 30
+DEFAULT_PAST_DAYS = 30
+DEFAULT_FUTURE_DAYS = 180
+DEFAULT_EVENT_DURATION = timedelta(hours=2)
+MAX_USER_FEEDS = 2000
+SETTLE_SECONDS = 2
+
+CALENDAR_NAME = 'Wild Wolf Guild'
+UID_DOMAIN = 'wildwolfguild'
+
+# RSVP status -> VEVENT STATUS in personal feeds; declined events are left out
+PERSONAL_STATUSES = {
+    'attending': 'CONFIRMED',
+    'maybe': 'TENTATIVE',
+    'waitlisted': 'TENTATIVE'
+}
+
+_SESSION_KEY = 'ics_feeds_dirty'
+
+
+class Feed(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: Optional[datetime]
+
+
+class _Block(NamedTuple):
+    updated_at: datetime
+    window: Optional[Tuple[date, date]]  # expansion window, for recurring events
+    vevents: Tuple[Tuple[Tuple, str], ...]  # (sort key, VEVENT lines up to STATUS and END:VEVENT)
+
+
+def escape_text(value: Optional[str]) -> str:
+    """Escape a TEXT value (RFC 5545 section 3.3.11)"""
+    if not value:
+        return ''
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', ''))
+
+
+def fold_line(line: str) -> str:
+    """Fold a content line at 75 octets without splitting UTF-8 sequences"""
+    if len(line.encode('utf-8')) <= 75:
+        return line
+    parts, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        limit = 75 if not parts else 74  # continuation lines start with a space
+        if size + width > limit:
+            parts.append(''.join(current))
+            current, size = [], 0
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n '.join(parts)
+
+
+def _utc_stamp(value: datetime) -> str:
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def _to_utc(local: datetime, timezone: str) -> datetime:
+    tz = pytz.timezone(timezone)
+    return tz.normalize(tz.localize(local)).astimezone(pytz.utc)
+
+
+def render_vevent(row, timezone: str, occurrence: Optional[recurrence.Occurrence] = None) -> str:
+    values = {'title': row.title, 'description': row.description, 'location': row.location}
+    uid = f'event-{row.id}@{UID_DOMAIN}'
+    if occurrence is not None:
+        start = datetime.combine(occurrence.event_date, occurrence.event_time)
+        recurrence.apply_override(values, occurrence)
+        uid = f'event-{row.id}-{occurrence.occurrence_date.strftime("%Y%m%d")}@{UID_DOMAIN}'
+    else:
+        start = datetime.combine(row.event_date, row.event_time)
+    start = _to_utc(start, timezone)
+    end = start + DEFAULT_EVENT_DURATION
+    updated_at = row.updated_at or row.created_at
+
+    description = values['description'] or ''
+    if row.requirements:
+        description += f"\n\nPrérequis : {row.requirements}"
+    if row.rewards:
+        description += f"\n\nRécompenses : {row.rewards}"
+
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{_utc_stamp(updated_at)}',
+        f'LAST-MODIFIED:{_utc_stamp(updated_at)}',
+        f'DTSTART:{_utc_stamp(start)}',
+        f'DTEND:{_utc_stamp(end)}',
+        f'SUMMARY:{escape_text(values["title"])}',
+        f'CATEGORIES:{escape_text(row.event_type)}'
+    ]
+    if description.strip():
+        lines.append(f'DESCRIPTION:{escape_text(description.strip())}')
+    if values['location']:
+        lines.append(f'LOCATION:{escape_text(values["location"])}')
+    return ''.join(fold_line(line) + '\r\n' for line in lines)
+
+
+class IcsFeedCache:
+    """Rendered guild and personal feeds with incremental regeneration"""
+
+    def __init__(self, timezone: str = DEFAULT_TIMEZONE,
+                 version_check_seconds: float = DEFAULT_VERSION_CHECK_SECONDS,
+                 past_days: int = DEFAULT_PAST_DAYS, future_days: int = DEFAULT_FUTURE_DAYS):
+        self.timezone = timezone
+        self.version_check_seconds = version_check_seconds
+        self.past_days = past_days
+        self.future_days = future_days
+        self._lock = threading.RLock()
+        self._blocks: Dict[int, _Block] = {}
+        self._guild: Optional[Feed] = None
+        self._users: 'OrderedDict[int, Feed]' = OrderedDict()
+        self._version = None
+        self._checked_at = None
+        self._dirty = True
+        self._dirty_lock = threading.Lock()
+        self._stale_ids = set()  # events to re-render whatever their updated_at
+        self.renders = 0
+
+    def mark_dirty(self, event_ids: Iterable[int] = ()):
+        with self._dirty_lock:
+            self._stale_ids.update(event_ids)
+            self._dirty = True
+
+    def guild_feed(self) -> Feed:
+        with self._lock:
+            self._refresh()
+            if self._guild is None:
+                self._guild = self._assemble(CALENDAR_NAME, [(event_id, 'CONFIRMED') for event_id in self._blocks])
+            return self._guild
+
+    def user_feed(self, user_id: int) -> Feed:
+        with self._lock:
+            self._refresh()
+            feed = self._users.get(user_id)
+            if feed is not None:
+                self._users.move_to_end(user_id)
+                return feed
+
+            rows = db.session.query(EventParticipant.event_id, EventParticipant.status).filter(
+                EventParticipant.user_id == user_id,
+                EventParticipant.status.in_(list(PERSONAL_STATUSES))
+            ).all()
+            entries = [(event_id, PERSONAL_STATUSES[status]) for event_id, status in rows if event_id in self._blocks]
+            feed = self._assemble(f'{CALENDAR_NAME} - mes événements', entries)
+            self._users[user_id] = feed
+            if len(self._users) > MAX_USER_FEEDS:
+                self._users.popitem(last=False)
+            return feed
+
+    # Regeneration
+
+    def _refresh(self):
+        now = time.monotonic()
+        if not self._dirty and self._checked_at is not None and now - self._checked_at < self.version_check_seconds:
+            return
+        with self._dirty_lock:
+            self._dirty = False
+            forced, self._stale_ids = self._stale_ids, set()
+        self._checked_at = now
+
+        version = self._db_version()
+        if version == self._version and not forced:
+            return
+        self._sync_blocks(forced)
+        self._guild = None
+        self._users.clear()
+        self._version = version
+
+    def _db_version(self) -> Tuple:
+        """One round trip: event and participant (max updated_at, count), plus the window start"""
+        row = db.session.query(
+            db.session.query(func.max(GuildEvent.updated_at)).scalar_subquery(),
+            db.session.query(func.count(GuildEvent.id)).scalar_subquery(),
+            db.session.query(func.max(EventParticipant.updated_at)).scalar_subquery(),
+            db.session.query(func.count(EventParticipant.id)).scalar_subquery()
+        ).one()
+        return tuple(row) + (self._window()[0],)
+
+    def _window(self) -> Tuple[date, date]:
+        today = datetime.utcnow().date()
+        return today - timedelta(days=self.past_days), today + timedelta(days=self.future_days)
+
+    def _sync_blocks(self, forced: Set[int]):
+        """Re-render only events whose updated_at changed or that are ``forced``, and series whose window moved"""
+        window = self._window()
+        current = {
+            event_id: (updated_at, rule is not None)
+            for event_id, updated_at, rule in db.session.query(
+                GuildEvent.id, GuildEvent.updated_at, GuildEvent.recurrence_rule
+            ).filter(db.or_(
+                db.and_(GuildEvent.recurrence_rule.is_(None), GuildEvent.event_date >= window[0]),
+                db.and_(
+                    GuildEvent.recurrence_rule.isnot(None),
+                    GuildEvent.event_date <= window[1],
+                    db.or_(GuildEvent.recurrence_end.is_(None), GuildEvent.recurrence_end >= window[0])
+                )
+            )).all()
+        }
+
+        for event_id in list(self._blocks):
+            if event_id not in current:
+                del self._blocks[event_id]
+
+        stale = [
+            event_id for event_id, (updated_at, recurring) in current.items()
+            if event_id in forced or event_id not in self._blocks or self._blocks[event_id].updated_at != updated_at
+            or (recurring and self._blocks[event_id].window != window)
+        ]
+        unsettled_after = datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+        for start in range(0, len(stale), 500):
+            rows = db.session.query(GuildEvent).filter(GuildEvent.id.in_(stale[start:start + 500])).all()
+            overrides = load_overrides((row.id for row in rows if row.recurrence_rule), *window)
+            for row in rows:
+                updated_at = current[row.id][0]
+                self._blocks[row.id] = self._render(row, updated_at, window, overrides.get(row.id, {}))
+                self.renders += 1
+                if updated_at is not None and updated_at > unsettled_after:
+                    with self._dirty_lock:
+                        self._stale_ids.add(row.id)
+
+    def _render(self, row, updated_at: datetime, window: Tuple[date, date], overrides) -> _Block:
+        if not row.recurrence_rule:
+            vevent = ((row.event_date, row.event_time, row.id), render_vevent(row, self.timezone))
+            return _Block(updated_at, None, (vevent,))
+        occurrences = recurrence.expand(
+            row.id, row.event_date, row.event_time, recurrence.parse_rule(row.recurrence_rule),
+            overrides, *window
+        )
+        return _Block(updated_at, window, tuple(
+            (recurrence.sort_key(occurrence), render_vevent(row, self.timezone, occurrence))
+            for occurrence in occurrences
+        ))
+
+    def _assemble(self, name: str, entries: List[Tuple[int, str]]) -> Feed:
+        parts = [
+            'BEGIN:VCALENDAR\r\n',
+            'VERSION:2.0\r\n',
+            'PRODID:-//Wild Wolf Guild//Events//FR\r\n',
+            'CALSCALE:GREGORIAN\r\n',
+            'METHOD:PUBLISH\r\n',
+            fold_line(f'X-WR-CALNAME:{escape_text(name)}') + '\r\n',
+            f'X-WR-TIMEZONE:{self.timezone}\r\n',
+            'REFRESH-INTERVAL;VALUE=DURATION:PT1H\r\n',
+            'X-PUBLISHED-TTL:PT1H\r\n'
+        ]
+        last_modified = None
+        vevents = []
+        for event_id, status in entries:
+            block = self._blocks[event_id]
+            vevents.extend((sort_key, text, status) for sort_key, text in block.vevents)
+            if last_modified is None or block.updated_at > last_modified:
+                last_modified = block.updated_at
+        vevents.sort(key=lambda vevent: vevent[0])
+        for _, text, status in vevents:
+            parts.append(text)
+            parts.append(f'STATUS:{status}\r\nEND:VEVENT\r\n')
+        parts.append('END:VCALENDAR\r\n')
+
+        body = ''.join(parts).encode('utf-8')
+        return Feed(body, hashlib.sha256(body).hexdigest(), last_modified)
+
+
+feed_cache = IcsFeedCache()
+
+
+def configure_ics_feeds(app):
+    feed_cache.timezone = app.config.get('EVENT_TIMEZONE', DEFAULT_TIMEZONE)
+    feed_cache.version_check_seconds = app.config.get('ICS_VERSION_CHECK_SECONDS', DEFAULT_VERSION_CHECK_SECONDS)
+    feed_cache.past_days = app.config.get('ICS_PAST_DAYS', DEFAULT_PAST_DAYS)
+    feed_cache.future_days = app.config.get('ICS_FUTURE_DAYS', DEFAULT_FUTURE_DAYS)
+
+
+# In-process change detection: flag the session, act once it commits
+
+@event.listens_for(GuildEvent, 'after_insert')
+@event.listens_for(GuildEvent, 'after_update')
+@event.listens_for(GuildEvent, 'after_delete')
+@event.listens_for(EventParticipant, 'after_insert')
+@event.listens_for(EventParticipant, 'after_update')
+@event.listens_for(EventParticipant, 'after_delete')
+@event.listens_for(EventOccurrenceOverride, 'after_insert')
+@event.listens_for(EventOccurrenceOverride, 'after_update')
+@event.listens_for(EventOccurrenceOverride, 'after_delete')
+def _event_flushed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        changed = session.info.setdefault(_SESSION_KEY, set())
+        if isinstance(target, GuildEvent):
+            changed.add(target.id)
+        elif isinstance(target, EventOccurrenceOverride):
+            changed.add(target.event_id)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_statement(state):
+    # RSVPs use UPDATE/DELETE statements, which skip the mapper events above
+    if (state.is_update or state.is_delete) and state.bind_mapper is not None \
+            and state.bind_mapper.class_ in (GuildEvent, EventParticipant):
+        state.session.info.setdefault(_SESSION_KEY, set())
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    changed = session.info.pop(_SESSION_KEY, None)
+    if changed is not None:
+        feed_cache.mark_dirty(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,143 @@
+"""
+Concurrency load test for event RSVPs (``manage.py load-test-rsvp``).
+
+Creates a throwaway event and members, fires all sign-ups at once from a
+thread pool, then cancels some attendees concurrently, and checks the
+invariants: never more attendees than seats, attending_count equal to the
+attending rows, and waitlisted members promoted in order. Everything it
+creates is deleted afterwards.
+"""
+
+import statistics
+import threading
+import time
+import uuid
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from models import EventParticipant, GuildEvent, User, db
+from events.rsvp import ATTENDING, WAITLISTED, cancel, rsvp
+from members.search import member_index
+
+
+def _timed(app, start: threading.Event, operation: Callable, *args) -> Dict[str, Any]:
+    with app.app_context():
+        start.wait()
+        started = time.perf_counter()
+        try:
+            result = operation(*args)
+            error = None
+        except Exception as e:
+            result, error = None, f"{e.__class__.__name__}: {e}"
+        finally:
+            db.session.remove()
+        return {'result': result, 'error': error, 'seconds': time.perf_counter() - started}
+
+
+def _fire(app, workers: int, operation: Callable, calls: List[tuple]) -> Dict[str, Any]:
+    # Workers block until every call is queued, then all start at once
+    start = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_timed, app, start, operation, *args) for args in calls]
+        started = time.perf_counter()
+        start.set()
+        outcomes = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(outcome['seconds'] for outcome in outcomes)
+    return {
+        'outcomes': outcomes,
+        'requests': len(calls),
+        'errors': [outcome['error'] for outcome in outcomes if outcome['error']],
+        'per_second': round(len(calls) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1) if latencies else None
+    }
+
+
+def _state(event_id: int) -> Dict[str, Any]:
+    rows = db.session.query(
+        EventParticipant.user_id, EventParticipant.status, EventParticipant.waitlisted_at, EventParticipant.id
+    ).filter(EventParticipant.event_id == event_id).all()
+    waitlist = sorted((row for row in rows if row.status == WAITLISTED), key=lambda row: (row.waitlisted_at, row.id))
+    return {
+        'counter': db.session.query(GuildEvent.attending_count).filter(GuildEvent.id == event_id).scalar(),
+        'attending': {row.user_id for row in rows if row.status == ATTENDING},
+        'waitlist': [row.user_id for row in waitlist]
+    }
+
+
+def run_rsvp_load_test(app, members: int = 300, capacity: int = 50, workers: int = 50,
+                       cancellations: int = 25) -> Dict[str, Any]:
+    """Run the RSVP load test against the app's database and return a report"""
+    tag = uuid.uuid4().hex[:8]
+    failures = []
+    now = datetime.utcnow()
+
+    with app.app_context():
+        users = [
+            User(username=f'rsvp-load-{tag}-{index}', email=f'rsvp-load-{tag}-{index}@example.invalid')
+            for index in range(members)
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        event = GuildEvent(
+            title=f'RSVP load test {tag}', event_date=now.date(), event_time=now.time(), event_type='other',
+            max_participants=capacity, created_by=users[0].id
+        )
+        db.session.add(event)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+        event_id = event.id
+
+    try:
+        joins = _fire(app, workers, rsvp, [(event_id, user_id) for user_id in user_ids])
+        with app.app_context():
+            after_joins = _state(event_id)
+
+        expected_attending = min(capacity, members)
+        if len(after_joins['attending']) != expected_attending:
+            failures.append(f"{len(after_joins['attending'])} attending after sign-ups, expected {expected_attending}")
+        if after_joins['counter'] != len(after_joins['attending']):
+            failures.append(f"attending_count {after_joins['counter']} != {len(after_joins['attending'])} attending rows")
+        if len(after_joins['waitlist']) != members - expected_attending:
+            failures.append(f"{len(after_joins['waitlist'])} waitlisted, expected {members - expected_attending}")
+        reported_seats = sum(1 for outcome in joins['outcomes'] if outcome['result'] and outcome['result']['status'] == ATTENDING)
+        if reported_seats != len(after_joins['attending']):
+            failures.append(f"{reported_seats} sign-ups reported a seat, {len(after_joins['attending'])} hold one")
+
+        leaving = sorted(after_joins['attending'])[:cancellations]
+        cancels = _fire(app, workers, cancel, [(event_id, user_id) for user_id in leaving])
+        with app.app_context():
+            after_cancels = _state(event_id)
+
+        promoted = after_joins['waitlist'][:len(leaving)]
+        expected = (after_joins['attending'] - set(leaving)) | set(promoted)
+        if after_cancels['attending'] != expected:
+            failures.append('attendees after cancellations do not match first-come waitlist promotion')
+        if after_cancels['counter'] != len(after_cancels['attending']):
+            failures.append(f"attending_count {after_cancels['counter']} != {len(after_cancels['attending'])} attending rows after cancellations")
+
+        for name, run in (('sign-ups', joins), ('cancellations', cancels)):
+            if run['errors']:
+                failures.append(f"{len(run['errors'])} {name} failed, first: {run['errors'][0]}")
+    finally:
+        with app.app_context():
+            db.session.query(EventParticipant).filter(EventParticipant.event_id == event_id).delete(synchronize_session=False)
+            db.session.query(GuildEvent).filter(GuildEvent.id == event_id).delete(synchronize_session=False)
+            db.session.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+            db.session.commit()
+        for user_id in user_ids:
+            member_index.remove(user_id)
+
+    strip = lambda run: {key: value for key, value in run.items() if key not in ('outcomes', 'errors')}
+    return {
+        'ok': not failures,
+        'failures': failures,
+        'members': members,
+        'capacity': capacity,
+        'workers': workers,
+        'sign_ups': strip(joins),
+        'cancellations': strip(cancels)
+    }
@@ -0,0 +1,192 @@
+"""
+Event listing queries.
+
+Events are read as a column projection over the (event_date, event_time)
+index, and participants for the whole result set come from a single query
+on event_participants, so a month view costs two queries however many
+events it holds.
+
+Recurring events are stored once and expanded lazily for the requested
+window (see events.recurrence); their overrides come from one more query.
+One-off events and every series' occurrences are merged in start order and
+cut at ``limit``, so no more occurrences are generated than are returned.
+Recurring events take no new RSVPs (see events.rsvp); participants from
+before that belong to the series, not to individual occurrences.
+"""
+
+from collections import defaultdict
+from datetime import date
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from models import EventOccurrenceOverride, EventParticipant, GuildEvent, db
+from events import recurrence
+
+STATUSES = ('attending', 'maybe', 'declined', 'waitlisted')
+
+EVENT_COLUMNS = (
+    GuildEvent.id, GuildEvent.title, GuildEvent.description, GuildEvent.event_date,
+    GuildEvent.event_time, GuildEvent.event_type, GuildEvent.max_participants,
+    GuildEvent.location, GuildEvent.created_by, GuildEvent.created_at,
+    GuildEvent.recurrence_rule, GuildEvent.recurrence_end
+)
+
+
+def events_in_range(start: date, end: Optional[date] = None, event_type: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[Any]:
+    """One-off events with start <= event_date <= end, in chronological order"""
+    query = db.session.query(*EVENT_COLUMNS).filter(
+        GuildEvent.recurrence_rule.is_(None),
+        GuildEvent.event_date >= start
+    )
+    if end is not None:
+        query = query.filter(GuildEvent.event_date <= end)
+    if event_type:
+        query = query.filter(GuildEvent.event_type == event_type)
+    query = query.order_by(GuildEvent.event_date, GuildEvent.event_time, GuildEvent.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def series_in_range(start: date, end: Optional[date] = None, event_type: Optional[str] = None) -> List[Any]:
+    """Recurring events that may have occurrences between start and end"""
+    query = db.session.query(*EVENT_COLUMNS).filter(
+        GuildEvent.recurrence_rule.isnot(None),
+        db.or_(GuildEvent.recurrence_end.is_(None), GuildEvent.recurrence_end >= start)
+    )
+    if end is not None:
+        query = query.filter(GuildEvent.event_date <= end)
+    if event_type:
+        query = query.filter(GuildEvent.event_type == event_type)
+    return query.all()
+
+
+def load_overrides(event_ids: Iterable[int], start: date,
+                   end: Optional[date] = None) -> Dict[int, Dict[date, recurrence.Override]]:
+    """Overrides whose original or new date falls in the window, per series"""
+    event_ids = list(event_ids)
+    overrides = defaultdict(dict)
+    if not event_ids:
+        return overrides
+
+    def in_window(column):
+        return column >= start if end is None else column.between(start, end)
+
+    rows = db.session.query(EventOccurrenceOverride).filter(
+        EventOccurrenceOverride.event_id.in_(event_ids),
+        db.or_(in_window(EventOccurrenceOverride.occurrence_date), in_window(EventOccurrenceOverride.event_date))
+    ).all()
+    for row in rows:
+        overrides[row.event_id][row.occurrence_date] = to_override(row)
+    return overrides
+
+
+def to_override(row) -> recurrence.Override:
+    return recurrence.Override(
+        row.occurrence_date, row.is_cancelled, row.event_date, row.event_time,
+        {field: getattr(row, field) for field in recurrence.OVERRIDE_FIELDS}
+    )
+
+
+def occurrences(start: date, end: Optional[date] = None, event_type: Optional[str] = None,
+                limit: Optional[int] = None):
+    """(row, occurrence) pairs for one-off events and series occurrences, in start order
+
+    Open-ended listings must pass ``limit``: an open-ended series has no last
+    occurrence.
+    """
+    if end is None and limit is None:
+        raise ValueError('An end date or a limit is required')
+
+    rows = {}
+    one_offs = events_in_range(start, end, event_type, limit)
+    streams = [(recurrence.Occurrence(row.event_date, row.event_time, row.id, None) for row in one_offs)]
+    rows.update((row.id, row) for row in one_offs)
+
+    series = series_in_range(start, end, event_type)
+    overrides = load_overrides((row.id for row in series), start, end)
+    for row in series:
+        rows[row.id] = row
+        streams.append(recurrence.expand(
+            row.id, row.event_date, row.event_time, recurrence.parse_rule(row.recurrence_rule),
+            overrides.get(row.id, {}), start, end
+        ))
+
+    return [(rows[occurrence.event_id], occurrence)
+            for occurrence in islice(recurrence.merge(*streams), limit)]
+
+
+def _empty_summary() -> Dict[str, Any]:
+    return {'participants': [], 'counts': dict.fromkeys(STATUSES, 0)}
+
+
+def participant_summaries(event_ids: Iterable[int], include_ids: bool = True) -> Dict[int, Dict[str, Any]]:
+    """Participant ids and per-status counts for many events at once
+
+    With ``include_ids`` the (event_id, status, user_id) rows are fetched in
+    one query and counted here; otherwise only a grouped count runs.
+    """
+    event_ids = list(event_ids)
+    summaries = defaultdict(_empty_summary)
+    if not event_ids:
+        return summaries
+
+    if include_ids:
+        rows = db.session.query(
+            EventParticipant.event_id, EventParticipant.status, EventParticipant.user_id
+        ).filter(EventParticipant.event_id.in_(event_ids)).order_by(
+            EventParticipant.event_id, EventParticipant.id
+        ).all()
+        for event_id, status, user_id in rows:
+            summary = summaries[event_id]
+            summary['participants'].append(user_id)
+            status = status or 'attending'
+            summary['counts'][status] = summary['counts'].get(status, 0) + 1
+    else:
+        rows = db.session.query(
+            EventParticipant.event_id, EventParticipant.status, func.count(EventParticipant.id)
+        ).filter(EventParticipant.event_id.in_(event_ids)).group_by(
+            EventParticipant.event_id, EventParticipant.status
+        ).all()
+        for event_id, status, count in rows:
+            counts = summaries[event_id]['counts']
+            status = status or 'attending'
+            counts[status] = counts.get(status, 0) + count
+
+    return summaries
+
+
+def serialize_event(row, summary: Dict[str, Any], include_ids: bool = True,
+                    occurrence: Optional[recurrence.Occurrence] = None) -> Dict[str, Any]:
+    event_date = occurrence.event_date if occurrence else row.event_date
+    event_time = occurrence.event_time if occurrence else row.event_time
+    data = {
+        'id': row.id,
+        'title': row.title,
+        'description': row.description,
+        'event_date': event_date.isoformat(),
+        'event_time': event_time.strftime('%H:%M'),
+        'event_type': row.event_type,
+        'max_participants': row.max_participants,
+        'location': row.location,
+        'participant_counts': summary['counts'],
+        'created_by': row.created_by,
+        'created_at': row.created_at.isoformat(),
+        'recurrence_rule': row.recurrence_rule,
+        'occurrence_date': None
+    }
+    if occurrence is not None and occurrence.occurrence_date is not None:
+        data['occurrence_date'] = occurrence.occurrence_date.isoformat()
+        recurrence.apply_override(data, occurrence)
+    if include_ids:
+        data['participants'] = summary['participants']
+    return data
+
+
+def list_events(start: date, end: Optional[date] = None, event_type: Optional[str] = None,
+                limit: Optional[int] = None, include_ids: bool = True) -> List[Dict[str, Any]]:
+    pairs = occurrences(start, end, event_type, limit)
+    summaries = participant_summaries({row.id for row, _ in pairs}, include_ids)
+    return [serialize_event(row, summaries[row.id], include_ids, occurrence) for row, occurrence in pairs]
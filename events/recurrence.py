@@ -0,0 +1,259 @@
+"""
+Recurrence rules and lazy occurrence expansion for guild events.
+
+A recurring GuildEvent stores a small RRULE subset (FREQ=DAILY/WEEKLY/
+MONTHLY, INTERVAL, BYDAY for weekly rules, COUNT or UNTIL) instead of one
+row per occurrence. Occurrences are generated on demand for the requested
+window: open-ended rules jump straight to the window start, so expanding
+next month of a weekly raid that began years ago costs the same as
+expanding its first month. Nothing is ever materialized; consumers bound
+the generators with a window end or ``itertools.islice``.
+
+Individual occurrences can be cancelled or overridden (moved, retitled)
+through EventOccurrenceOverride rows, keyed by the occurrence's original
+date.
+
+This module is plain Python with no Flask or database imports so the
+Discord bot can use it too.
+"""
+
+import calendar
+import heapq
+from datetime import MAXYEAR, date, time, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterator, Mapping, NamedTuple, Optional, Tuple
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+MAX_INTERVAL = 366
+MAX_COUNT = 1000
+
+# Fields an override may replace on a single occurrence
+OVERRIDE_FIELDS = ('title', 'description', 'location')
+
+
+class RecurrenceRule(NamedTuple):
+    freq: str
+    interval: int = 1
+    byday: Tuple[int, ...] = ()  # weekdays (0 = Monday) for WEEKLY rules
+    count: Optional[int] = None
+    until: Optional[date] = None
+
+
+class Override(NamedTuple):
+    occurrence_date: date  # the original date, which identifies the occurrence
+    cancelled: bool = False
+    event_date: Optional[date] = None
+    event_time: Optional[time] = None
+    fields: Mapping[str, Any] = {}
+
+
+class Occurrence(NamedTuple):
+    event_date: date
+    event_time: time
+    event_id: int
+    occurrence_date: Optional[date]  # None for one-off events
+    override: Optional[Override] = None
+
+
+def parse_rule(text: str) -> RecurrenceRule:
+    """Parse an RRULE string such as 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH'"""
+    if text.upper().startswith('RRULE:'):
+        text = text[6:]
+    parts = {}
+    for part in text.split(';'):
+        if not part.strip():
+            continue
+        key, _, value = part.partition('=')
+        parts[key.strip().upper()] = value.strip().upper()
+
+    unsupported = set(parts) - {'FREQ', 'INTERVAL', 'BYDAY', 'COUNT', 'UNTIL'}
+    if unsupported:
+        raise ValueError(f"Unsupported recurrence parts: {', '.join(sorted(unsupported))}")
+
+    freq = parts.get('FREQ')
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+
+    interval = int(parts.get('INTERVAL', 1))
+    if not 1 <= interval <= MAX_INTERVAL:
+        raise ValueError(f"INTERVAL must be between 1 and {MAX_INTERVAL}")
+
+    byday = ()
+    if 'BYDAY' in parts:
+        if freq != 'WEEKLY':
+            raise ValueError("BYDAY is only supported for WEEKLY rules")
+        try:
+            byday = tuple(sorted({WEEKDAYS.index(day) for day in parts['BYDAY'].split(',')}))
+        except ValueError:
+            raise ValueError("BYDAY must list weekdays such as MO,WE,FR")
+
+    count = int(parts['COUNT']) if 'COUNT' in parts else None
+    if count is not None and not 1 <= count <= MAX_COUNT:
+        raise ValueError(f"COUNT must be between 1 and {MAX_COUNT}")
+
+    until = None
+    if 'UNTIL' in parts:
+        value = parts['UNTIL'][:8]
+        until = date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+
+    if count is not None and until is not None:
+        raise ValueError("COUNT and UNTIL cannot be combined")
+
+    return RecurrenceRule(freq, interval, byday, count, until)
+
+
+def format_rule(rule: RecurrenceRule) -> str:
+    parts = [f'FREQ={rule.freq}']
+    if rule.interval != 1:
+        parts.append(f'INTERVAL={rule.interval}')
+    if rule.byday:
+        parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in rule.byday))
+    if rule.count is not None:
+        parts.append(f'COUNT={rule.count}')
+    if rule.until is not None:
+        parts.append(f'UNTIL={rule.until.strftime("%Y%m%d")}')
+    return ';'.join(parts)
+
+
+def _add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def _iter_from(start: date, rule: RecurrenceRule, first: date) -> Iterator[date]:
+    """Occurrence dates on or after ``first`` (>= start), ignoring COUNT"""
+    interval = rule.interval
+
+    if rule.freq == 'DAILY':
+        steps = -(-(first - start).days // interval)  # ceil
+        current = start + timedelta(days=steps * interval)
+        while True:
+            yield current
+            current += timedelta(days=interval)
+
+    elif rule.freq == 'WEEKLY':
+        weekdays = rule.byday or (start.weekday(),)
+        start_monday = start - timedelta(days=start.weekday())
+        week = (first - start_monday).days // 7
+        week = -(-week // interval) * interval  # first active week at or after `first`
+        while True:
+            monday = start_monday + timedelta(weeks=week)
+            for weekday in weekdays:
+                current = monday + timedelta(days=weekday)
+                if current >= first:
+                    yield current
+            week += interval
+
+    else:  # MONTHLY, on the start's day of month; months without that day are skipped
+        months = (first.year - start.year) * 12 + first.month - start.month
+        months = max(-(-months // interval) * interval, 0)
+        while True:
+            year, month = _add_months(start.year, start.month, months)
+            if year > MAXYEAR:
+                return
+            if start.day <= calendar.monthrange(year, month)[1]:
+                current = date(year, month, start.day)
+                if current >= first:
+                    yield current
+            months += interval
+
+
+def iter_occurrence_dates(start: date, rule: RecurrenceRule, window_start: date,
+                          window_end: Optional[date] = None) -> Iterator[date]:
+    """Occurrence dates within [window_start, window_end], in order
+
+    Unbounded when neither ``window_end``, UNTIL nor COUNT is set; callers
+    must then bound the iteration themselves.
+    """
+    if rule.count is not None:
+        # COUNT numbers occurrences from the start, so walk from there (at most MAX_COUNT)
+        source = islice(_iter_from(start, rule, start), rule.count)
+    else:
+        source = _iter_from(start, rule, max(start, window_start))
+
+    try:
+        for current in source:
+            if (window_end is not None and current > window_end) or (rule.until is not None and current > rule.until):
+                return
+            if current >= window_start:
+                yield current
+    except OverflowError:
+        return  # stepped past date.max
+
+
+def last_occurrence(start: date, rule: RecurrenceRule) -> Optional[date]:
+    """The final occurrence date, or None for open-ended rules
+
+    Raises ValueError when UNTIL allows more than MAX_COUNT occurrences,
+    the same limit COUNT has.
+    """
+    if rule.until is not None:
+        dates = list(islice(iter_occurrence_dates(start, rule, start, rule.until), MAX_COUNT + 1))
+        if len(dates) > MAX_COUNT:
+            raise ValueError(f"UNTIL must leave at most {MAX_COUNT} occurrences")
+        return dates[-1] if dates else None
+    if rule.count is not None:
+        last = None
+        for last in iter_occurrence_dates(start, rule, start):
+            pass
+        return last
+    return None
+
+
+def is_occurrence(start: date, rule: RecurrenceRule, value: date) -> bool:
+    return next(iter_occurrence_dates(start, rule, value, value), None) == value
+
+
+def expand(event_id: int, start: date, start_time: time, rule: RecurrenceRule,
+           overrides: Mapping[date, Override], window_start: date,
+           window_end: Optional[date] = None) -> Iterator[Occurrence]:
+    """Occurrences of one series within the window, ordered by date and time
+
+    ``overrides`` maps original occurrence dates to overrides; it should
+    contain every override whose original or new date falls in the window.
+    Cancelled occurrences are skipped and moved ones appear at their new
+    date and time.
+    """
+    def in_window(value: date) -> bool:
+        return value >= window_start and (window_end is None or value <= window_end)
+
+    moved = []
+    for override in overrides.values():
+        if override.cancelled or not is_occurrence(start, rule, override.occurrence_date):
+            continue
+        new_date = override.event_date or override.occurrence_date
+        new_time = override.event_time or start_time
+        if (new_date, new_time) != (override.occurrence_date, start_time) and in_window(new_date):
+            moved.append(Occurrence(new_date, new_time, event_id, override.occurrence_date, override))
+    moved.sort(key=sort_key)
+
+    def regular():
+        for current in iter_occurrence_dates(start, rule, window_start, window_end):
+            override = overrides.get(current)
+            if override is not None:
+                if override.cancelled:
+                    continue
+                if (override.event_date or current, override.event_time or start_time) != (current, start_time):
+                    continue  # yielded from `moved` at its new slot
+            yield Occurrence(current, start_time, event_id, current, override)
+
+    return heapq.merge(regular(), moved, key=sort_key)
+
+
+def sort_key(occurrence: Occurrence):
+    return occurrence.event_date, occurrence.event_time, occurrence.event_id
+
+
+def merge(*streams: Iterator[Occurrence]) -> Iterator[Occurrence]:
+    """Merge already-ordered occurrence streams lazily"""
+    return heapq.merge(*streams, key=sort_key)
+
+
+def apply_override(values: Dict[str, Any], occurrence: Occurrence) -> Dict[str, Any]:
+    """Overlay an occurrence's overridden fields onto the series' values"""
+    override = occurrence.override
+    if override is not None:
+        values.update({field: value for field, value in override.fields.items() if value is not None})
+    return values
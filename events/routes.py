@@ -0,0 +1,306 @@
+from flask import Blueprint, request, jsonify, Response, current_app, url_for
+from itsdangerous import BadSignature, URLSafeSerializer
+from models import EventOccurrenceOverride, GuildEvent, db
+from utils import token_required, role_required
+from events import recurrence
+from events.queries import list_events
+from events.rsvp import EventNotFound, rsvp, cancel
+from events.ics import feed_cache
+from auth.principals import load_principal
+from datetime import datetime, timedelta
+import calendar
+import logging
+
+events_bp = Blueprint('events', __name__)
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_LIMIT = 100
+MAX_EVENT_LIMIT = 500
+MAX_CALENDAR_DAYS = 93
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+@events_bp.route('', methods=['GET'])
+@token_required
+def get_events(current_user):
+    """Get upcoming events
+    
+    Optional ``start``/``end`` (YYYY-MM-DD) bound the range; results are
+    capped at ``limit`` events, with ``has_more`` set when there are more.
+    """
+    try:
+        try:
+            start = _parse_date(request.args['start']) if request.args.get('start') else datetime.utcnow().date()
+            end = _parse_date(request.args['end']) if request.args.get('end') else None
+        except ValueError:
+            return jsonify({'message': 'Dates must be YYYY-MM-DD'}), 400
+        limit = min(max(request.args.get('limit', DEFAULT_EVENT_LIMIT, type=int), 1), MAX_EVENT_LIMIT)
+        
+        events_data = list_events(start, end, request.args.get('type'), limit + 1)
+        
+        return jsonify({
+            'events': events_data[:limit],
+            'has_more': len(events_data) > limit
+        })
+    except Exception as e:
+        logger.error(f"Error fetching events: {str(e)}")
+        return jsonify({'message': 'Error fetching events'}), 500
+
+@events_bp.route('/calendar', methods=['GET'])
+@token_required
+def get_calendar(current_user):
+    """Get events for a date range, grouped by day
+    
+    Pass either ``month`` (YYYY-MM) or ``start`` and ``end`` (YYYY-MM-DD,
+    at most 93 days apart). ``participants=0`` returns counts only.
+    """
+    try:
+        try:
+            if request.args.get('month'):
+                month = datetime.strptime(request.args['month'], '%Y-%m').date()
+                start = month
+                end = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+            else:
+                start = _parse_date(request.args.get('start', ''))
+                end = _parse_date(request.args.get('end', ''))
+        except ValueError:
+            return jsonify({'message': 'Provide month=YYYY-MM or start and end as YYYY-MM-DD'}), 400
+        
+        if end < start:
+            return jsonify({'message': 'end must not be before start'}), 400
+        if end - start > timedelta(days=MAX_CALENDAR_DAYS):
+            return jsonify({'message': f'Range cannot exceed {MAX_CALENDAR_DAYS} days'}), 400
+        
+        include_ids = request.args.get('participants', '1') != '0'
+        events_data = list_events(start, end, request.args.get('type'), include_ids=include_ids)
+        
+        days = {}
+        for event in events_data:
+            days.setdefault(event['event_date'], []).append(event['id'])
+        
+        return jsonify({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'events': events_data,
+            'days': days
+        })
+    except Exception as e:
+        logger.error(f"Error fetching calendar: {str(e)}")
+        return jsonify({'message': 'Error fetching calendar'}), 500
+
+@events_bp.route('', methods=['POST'])
+@token_required
+@role_required('Officier')
+def create_event(current_user):
+    """Create an event
+    
+    An optional ``recurrence_rule`` (e.g. ``FREQ=WEEKLY;BYDAY=TU,TH``) makes
+    it a series starting at ``event_date``; occurrences are expanded on read.
+    """
+    try:
+        data = request.get_json()
+        
+        new_event = GuildEvent(
+            title=data['title'],
+            description=data.get('description', ''),
+            event_date=datetime.strptime(data['event_date'], '%Y-%m-%d').date(),
+            event_time=datetime.strptime(data['event_time'], '%H:%M').time(),
+            event_type=data['event_type'],
+            max_participants=data.get('max_participants'),
+            created_by=current_user.id
+        )
+        
+        if data.get('recurrence_rule'):
+            try:
+                rule = recurrence.parse_rule(data['recurrence_rule'])
+                # Last occurrence; a rule that never matches ends at its start
+                last = recurrence.last_occurrence(new_event.event_date, rule)
+            except ValueError as e:
+                return jsonify({'message': f'Invalid recurrence_rule: {e}'}), 400
+            new_event.recurrence_rule = recurrence.format_rule(rule)
+            if rule.count is not None or rule.until is not None:
+                new_event.recurrence_end = last or new_event.event_date
+        
+        db.session.add(new_event)
+        db.session.commit()
+        
+        return jsonify({'message': 'Event created successfully', 'event_id': new_event.id}), 201
+    except Exception as e:
+        logger.error(f"Error creating event: {str(e)}")
+        return jsonify({'message': 'Error creating event'}), 500
+
+@events_bp.route('/<int:event_id>/occurrences/<occurrence_date>', methods=['PUT'])
+@token_required
+@role_required('Officier')
+def override_occurrence(current_user, event_id, occurrence_date):
+    """Cancel, move or retitle one occurrence of a recurring event
+    
+    Accepts ``cancelled``, ``event_date``, ``event_time``, ``title``,
+    ``description`` and ``location``; omitted fields keep the series' value.
+    """
+    try:
+        event = GuildEvent.query.get(event_id)
+        if event is None:
+            return jsonify({'message': 'Event not found'}), 404
+        if not event.recurrence_rule:
+            return jsonify({'message': 'Event is not recurring'}), 400
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            original = _parse_date(occurrence_date)
+            new_date = _parse_date(data['event_date']) if data.get('event_date') else None
+            new_time = datetime.strptime(data['event_time'], '%H:%M').time() if data.get('event_time') else None
+        except ValueError:
+            return jsonify({'message': 'Dates must be YYYY-MM-DD and times HH:MM'}), 400
+        if not recurrence.is_occurrence(event.event_date, recurrence.parse_rule(event.recurrence_rule), original):
+            return jsonify({'message': 'No occurrence on that date'}), 404
+        
+        override = EventOccurrenceOverride.query.filter_by(event_id=event_id, occurrence_date=original).first()
+        if override is None:
+            override = EventOccurrenceOverride(event_id=event_id, occurrence_date=original)
+            db.session.add(override)
+        override.is_cancelled = bool(data.get('cancelled', False))
+        override.event_date = new_date
+        override.event_time = new_time
+        for field in recurrence.OVERRIDE_FIELDS:
+            setattr(override, field, data.get(field))
+        
+        # Feeds and the bot detect changes through the series' updated_at
+        event.updated_at = datetime.utcnow()
+        db.session.commit()
+        
+        return jsonify({'message': 'Occurrence updated', 'occurrence_date': original.isoformat()})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating occurrence: {str(e)}")
+        return jsonify({'message': 'Error updating occurrence'}), 500
+
+@events_bp.route('/<int:event_id>/occurrences/<occurrence_date>', methods=['DELETE'])
+@token_required
+@role_required('Officier')
+def reset_occurrence(current_user, event_id, occurrence_date):
+    """Restore one occurrence of a recurring event to the series' values"""
+    try:
+        try:
+            original = _parse_date(occurrence_date)
+        except ValueError:
+            return jsonify({'message': 'Dates must be YYYY-MM-DD'}), 400
+        
+        override = EventOccurrenceOverride.query.filter_by(event_id=event_id, occurrence_date=original).first()
+        if override is None:
+            return jsonify({'message': 'Occurrence has no override'}), 404
+        
+        db.session.delete(override)
+        override.event.updated_at = datetime.utcnow()
+        db.session.commit()
+        
+        return jsonify({'message': 'Occurrence restored'})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error restoring occurrence: {str(e)}")
+        return jsonify({'message': 'Error restoring occurrence'}), 500
+
+@events_bp.route('/<int:event_id>/join', methods=['POST'])
+@token_required
+def join_event(current_user, event_id):
+    """RSVP to an event
+    
+    ``status`` defaults to attending; when the event is full the member is
+    waitlisted and promoted automatically when a seat frees up. Recurring
+    events are refused (400) until RSVPs can be tracked per occurrence.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            result = rsvp(event_id, current_user.id, data.get('status', 'attending'))
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        if result['status'] == 'waitlisted':
+            message = f"Event is full, you are #{result['waitlist_position']} on the waitlist"
+        else:
+            message = f"RSVP saved: {result['status']}"
+        
+        return jsonify(dict(result, message=message))
+    except EventNotFound:
+        return jsonify({'message': 'Event not found'}), 404
+    except Exception as e:
+        logger.error(f"Error joining event: {str(e)}")
+        return jsonify({'message': 'Error joining event'}), 500
+
+@events_bp.route('/<int:event_id>/join', methods=['DELETE'])
+@token_required
+def leave_event(current_user, event_id):
+    """Cancel an RSVP, promoting the next waitlisted member"""
+    try:
+        result = cancel(event_id, current_user.id)
+        
+        return jsonify(dict(result, message='RSVP cancelled' if result['changed'] else 'No RSVP to cancel'))
+    except EventNotFound:
+        return jsonify({'message': 'Event not found'}), 404
+    except Exception as e:
+        logger.error(f"Error leaving event: {str(e)}")
+        return jsonify({'message': 'Error leaving event'}), 500
+
+# Calendar feeds. Calendar apps cannot send an Authorization header, so
+# feed URLs carry a signed key identifying the member instead.
+
+def _feed_serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='ics-feed')
+
+def _feed_member():
+    """The active member a feed key belongs to, or None"""
+    try:
+        user_id = _feed_serializer().loads(request.args.get('key', ''))
+    except BadSignature:
+        return None
+    principal = load_principal(user_id)
+    if principal is None or not principal.is_active:
+        return None
+    return principal
+
+def _feed_response(feed):
+    response = Response(feed.body, mimetype='text/calendar')
+    response.set_etag(feed.etag)
+    if feed.last_modified:
+        response.last_modified = feed.last_modified
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    # Answers If-None-Match / If-Modified-Since with a bodyless 304
+    return response.make_conditional(request)
+
+@events_bp.route('/feed-links', methods=['GET'])
+@token_required
+def get_feed_links(current_user):
+    """Get the member's calendar subscription URLs"""
+    key = _feed_serializer().dumps(current_user.id)
+    return jsonify({
+        'guild': url_for('events.guild_calendar_feed', key=key, _external=True),
+        'personal': url_for('events.personal_calendar_feed', key=key, _external=True)
+    })
+
+@events_bp.route('/calendar.ics', methods=['GET'])
+def guild_calendar_feed():
+    """All guild events as an iCalendar feed"""
+    try:
+        if _feed_member() is None:
+            return jsonify({'message': 'Invalid feed key'}), 403
+        
+        return _feed_response(feed_cache.guild_feed())
+    except Exception as e:
+        logger.error(f"Error serving calendar feed: {str(e)}")
+        return jsonify({'message': 'Error serving calendar feed'}), 500
+
+@events_bp.route('/my-calendar.ics', methods=['GET'])
+def personal_calendar_feed():
+    """Events the member is attending, considering or waitlisted for"""
+    try:
+        member = _feed_member()
+        if member is None:
+            return jsonify({'message': 'Invalid feed key'}), 403
+        
+        return _feed_response(feed_cache.user_feed(member.id))
+    except Exception as e:
+        logger.error(f"Error serving calendar feed: {str(e)}")
+        return jsonify({'message': 'Error serving calendar feed'}), 500
@@ -0,0 +1,279 @@
+"""
+RSVP, cancellation and waitlist for guild events.
+
+Capacity is enforced on ``GuildEvent.attending_count`` with a conditional
+UPDATE (``... SET attending_count = attending_count + 1 WHERE
+attending_count < max_participants``): the database decides atomically
+whether a seat was taken, so concurrent sign-ups can never overbook and no
+row is read-then-written. Members who do not get a seat are waitlisted and
+promoted in order when a seat is released.
+
+Every transaction that changes seats touches the event row first and the
+participant rows second. The event row therefore acts as a per-event
+mutex and lock order is the same everywhere, which keeps sign-up storms
+free of deadlocks; lock timeouts and duplicate clicks are retried. Seat
+bookkeeping is not an edit of the event, so these statements leave
+``GuildEvent.updated_at`` untouched.
+"""
+
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+from models import EventParticipant, GuildEvent, db
+
+logger = logging.getLogger(__name__)
+
+ATTENDING = 'attending'
+WAITLISTED = 'waitlisted'
+RSVP_STATUSES = ('attending', 'maybe', 'declined')
+
+RETRY_ATTEMPTS = 5
+RETRY_BACKOFF = 0.02
+PROMOTION_CANDIDATES = 5
+
+
+class EventNotFound(LookupError):
+    pass
+
+
+class _StateChanged(Exception):
+    """A concurrent request changed the participation; start over"""
+
+
+def _take_seat(event_id: int) -> bool:
+    result = db.session.execute(
+        db.update(GuildEvent)
+        .where(
+            GuildEvent.id == event_id,
+            db.or_(
+                GuildEvent.max_participants.is_(None),
+                GuildEvent.attending_count < GuildEvent.max_participants
+            )
+        )
+        .values(attending_count=GuildEvent.attending_count + 1, updated_at=GuildEvent.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _release_seat(event_id: int) -> Optional[int]:
+    """Free one seat and hand it to the first waitlisted member, if any
+
+    Returns the promoted user's id. Must run after the event row has been
+    locked by this transaction. The waitlist is read with a locking read:
+    callers have already run plain SELECTs, so under REPEATABLE READ
+    (InnoDB) a plain SELECT here would use the snapshot taken before the
+    event lock and could miss a member waitlisted in between.
+    """
+    candidates = db.session.query(EventParticipant.id, EventParticipant.user_id).filter(
+        EventParticipant.event_id == event_id,
+        EventParticipant.status == WAITLISTED
+    ).order_by(EventParticipant.waitlisted_at, EventParticipant.id).limit(
+        PROMOTION_CANDIDATES
+    ).with_for_update().all()
+
+    for participant_id, user_id in candidates:
+        # The seat changes hands directly, so attending_count is unchanged
+        promoted = db.session.execute(
+            db.update(EventParticipant)
+            .where(EventParticipant.id == participant_id, EventParticipant.status == WAITLISTED)
+            .values(status=ATTENDING, waitlisted_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        if promoted.rowcount == 1:
+            return user_id
+
+    db.session.execute(
+        db.update(GuildEvent)
+        .where(GuildEvent.id == event_id)
+        .values(attending_count=GuildEvent.attending_count - 1, updated_at=GuildEvent.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return None
+
+
+def _lock_event(event_id: int):
+    """Take the event row lock without changing capacity"""
+    db.session.execute(
+        db.update(GuildEvent)
+        .where(GuildEvent.id == event_id)
+        .values(attending_count=GuildEvent.attending_count, updated_at=GuildEvent.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _set_status(participant_id: int, expected: str, status: str, waitlisted_at: Optional[datetime] = None):
+    updated = db.session.execute(
+        db.update(EventParticipant)
+        .where(EventParticipant.id == participant_id, EventParticipant.status == expected)
+        .values(status=status, waitlisted_at=waitlisted_at)
+        .execution_options(synchronize_session=False)
+    )
+    if updated.rowcount != 1:
+        raise _StateChanged()
+
+
+def _participation(event_id: int, user_id: int):
+    return db.session.query(EventParticipant.id, EventParticipant.status).filter_by(
+        event_id=event_id, user_id=user_id
+    ).first()
+
+
+def _rsvp(event_id: int, user_id: int, status: str) -> Dict[str, Any]:
+    event = db.session.query(GuildEvent.id, GuildEvent.recurrence_rule).filter(GuildEvent.id == event_id).first()
+    if event is None:
+        raise EventNotFound(event_id)
+    if event.recurrence_rule:
+        raise ValueError('RSVPs to recurring events are not supported yet')
+
+    existing = _participation(event_id, user_id)
+    current = existing.status if existing else None
+    promoted = None
+
+    if current == status or (status == ATTENDING and current == WAITLISTED):
+        return {'status': current, 'changed': False}
+
+    if status == ATTENDING:
+        if _take_seat(event_id):
+            new_status, waitlisted_at = ATTENDING, None
+        else:
+            new_status, waitlisted_at = WAITLISTED, datetime.utcnow()
+        if existing:
+            _set_status(existing.id, current, new_status, waitlisted_at)
+        else:
+            db.session.add(EventParticipant(
+                event_id=event_id, user_id=user_id, status=new_status, waitlisted_at=waitlisted_at
+            ))
+            db.session.flush()
+    else:
+        new_status = status
+        if current == ATTENDING:
+            _lock_event(event_id)
+            _set_status(existing.id, ATTENDING, status)
+            promoted = _release_seat(event_id)
+        elif existing:
+            _lock_event(event_id)
+            _set_status(existing.id, current, status)
+        else:
+            db.session.add(EventParticipant(event_id=event_id, user_id=user_id, status=status))
+            db.session.flush()
+
+    return {'status': new_status, 'changed': True, 'promoted_user_id': promoted}
+
+
+def _cancel(event_id: int, user_id: int) -> Dict[str, Any]:
+    existing = _participation(event_id, user_id)
+    if existing is None:
+        if db.session.query(GuildEvent.id).filter(GuildEvent.id == event_id).first() is None:
+            raise EventNotFound(event_id)
+        return {'status': None, 'changed': False}
+
+    _lock_event(event_id)
+    deleted = db.session.execute(
+        db.delete(EventParticipant)
+        .where(EventParticipant.id == existing.id, EventParticipant.status == existing.status)
+        .execution_options(synchronize_session=False)
+    )
+    if deleted.rowcount != 1:
+        raise _StateChanged()
+
+    promoted = _release_seat(event_id) if existing.status == ATTENDING else None
+    return {'status': None, 'changed': True, 'promoted_user_id': promoted}
+
+
+def _run(operation, event_id: int, user_id: int, *args) -> Dict[str, Any]:
+    """Run one RSVP transaction, retrying on lock conflicts and races"""
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            result = operation(event_id, user_id, *args)
+            db.session.commit()
+            break
+        except (OperationalError, IntegrityError, _StateChanged) as e:
+            db.session.rollback()
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            logger.debug(f"Retrying RSVP for event {event_id}, user {user_id}: {e.__class__.__name__}")
+            time.sleep(RETRY_BACKOFF * (2 ** attempt) * random.random())
+        except Exception:
+            db.session.rollback()
+            raise
+
+    result.update(event_summary(event_id))
+    if result['status'] == WAITLISTED:
+        result['waitlist_position'] = waitlist_position(event_id, user_id)
+    return result
+
+
+def rsvp(event_id: int, user_id: int, status: str = ATTENDING) -> Dict[str, Any]:
+    """Set a member's RSVP; 'attending' takes a seat or joins the waitlist"""
+    if status not in RSVP_STATUSES:
+        raise ValueError(f"Invalid status: {status}")
+    return _run(_rsvp, event_id, user_id, status)
+
+
+def cancel(event_id: int, user_id: int) -> Dict[str, Any]:
+    """Withdraw from an event, promoting the next waitlisted member"""
+    return _run(_cancel, event_id, user_id)
+
+
+def event_summary(event_id: int) -> Dict[str, Any]:
+    row = db.session.query(GuildEvent.attending_count, GuildEvent.max_participants).filter(
+        GuildEvent.id == event_id
+    ).first()
+    waitlisted = db.session.query(db.func.count(EventParticipant.id)).filter(
+        EventParticipant.event_id == event_id,
+        EventParticipant.status == WAITLISTED
+    ).scalar()
+    return {
+        'attending': row.attending_count,
+        'max_participants': row.max_participants,
+        'waitlisted': waitlisted
+    }
+
+
+def waitlist_position(event_id: int, user_id: int) -> Optional[int]:
+    mine = db.session.query(EventParticipant.id, EventParticipant.waitlisted_at).filter_by(
+        event_id=event_id, user_id=user_id, status=WAITLISTED
+    ).first()
+    if mine is None:
+        return None
+    ahead = db.session.query(db.func.count(EventParticipant.id)).filter(
+        EventParticipant.event_id == event_id,
+        EventParticipant.status == WAITLISTED,
+        db.or_(
+            EventParticipant.waitlisted_at < mine.waitlisted_at,
+            db.and_(EventParticipant.waitlisted_at == mine.waitlisted_at, EventParticipant.id < mine.id)
+        )
+    ).scalar()
+    return ahead + 1
+
+
+def recount_attendance(event_id: Optional[int] = None) -> int:
+    """Resynchronise attending_count from the participant rows
+
+    For events created before the counter existed or edited by hand.
+    Returns the number of events whose counter changed.
+    """
+    attending = db.session.query(
+        EventParticipant.event_id, db.func.count(EventParticipant.id)
+    ).filter(EventParticipant.status == ATTENDING).group_by(EventParticipant.event_id)
+    query = db.session.query(GuildEvent.id, GuildEvent.attending_count)
+    if event_id is not None:
+        attending = attending.filter(EventParticipant.event_id == event_id)
+        query = query.filter(GuildEvent.id == event_id)
+
+    counts = dict(attending.all())
+    fixed = 0
+    for row_id, stored in query.all():
+        actual = counts.get(row_id, 0)
+        if stored != actual:
+            db.session.execute(
+                db.update(GuildEvent).where(GuildEvent.id == row_id).values(attending_count=actual)
+            )
+            fixed += 1
+    db.session.commit()
+    return fixed
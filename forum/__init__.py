@@ -0,0 +1 @@
+# Forum blueprint package
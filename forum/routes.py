@@ -0,0 +1,341 @@
+from flask import Blueprint, request, jsonify
+from models import ForumCategory, ForumPost, ForumReply, User, db
+from utils import token_required, get_pagination_params, has_permission
+from auth import permissions
+from forum.views import view_counter
+from forum.threads import DEFAULT_MAX_DEPTH, MAX_DEPTH_LIMIT, load_subtree, load_thread
+from forum import search, summaries
+import logging
+
+forum_bp = Blueprint('forum', __name__)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+
+def _can_read(current_user, category):
+    return permissions.role_level(current_user.role) >= permissions.role_level(category.min_role_to_read or 'Invité')
+
+def _can_post(current_user, category):
+    return has_permission(current_user, 'write_forum') and \
+        permissions.role_level(current_user.role) >= permissions.role_level(category.min_role_to_post or 'Membre')
+
+def _serialize_post(post, view_count, include_content=False):
+    data = {
+        'id': post.id,
+        'title': post.title,
+        'slug': post.slug,
+        'category_id': post.category_id,
+        'author_id': post.author_id,
+        'is_pinned': post.is_pinned,
+        'is_locked': post.is_locked,
+        'view_count': view_count,
+        'reply_count': post.reply_count or 0,
+        'created_at': post.created_at.isoformat(),
+        'last_reply_at': post.last_reply_at.isoformat() if post.last_reply_at else None,
+        'last_reply_id': post.last_reply_id,
+        'last_reply_author_id': post.last_reply_author_id
+    }
+    if include_content:
+        data['content'] = post.content
+    return data
+
+@forum_bp.route('/categories', methods=['GET'])
+@token_required
+def get_categories(current_user):
+    """Get the forum index: readable categories with their summaries
+    
+    Counts and last activity are read from the denormalized columns kept by
+    forum.summaries, and the last thread and author come from one joined
+    query, so the index costs the same however large the forum is.
+    """
+    try:
+        categories = [
+            category for category in ForumCategory.query.order_by(ForumCategory.order_index, ForumCategory.id).all()
+            if _can_read(current_user, category)
+        ]
+        
+        last_ids = [category.last_post_id for category in categories if category.last_post_id]
+        last_posts = {}
+        if last_ids:
+            rows = db.session.query(ForumPost.id, ForumPost.title, ForumPost.slug, User.username).outerjoin(
+                User, User.id == db.func.coalesce(ForumPost.last_reply_author_id, ForumPost.author_id)
+            ).filter(ForumPost.id.in_(last_ids)).all()
+            last_posts = {row.id: row for row in rows}
+        
+        result = []
+        for category in categories:
+            last = last_posts.get(category.last_post_id)
+            result.append({
+                'id': category.id,
+                'name': category.name,
+                'description': category.description,
+                'slug': category.slug,
+                'color': category.color,
+                'icon': category.icon,
+                'thread_count': category.thread_count,
+                'reply_count': category.reply_count,
+                'last_activity_at': category.last_activity_at.isoformat() if category.last_activity_at else None,
+                'last_post': {
+                    'id': last.id,
+                    'title': last.title,
+                    'slug': last.slug,
+                    'author_id': category.last_author_id,
+                    'author': last.username
+                } if last else None
+            })
+        
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error fetching forum categories: {str(e)}")
+        return jsonify({'message': 'Error fetching forum categories'}), 500
+
+@forum_bp.route('/search', methods=['GET'])
+@token_required
+def search_forum(current_user):
+    """Full-text search over posts and replies the user can read
+    
+    ``q`` is the query; ``category_id`` narrows it to one category and
+    ``limit``/``offset`` page through the ranked results.
+    """
+    try:
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'message': 'q is required'}), 400
+        limit = min(max(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), 1), MAX_SEARCH_LIMIT)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        category_id = request.args.get('category_id', type=int)
+        
+        category_ids = [
+            category.id for category in ForumCategory.query.all()
+            if _can_read(current_user, category) and category_id in (None, category.id)
+        ]
+        return jsonify(search.search(query, category_ids, limit, offset))
+    except Exception as e:
+        logger.error(f"Error searching forum: {str(e)}")
+        return jsonify({'message': 'Error searching forum'}), 500
+
+@forum_bp.route('/categories/<int:category_id>/posts', methods=['GET'])
+@token_required
+def get_category_posts(current_user, category_id):
+    """Get a category's threads, pinned first then by latest activity"""
+    try:
+        category = ForumCategory.query.get(category_id)
+        if category is None or not _can_read(current_user, category):
+            return jsonify({'message': 'Category not found'}), 404
+        
+        params = get_pagination_params(request)
+        pagination = ForumPost.query.filter(
+            ForumPost.category_id == category_id,
+            ForumPost.is_deleted.is_(False)
+        ).order_by(
+            ForumPost.is_pinned.desc(),
+            db.func.coalesce(ForumPost.last_reply_at, ForumPost.created_at).desc(),
+            ForumPost.id.desc()
+        ).paginate(page=params['page'], per_page=params['per_page'], error_out=False)
+        
+        # Views not yet flushed to view_count, for the whole page at once
+        pending = view_counter.pending(post.id for post in pagination.items)
+        
+        return jsonify({
+            'posts': [_serialize_post(post, (post.view_count or 0) + pending[post.id]) for post in pagination.items],
+            'pagination': {
+                'page': pagination.page,
+                'per_page': pagination.per_page,
+                'total': pagination.total,
+                'pages': pagination.pages
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error fetching forum posts: {str(e)}")
+        return jsonify({'message': 'Error fetching forum posts'}), 500
+
+@forum_bp.route('/posts/<int:post_id>', methods=['GET'])
+@token_required
+def get_post(current_user, post_id):
+    """Get a thread and count the view"""
+    try:
+        post = _readable_post(current_user, post_id)
+        if post is None:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        view_counter.record(post.id, current_user.id)
+        
+        return jsonify(_serialize_post(post, view_counter.view_count(post.id, post.view_count), include_content=True))
+    except Exception as e:
+        logger.error(f"Error fetching forum post: {str(e)}")
+        return jsonify({'message': 'Error fetching forum post'}), 500
+
+def _readable_post(current_user, post_id):
+    post = ForumPost.query.get(post_id)
+    if post is None or post.is_deleted or not _can_read(current_user, post.category):
+        return None
+    return post
+
+def _max_depth():
+    return min(max(request.args.get('max_depth', DEFAULT_MAX_DEPTH, type=int), 0), MAX_DEPTH_LIMIT)
+
+@forum_bp.route('/posts/<int:post_id>/replies', methods=['GET'])
+@token_required
+def get_post_replies(current_user, post_id):
+    """Get a page of top-level replies with their nested replies
+    
+    ``page``/``per_page`` paginate top-level replies; branches deeper than
+    ``max_depth`` are cut and report ``hidden_replies``.
+    """
+    try:
+        if _readable_post(current_user, post_id) is None:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        params = get_pagination_params(request)
+        return jsonify(load_thread(post_id, params['page'], params['per_page'], _max_depth()))
+    except Exception as e:
+        logger.error(f"Error fetching forum replies: {str(e)}")
+        return jsonify({'message': 'Error fetching forum replies'}), 500
+
+@forum_bp.route('/posts/<int:post_id>/replies/<int:reply_id>', methods=['GET'])
+@token_required
+def get_reply_branch(current_user, post_id, reply_id):
+    """Get one reply and its nested replies, to expand a cut branch"""
+    try:
+        if _readable_post(current_user, post_id) is None:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        branch = load_subtree(post_id, reply_id, _max_depth())
+        if branch is None:
+            return jsonify({'message': 'Reply not found'}), 404
+        
+        return jsonify(branch)
+    except Exception as e:
+        logger.error(f"Error fetching forum replies: {str(e)}")
+        return jsonify({'message': 'Error fetching forum replies'}), 500
+
+@forum_bp.route('/categories/<int:category_id>/posts', methods=['POST'])
+@token_required
+def create_post(current_user, category_id):
+    """Start a thread in a category"""
+    try:
+        category = ForumCategory.query.get(category_id)
+        if category is None or not _can_read(current_user, category):
+            return jsonify({'message': 'Category not found'}), 404
+        if not _can_post(current_user, category):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        title = (data.get('title') or '').strip()
+        content = (data.get('content') or '').strip()
+        if not title or not content:
+            return jsonify({'message': 'title and content are required'}), 400
+        
+        post = summaries.create_post(category_id, current_user.id, title[:200], content)
+        return jsonify({'message': 'Post created successfully', 'post_id': post.id, 'slug': post.slug}), 201
+    except Exception as e:
+        logger.error(f"Error creating forum post: {str(e)}")
+        return jsonify({'message': 'Error creating forum post'}), 500
+
+@forum_bp.route('/posts/<int:post_id>/replies', methods=['POST'])
+@token_required
+def create_reply(current_user, post_id):
+    """Reply to a thread, optionally to another reply (``parent_reply_id``)"""
+    try:
+        post = _readable_post(current_user, post_id)
+        if post is None:
+            return jsonify({'message': 'Post not found'}), 404
+        if not _can_post(current_user, post.category):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        if post.is_locked:
+            return jsonify({'message': 'Thread is locked'}), 409
+        
+        data = request.get_json(silent=True) or {}
+        content = (data.get('content') or '').strip()
+        if not content:
+            return jsonify({'message': 'content is required'}), 400
+        
+        try:
+            reply = summaries.create_reply(post_id, current_user.id, content, data.get('parent_reply_id'))
+        except summaries.ForumError as e:
+            return jsonify({'message': str(e)}), 409
+        return jsonify({'message': 'Reply created successfully', 'reply_id': reply.id}), 201
+    except Exception as e:
+        logger.error(f"Error creating forum reply: {str(e)}")
+        return jsonify({'message': 'Error creating forum reply'}), 500
+
+@forum_bp.route('/posts/<int:post_id>', methods=['PUT'])
+@token_required
+def update_post(current_user, post_id):
+    """Edit a thread's title and/or content (its author or a forum moderator)"""
+    try:
+        post = _readable_post(current_user, post_id)
+        if post is None:
+            return jsonify({'message': 'Post not found'}), 404
+        if post.author_id != current_user.id and not has_permission(current_user, 'moderate_forum'):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        title = data['title'].strip()[:200] if data.get('title') is not None else None
+        content = data['content'].strip() if data.get('content') is not None else None
+        if title == '' or content == '':
+            return jsonify({'message': 'title and content cannot be empty'}), 400
+        
+        summaries.edit_post(post, title, content)
+        return jsonify({'message': 'Post updated successfully'})
+    except Exception as e:
+        logger.error(f"Error updating forum post: {str(e)}")
+        return jsonify({'message': 'Error updating forum post'}), 500
+
+@forum_bp.route('/replies/<int:reply_id>', methods=['PUT'])
+@token_required
+def update_reply(current_user, reply_id):
+    """Edit a reply (its author or a forum moderator)"""
+    try:
+        reply = ForumReply.query.get(reply_id)
+        if reply is None or reply.is_deleted or _readable_post(current_user, reply.post_id) is None:
+            return jsonify({'message': 'Reply not found'}), 404
+        if reply.author_id != current_user.id and not has_permission(current_user, 'moderate_forum'):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        
+        content = ((request.get_json(silent=True) or {}).get('content') or '').strip()
+        if not content:
+            return jsonify({'message': 'content is required'}), 400
+        
+        summaries.edit_reply(reply, content)
+        return jsonify({'message': 'Reply updated successfully'})
+    except Exception as e:
+        logger.error(f"Error updating forum reply: {str(e)}")
+        return jsonify({'message': 'Error updating forum reply'}), 500
+
+@forum_bp.route('/posts/<int:post_id>', methods=['DELETE'])
+@token_required
+def delete_post(current_user, post_id):
+    """Delete a thread (its author or a forum moderator)"""
+    try:
+        post = _readable_post(current_user, post_id)
+        if post is None:
+            return jsonify({'message': 'Post not found'}), 404
+        if post.author_id != current_user.id and not has_permission(current_user, 'moderate_forum'):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        
+        if not summaries.delete_post(post_id):
+            return jsonify({'message': 'Post not found'}), 404
+        return jsonify({'message': 'Post deleted successfully'})
+    except Exception as e:
+        logger.error(f"Error deleting forum post: {str(e)}")
+        return jsonify({'message': 'Error deleting forum post'}), 500
+
+@forum_bp.route('/replies/<int:reply_id>', methods=['DELETE'])
+@token_required
+def delete_reply(current_user, reply_id):
+    """Delete a reply (its author or a forum moderator)"""
+    try:
+        reply = ForumReply.query.get(reply_id)
+        if reply is None or reply.is_deleted or _readable_post(current_user, reply.post_id) is None:
+            return jsonify({'message': 'Reply not found'}), 404
+        if reply.author_id != current_user.id and not has_permission(current_user, 'moderate_forum'):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        
+        if not summaries.delete_reply(reply_id):
+            return jsonify({'message': 'Reply not found'}), 404
+        return jsonify({'message': 'Reply deleted successfully'})
+    except Exception as e:
+        logger.error(f"Error deleting forum reply: {str(e)}")
+        return jsonify({'message': 'Error deleting forum reply'}), 500
@@ -0,0 +1,533 @@
+"""
+Full-text search over forum posts and replies.
+
+Posts and replies are indexed as separate documents in an inverted index
+kept in three tables: ``forum_search_terms`` (the vocabulary, with each
+term's document frequency), ``forum_search_postings`` (term, document, term
+frequency) and ``forum_search_documents`` (which post/reply, its category
+and its length). A query reads only the posting lists of its terms, one
+primary-key range scan each, instead of scanning every post body with
+``LIKE``.
+
+Text is tokenized on letters and digits after stripping HTML, lower-casing
+and folding accents, so "équipement" matches "equipement". Common French
+and English stop words are not indexed. Results are ranked with BM25 in a
+single aggregate query, restricted to the categories the reader may see.
+Terms found in more than ``COMMON_TERM_RATIO`` of all documents are skipped
+when the query has rarer terms: they barely move the ranking but have the
+longest posting lists. A query made only of such terms is ranked within the
+``COMMON_TERM_SCAN`` most recently indexed documents.
+
+The index is kept current by forum.summaries, in the same transaction as
+each create, edit or delete; ``rebuild_index`` rebuilds it from scratch
+(``manage.py rebuild-forum-search``). Term document counts are the
+exception: they are only ranking statistics, and updating them in every
+write would make common terms hot rows that all writers lock. Committed
+changes are buffered per process (``doc_count_buffer``) and written in
+batches every ``SEARCH_DOC_COUNT_FLUSH_SECONDS``.
+"""
+
+import atexit
+import html
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import ForumPost, ForumReply, ForumSearchDocument, ForumSearchPosting, ForumSearchTerm, User, db
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+TITLE_WEIGHT = 2  # a title token counts as this many body tokens
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+COMMON_TERM_RATIO = 0.25
+COMMON_TERM_SCAN = 20000
+STATS_TTL_SECONDS = 60
+IN_CHUNK_SIZE = 500
+REBUILD_CHUNK_SIZE = 2000
+DEFAULT_DOC_COUNT_FLUSH_SECONDS = 5.0
+SNIPPET_CHARS = 200
+
+_DOC_COUNTS_KEY = 'search_doc_counts'  # session.info entry for uncommitted count changes
+
+STOPWORDS = frozenset('''
+    au aux avec ce ces cette dans de des du elle en et eux il ils je la le les leur lui ma mais me meme mes moi
+    mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre
+    vous est sont ete etre avoir ai as avons avez ont fait faire plus tres tout tous toute toutes comme si
+    a an and are as at be but by for from has have he her his in is it its not of on or our she that the their
+    them they this to was we were will with you your
+'''.split())
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_WORD_RE = re.compile(r'\w+')
+_LIGATURES = str.maketrans({'œ': 'oe', 'Œ': 'oe', 'æ': 'ae', 'Æ': 'ae', 'ß': 'ss'})
+
+
+def fold(text: str) -> str:
+    """Lower-case and strip accents ("Élève" -> "eleve")"""
+    decomposed = unicodedata.normalize('NFKD', text.translate(_LIGATURES))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def _plain_text(text: Optional[str]) -> str:
+    return html.unescape(_TAG_RE.sub(' ', text or ''))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [
+        token for token in _TOKEN_RE.findall(fold(_plain_text(text)))
+        if (len(token) > 1 or token.isdigit()) and len(token) <= MAX_TERM_LENGTH and token not in STOPWORDS
+    ]
+
+
+def _document_terms(content: Optional[str], title: Optional[str] = None) -> Counter:
+    counts = Counter(tokenize(content))
+    for token in tokenize(title):
+        counts[token] += TITLE_WEIGHT
+    return counts
+
+
+def _chunks(items: List, size: int = IN_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Incremental maintenance. These run inside the caller's transaction and do
+# not commit. term_ids and adjust_doc_counts work on any vocabulary model
+# with (id, term, doc_count) columns; the wiki index uses them too.
+
+def term_ids(model, terms: Iterable[str]) -> Dict[str, int]:
+    """Ids of ``terms`` in the vocabulary table ``model``, adding missing ones"""
+    terms = sorted(terms)
+    ids = {}
+    for chunk in _chunks(terms):
+        ids.update(db.session.query(model.term, model.id).filter(model.term.in_(chunk)).all())
+    missing = [term for term in terms if term not in ids]
+    if not missing:
+        return ids
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(model), [{'term': term, 'doc_count': 0} for term in missing])
+    except IntegrityError:
+        # Another writer added some of them first; insert the rest one by one
+        for term in missing:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(db.insert(model), [{'term': term, 'doc_count': 0}])
+            except IntegrityError:
+                pass
+    for chunk in _chunks(missing):
+        ids.update(db.session.query(model.term, model.id).filter(model.term.in_(chunk)).all())
+    return ids
+
+
+def adjust_doc_counts(model, deltas: Dict[int, int]):
+    """Add ``deltas`` ({term id: change}) to the terms' document counts
+
+    Nothing is written here: the changes are handed to ``doc_count_buffer``
+    if the transaction commits, and dropped if it rolls back.
+    """
+    pending = db.session.info.setdefault(_DOC_COUNTS_KEY, defaultdict(Counter))
+    pending[model].update(deltas)
+
+
+class DocCountBuffer:
+    """Committed document count changes, written in batches by a background thread"""
+
+    def __init__(self, flush_seconds: float = DEFAULT_DOC_COUNT_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.app = None
+        self._lock = threading.Lock()
+        self._pending: Dict[Any, Counter] = defaultdict(Counter)
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_seconds = app.config.get('SEARCH_DOC_COUNT_FLUSH_SECONDS', DEFAULT_DOC_COUNT_FLUSH_SECONDS)
+        atexit.register(self.shutdown)
+
+    def add(self, changes: Dict[Any, Counter]):
+        with self._lock:
+            for model, deltas in changes.items():
+                self._pending[model].update(deltas)
+        self._ensure_started()
+
+    def discard(self, model):
+        """Forget buffered changes to ``model``, whose counts were just rebuilt"""
+        with self._lock:
+            self._pending.pop(model, None)
+
+    def flush(self) -> int:
+        """Write buffered changes; returns the number of terms updated"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(Counter)
+        updated = 0
+        try:
+            for model, deltas in pending.items():
+                term_ids = sorted(term_id for term_id, delta in deltas.items() if delta)
+                for chunk in _chunks(term_ids):  # consistent lock order across workers
+                    db.session.execute(
+                        db.update(model)
+                        .where(model.id.in_(chunk))
+                        .values(doc_count=model.doc_count + db.case(
+                            {term_id: deltas[term_id] for term_id in chunk}, value=model.id, else_=0
+                        ))
+                        .execution_options(synchronize_session=False)
+                    )
+                updated += len(term_ids)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error writing search document counts: {e}")
+            with self._lock:
+                for model, deltas in pending.items():
+                    self._pending[model].update(deltas)  # retried on the next flush
+            return 0
+        return updated
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so pre-forking servers start one per worker
+        if self.app is None or (self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='search-doc-count-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Search document count flusher error: {e}")
+
+    def shutdown(self):
+        self._stop.set()
+        if self.app is not None:
+            with self.app.app_context():
+                self.flush()
+
+
+doc_count_buffer = DocCountBuffer()
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    changes = session.info.pop(_DOC_COUNTS_KEY, None)
+    if changes:
+        doc_count_buffer.add(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _session_rolled_back(session, previous_transaction):
+    # A savepoint rolled back by term_ids leaves the enclosing transaction going
+    if not previous_transaction.nested:
+        session.info.pop(_DOC_COUNTS_KEY, None)
+
+
+def _add_document(post_id: int, reply_id: Optional[int], category_id: int, counts: Counter):
+    if not counts:
+        return
+    document = ForumSearchDocument(
+        post_id=post_id, reply_id=reply_id, category_id=category_id, length=sum(counts.values())
+    )
+    db.session.add(document)
+    db.session.flush()
+
+    ids = term_ids(ForumSearchTerm, counts)
+    db.session.execute(db.insert(ForumSearchPosting), [
+        {'term_id': ids[term], 'document_id': document.id, 'tf': min(tf, 32767)}
+        for term, tf in counts.items()
+    ])
+    adjust_doc_counts(ForumSearchTerm, {term_id: 1 for term_id in ids.values()})
+
+
+def _remove_documents(condition):
+    document_ids = [row.id for row in db.session.query(ForumSearchDocument.id).filter(condition)]
+    if not document_ids:
+        return
+    # A term has at most one posting per document
+    deltas = Counter()
+    for chunk in _chunks(document_ids):
+        deltas.update(
+            term_id for (term_id,) in db.session.query(ForumSearchPosting.term_id).filter(
+                ForumSearchPosting.document_id.in_(chunk)
+            )
+        )
+    adjust_doc_counts(ForumSearchTerm, {term_id: -count for term_id, count in deltas.items()})
+    for chunk in _chunks(document_ids):
+        db.session.execute(
+            db.delete(ForumSearchPosting).where(ForumSearchPosting.document_id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            db.delete(ForumSearchDocument).where(ForumSearchDocument.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def index_post(post: ForumPost):
+    """(Re)index a thread's opening post"""
+    _remove_documents(db.and_(ForumSearchDocument.post_id == post.id, ForumSearchDocument.reply_id.is_(None)))
+    _add_document(post.id, None, post.category_id, _document_terms(post.content, post.title))
+
+
+def index_reply(reply: ForumReply, category_id: int):
+    """(Re)index a reply"""
+    _remove_documents(ForumSearchDocument.reply_id == reply.id)
+    _add_document(reply.post_id, reply.id, category_id, _document_terms(reply.content))
+
+
+def remove_post(post_id: int):
+    """Drop a thread and all of its replies from the index"""
+    _remove_documents(ForumSearchDocument.post_id == post_id)
+
+
+def remove_reply(reply_id: int):
+    _remove_documents(ForumSearchDocument.reply_id == reply_id)
+
+
+# Bulk rebuild
+
+def rebuild_index(chunk_size: int = REBUILD_CHUNK_SIZE) -> Dict[str, int]:
+    """Rebuild the whole index from non-deleted posts and replies
+
+    The vocabulary is assigned ids in memory and documents and postings are
+    written with multi-row inserts, one chunk at a time. Searches return
+    partial results until the rebuild finishes.
+
+    Forum writes must be stopped while this runs: incremental indexing
+    takes autoincrement ids from the same tables the rebuild fills with
+    explicit ids, so a concurrent post can fail on a duplicate key or be
+    left out. Writes seen during the rebuild are reported in
+    ``concurrent_writes``; rerun it once they have stopped. Document
+    counts still buffered by other processes are written within
+    ``SEARCH_DOC_COUNT_FLUSH_SECONDS`` of their last write, so stop writes
+    at least that long before rebuilding.
+    """
+    started = _forum_write_marker()
+    for model in (ForumSearchPosting, ForumSearchDocument, ForumSearchTerm):
+        db.session.execute(db.delete(model))
+    db.session.commit()
+    doc_count_buffer.discard(ForumSearchTerm)
+
+    vocabulary: Dict[str, int] = {}
+    doc_counts = Counter()
+    documents, postings = [], []
+    totals = {'documents': 0, 'postings': 0}
+
+    def flush():
+        if documents:
+            db.session.execute(db.insert(ForumSearchDocument), documents)
+            for chunk in _chunks(postings, chunk_size * 10):
+                db.session.execute(db.insert(ForumSearchPosting), chunk)
+            db.session.commit()
+            totals['documents'] += len(documents)
+            totals['postings'] += len(postings)
+            documents.clear()
+            postings.clear()
+
+    def add(post_id, reply_id, category_id, counts):
+        if not counts:
+            return
+        document_id = totals['documents'] + len(documents) + 1
+        documents.append({
+            'id': document_id, 'post_id': post_id, 'reply_id': reply_id,
+            'category_id': category_id, 'length': sum(counts.values())
+        })
+        for term, tf in counts.items():
+            term_id = vocabulary.setdefault(term, len(vocabulary) + 1)
+            doc_counts[term_id] += 1
+            postings.append({'term_id': term_id, 'document_id': document_id, 'tf': min(tf, 32767)})
+        if len(documents) >= chunk_size:
+            flush()
+
+    # Keyset pagination rather than a streaming cursor, so inserts can run in between
+    last_id = 0
+    while True:
+        rows = db.session.query(ForumPost.id, ForumPost.category_id, ForumPost.title, ForumPost.content).filter(
+            ForumPost.id > last_id, ForumPost.is_deleted.is_(False)
+        ).order_by(ForumPost.id).limit(chunk_size).all()
+        if not rows:
+            break
+        for row in rows:
+            add(row.id, None, row.category_id, _document_terms(row.content, row.title))
+        last_id = rows[-1].id
+
+    last_id = 0
+    while True:
+        rows = db.session.query(ForumReply.id, ForumReply.post_id, ForumReply.content, ForumPost.category_id).join(
+            ForumPost, ForumPost.id == ForumReply.post_id
+        ).filter(
+            ForumReply.id > last_id, ForumReply.is_deleted.is_(False), ForumPost.is_deleted.is_(False)
+        ).order_by(ForumReply.id).limit(chunk_size).all()
+        if not rows:
+            break
+        for row in rows:
+            add(row.post_id, row.id, row.category_id, _document_terms(row.content))
+        last_id = rows[-1].id
+    flush()
+
+    terms = [{'id': term_id, 'term': term, 'doc_count': doc_counts[term_id]} for term, term_id in vocabulary.items()]
+    for chunk in _chunks(terms, chunk_size * 5):
+        db.session.execute(db.insert(ForumSearchTerm), chunk)
+    db.session.commit()
+    _stats_cache.clear()
+
+    totals['terms'] = len(terms)
+    totals['concurrent_writes'] = _forum_write_marker() != started
+    if totals['concurrent_writes']:
+        logger.warning("Forum changed during the search index rebuild; the index may be incomplete")
+    logger.info(f"Forum search index rebuilt: {totals}")
+    return totals
+
+
+def _forum_write_marker() -> Tuple:
+    """Changes whenever a post or reply is added, edited or deleted"""
+    return db.session.query(
+        db.session.query(db.func.count(ForumPost.id)).scalar_subquery(),
+        db.session.query(db.func.max(ForumPost.updated_at)).scalar_subquery(),
+        db.session.query(db.func.count(ForumReply.id)).scalar_subquery(),
+        db.session.query(db.func.max(ForumReply.updated_at)).scalar_subquery()
+    ).one()
+
+
+# Querying
+
+_stats_cache: Dict[str, Any] = {}
+_stats_lock = threading.Lock()
+
+
+def _corpus_stats():
+    """(document count, average document length, highest document id), cached briefly"""
+    with _stats_lock:
+        if _stats_cache and time.monotonic() - _stats_cache['at'] < STATS_TTL_SECONDS:
+            return _stats_cache['value']
+    count, average, last_id = db.session.query(
+        db.func.count(ForumSearchDocument.id), db.func.avg(ForumSearchDocument.length),
+        db.func.max(ForumSearchDocument.id)
+    ).one()
+    value = (count or 0, float(average or 1.0), last_id or 0)
+    with _stats_lock:
+        _stats_cache.update(at=time.monotonic(), value=value)
+    return value
+
+
+def _snippet(text: Optional[str], terms: List[str]) -> str:
+    text = ' '.join(_plain_text(text).split())
+    start = 0
+    for match in _WORD_RE.finditer(text):
+        if fold(match.group()) in terms:
+            start = max(match.start() - SNIPPET_CHARS // 4, 0)
+            break
+    snippet = text[start:start + SNIPPET_CHARS]
+    return ('…' if start else '') + snippet + ('…' if start + SNIPPET_CHARS < len(text) else '')
+
+
+def search(query: str, category_ids: List[int], limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Posts and replies matching ``query`` in ``category_ids``, best first
+
+    Documents need not contain every term; BM25 ranks those matching more
+    (and rarer) terms higher. ``has_more`` is set when further results exist.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    empty = {'query': query, 'terms': terms, 'results': [], 'has_more': False}
+    if not terms or not category_ids:
+        return empty
+
+    found = db.session.query(ForumSearchTerm.id, ForumSearchTerm.doc_count).filter(
+        ForumSearchTerm.term.in_(terms), ForumSearchTerm.doc_count > 0
+    ).all()
+    if not found:
+        return empty
+
+    total, average_length, last_document_id = _corpus_stats()
+    total = max(total, max(row.doc_count for row in found))
+    selective = [row for row in found if row.doc_count <= COMMON_TERM_RATIO * total]
+    candidates = []
+    if not selective:
+        selective = [min(found, key=lambda row: row.doc_count)]
+        if selective[0].doc_count > COMMON_TERM_SCAN:
+            candidates.append(ForumSearchPosting.document_id > last_document_id - COMMON_TERM_SCAN)
+    idf = {
+        row.id: math.log(1 + (total - row.doc_count + 0.5) / (row.doc_count + 0.5))
+        for row in selective
+    }
+
+    tf = ForumSearchPosting.tf * 1.0
+    length_norm = K1 * (1 - B + B * ForumSearchDocument.length * (1.0 / average_length))
+    score = db.func.sum(
+        db.case(idf, value=ForumSearchPosting.term_id, else_=0.0) * tf * (K1 + 1) / (tf + length_norm)
+    ).label('score')
+    rows = db.session.query(
+        ForumSearchDocument.id, ForumSearchDocument.post_id, ForumSearchDocument.reply_id, score
+    ).join(
+        ForumSearchPosting, ForumSearchPosting.document_id == ForumSearchDocument.id
+    ).filter(
+        ForumSearchPosting.term_id.in_(list(idf)),
+        ForumSearchDocument.category_id.in_(category_ids),
+        *candidates
+    ).group_by(
+        ForumSearchDocument.id, ForumSearchDocument.post_id, ForumSearchDocument.reply_id
+    ).order_by(score.desc(), ForumSearchDocument.id.desc()).offset(offset).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return empty
+
+    posts = {
+        row.id: row for row in db.session.query(
+            ForumPost.id, ForumPost.title, ForumPost.slug, ForumPost.category_id, ForumPost.author_id,
+            ForumPost.content, ForumPost.created_at
+        ).filter(ForumPost.id.in_({row.post_id for row in rows}), ForumPost.is_deleted.is_(False))
+    }
+    reply_ids = [row.reply_id for row in rows if row.reply_id is not None]
+    replies = {
+        row.id: row for row in db.session.query(
+            ForumReply.id, ForumReply.author_id, ForumReply.content, ForumReply.created_at
+        ).filter(ForumReply.id.in_(reply_ids), ForumReply.is_deleted.is_(False))
+    } if reply_ids else {}
+    author_ids = {row.author_id for row in posts.values()} | {row.author_id for row in replies.values()}
+    authors = dict(db.session.query(User.id, User.username).filter(User.id.in_(author_ids)).all()) if author_ids else {}
+
+    results = []
+    for row in rows:
+        post = posts.get(row.post_id)
+        source = post if row.reply_id is None else replies.get(row.reply_id)
+        if post is None or source is None:
+            continue  # deleted after the index was read
+        results.append({
+            'post_id': post.id,
+            'reply_id': row.reply_id,
+            'title': post.title,
+            'slug': post.slug,
+            'category_id': post.category_id,
+            'author': authors.get(source.author_id),
+            'snippet': _snippet(source.content, terms),
+            'score': round(float(row.score), 4),
+            'created_at': source.created_at.isoformat() if source.created_at else None
+        })
+    return dict(empty, results=results, has_more=has_more)
@@ -0,0 +1,370 @@
+"""
+Forum write path and denormalized thread/category summaries.
+
+The forum index shows, per category, the number of threads and replies and
+the latest activity, and each thread shows its reply count and last reply.
+Those figures live on ``ForumCategory`` and ``ForumPost`` and are kept up
+to date here, in the same transaction as the write that changes them:
+counters move with ``SET x = x + 1`` statements (never read-then-write), so
+concurrent posters cannot lose updates, and "last activity" is only
+recomputed when the item being deleted was the last one.
+
+Every transaction locks rows in the same order (reply, thread, category,
+then the thread's search index rows), which keeps concurrent writes free
+of deadlocks. Soft-deleted posts and replies (``is_deleted``) are excluded
+from all summaries. ``rebuild_summaries`` recomputes everything in bulk
+(``manage.py repair-forum-summaries``). The search index (forum.search) is
+updated in the same transactions; its shared per-term document counts are
+written afterwards in batches, so writes do not lock them.
+"""
+
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from forum import search
+from models import ForumCategory, ForumPost, ForumReply, db
+from utils import create_slug
+
+logger = logging.getLogger(__name__)
+
+REBUILD_CHUNK_SIZE = 1000
+
+
+class ForumError(Exception):
+    """A write that cannot be applied (missing, deleted or locked thread...)"""
+
+
+def _unchanged_timestamp(model):
+    # Summary bookkeeping is not an edit of the row
+    return {'updated_at': model.updated_at}
+
+
+def _bump_category(category_id: int, threads: int, replies: int, post_id: int, author_id: int, at: datetime):
+    db.session.execute(
+        db.update(ForumCategory)
+        .where(ForumCategory.id == category_id)
+        .values(
+            thread_count=ForumCategory.thread_count + threads,
+            reply_count=ForumCategory.reply_count + replies,
+            last_activity_at=at,
+            last_post_id=post_id,
+            last_author_id=author_id,
+            **_unchanged_timestamp(ForumCategory)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def create_post(category_id: int, author_id: int, title: str, content: str) -> ForumPost:
+    """Create a thread and count it in its category"""
+    now = datetime.utcnow()
+    post = ForumPost(
+        title=title,
+        content=content,
+        slug=f"{create_slug(title)}-{uuid.uuid4().hex[:8]}",
+        category_id=category_id,
+        author_id=author_id,
+        reply_count=0,
+        created_at=now
+    )
+    try:
+        db.session.add(post)
+        db.session.flush()
+        _bump_category(category_id, 1, 0, post.id, author_id, now)
+        search.index_post(post)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return post
+
+
+def create_reply(post_id: int, author_id: int, content: str, parent_reply_id: Optional[int] = None) -> ForumReply:
+    """Add a reply and update the thread's and category's summaries"""
+    now = datetime.utcnow()
+    try:
+        if parent_reply_id is not None:
+            parent = db.session.query(ForumReply.post_id, ForumReply.is_deleted).filter(
+                ForumReply.id == parent_reply_id
+            ).first()
+            if parent is None or parent.post_id != post_id or parent.is_deleted:
+                raise ForumError('Parent reply not found in this thread')
+
+        reply = ForumReply(
+            post_id=post_id, author_id=author_id, content=content,
+            parent_reply_id=parent_reply_id, created_at=now
+        )
+        db.session.add(reply)
+        db.session.flush()
+
+        # Conditional UPDATE: the thread must still be open when the reply lands
+        updated = db.session.execute(
+            db.update(ForumPost)
+            .where(ForumPost.id == post_id, ForumPost.is_deleted.is_(False), ForumPost.is_locked.is_(False))
+            .values(
+                reply_count=db.func.coalesce(ForumPost.reply_count, 0) + 1,
+                last_reply_at=now,
+                last_reply_id=reply.id,
+                last_reply_author_id=author_id,
+                **_unchanged_timestamp(ForumPost)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if updated.rowcount != 1:
+            raise ForumError('Thread not found or locked')
+
+        category_id = db.session.query(ForumPost.category_id).filter(ForumPost.id == post_id).scalar()
+        _bump_category(category_id, 0, 1, post_id, author_id, now)
+        search.index_reply(reply, category_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return reply
+
+
+def edit_post(post: ForumPost, title: Optional[str] = None, content: Optional[str] = None) -> ForumPost:
+    """Change a thread's title and/or content and reindex it"""
+    try:
+        if title is not None:
+            post.title = title
+        if content is not None:
+            post.content = content
+        db.session.flush()
+        if post.is_deleted:
+            search.remove_post(post.id)
+        else:
+            search.index_post(post)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return post
+
+
+def edit_reply(reply: ForumReply, content: str) -> ForumReply:
+    """Change a reply's content and reindex it"""
+    try:
+        reply.content = content
+        db.session.flush()
+        post = db.session.query(ForumPost.category_id, ForumPost.is_deleted).filter(ForumPost.id == reply.post_id).one()
+        if reply.is_deleted or post.is_deleted:
+            search.remove_reply(reply.id)
+        else:
+            search.index_reply(reply, post.category_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return reply
+
+
+def _refresh_post_last_reply(post_id: int):
+    last = db.session.query(ForumReply.id, ForumReply.author_id, ForumReply.created_at).filter(
+        ForumReply.post_id == post_id,
+        ForumReply.is_deleted.is_(False)
+    ).order_by(ForumReply.created_at.desc(), ForumReply.id.desc()).first()
+    db.session.execute(
+        db.update(ForumPost)
+        .where(ForumPost.id == post_id)
+        .values(
+            last_reply_at=last.created_at if last else None,
+            last_reply_id=last.id if last else None,
+            last_reply_author_id=last.author_id if last else None,
+            **_unchanged_timestamp(ForumPost)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _refresh_category_last_activity(category_id: int):
+    activity = db.func.coalesce(ForumPost.last_reply_at, ForumPost.created_at)
+    last = db.session.query(
+        ForumPost.id, ForumPost.author_id, ForumPost.created_at,
+        ForumPost.last_reply_at, ForumPost.last_reply_author_id
+    ).filter(
+        ForumPost.category_id == category_id,
+        ForumPost.is_deleted.is_(False)
+    ).order_by(activity.desc(), ForumPost.id.desc()).first()
+    values = {'last_activity_at': None, 'last_post_id': None, 'last_author_id': None}
+    if last is not None:
+        values = {
+            'last_activity_at': last.last_reply_at or last.created_at,
+            'last_post_id': last.id,
+            'last_author_id': last.last_reply_author_id if last.last_reply_at else last.author_id
+        }
+    db.session.execute(
+        db.update(ForumCategory)
+        .where(ForumCategory.id == category_id)
+        .values(**values, **_unchanged_timestamp(ForumCategory))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_reply(reply_id: int) -> bool:
+    """Soft-delete a reply; False if it was already deleted or does not exist"""
+    try:
+        reply = db.session.query(ForumReply.post_id).filter(ForumReply.id == reply_id).first()
+        if reply is None:
+            return False
+        deleted = db.session.execute(
+            db.update(ForumReply)
+            .where(ForumReply.id == reply_id, ForumReply.is_deleted.is_(False))
+            .values(is_deleted=True)
+            .execution_options(synchronize_session=False)
+        )
+        if deleted.rowcount != 1:
+            db.session.rollback()
+            return False
+
+        db.session.execute(
+            db.update(ForumPost)
+            .where(ForumPost.id == reply.post_id)
+            .values(
+                reply_count=db.case((ForumPost.reply_count > 0, ForumPost.reply_count - 1), else_=0),
+                **_unchanged_timestamp(ForumPost)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        post = db.session.query(
+            ForumPost.category_id, ForumPost.is_deleted, ForumPost.last_reply_id
+        ).filter(ForumPost.id == reply.post_id).one()
+        if post.last_reply_id == reply_id:
+            _refresh_post_last_reply(reply.post_id)
+
+        # A deleted thread's replies were already taken out of its category
+        if not post.is_deleted:
+            db.session.execute(
+                db.update(ForumCategory)
+                .where(ForumCategory.id == post.category_id)
+                .values(
+                    reply_count=db.case((ForumCategory.reply_count > 0, ForumCategory.reply_count - 1), else_=0),
+                    **_unchanged_timestamp(ForumCategory)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            last_post_id = db.session.query(ForumCategory.last_post_id).filter(
+                ForumCategory.id == post.category_id
+            ).scalar()
+            if post.last_reply_id == reply_id and last_post_id == reply.post_id:
+                _refresh_category_last_activity(post.category_id)
+
+        search.remove_reply(reply_id)
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def delete_post(post_id: int) -> bool:
+    """Soft-delete a thread; False if it was already deleted or does not exist"""
+    try:
+        deleted = db.session.execute(
+            db.update(ForumPost)
+            .where(ForumPost.id == post_id, ForumPost.is_deleted.is_(False))
+            .values(is_deleted=True)
+            .execution_options(synchronize_session=False)
+        )
+        if deleted.rowcount != 1:
+            db.session.rollback()
+            return False
+
+        post = db.session.query(ForumPost.category_id, ForumPost.reply_count).filter(ForumPost.id == post_id).one()
+        replies = post.reply_count or 0
+        db.session.execute(
+            db.update(ForumCategory)
+            .where(ForumCategory.id == post.category_id)
+            .values(
+                thread_count=db.case((ForumCategory.thread_count > 0, ForumCategory.thread_count - 1), else_=0),
+                reply_count=db.case(
+                    (ForumCategory.reply_count > replies, ForumCategory.reply_count - replies), else_=0
+                ),
+                **_unchanged_timestamp(ForumCategory)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        last_post_id = db.session.query(ForumCategory.last_post_id).filter(
+            ForumCategory.id == post.category_id
+        ).scalar()
+        if last_post_id == post_id:
+            _refresh_category_last_activity(post.category_id)
+
+        search.remove_post(post_id)
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def rebuild_summaries() -> Dict[str, int]:
+    """Recompute every thread and category summary from the rows
+
+    Replies are streamed once in (post, created_at) order, so memory holds
+    one small record per thread rather than the replies themselves. Only
+    rows whose stored summary differs are written, in bulk.
+    """
+    replies = {}  # post_id -> [count, last_id, last_author_id, last_at]
+    stream = db.session.query(
+        ForumReply.post_id, ForumReply.id, ForumReply.author_id, ForumReply.created_at
+    ).filter(ForumReply.is_deleted.is_(False)).order_by(
+        ForumReply.post_id, ForumReply.created_at, ForumReply.id
+    ).yield_per(5000)
+    for post_id, reply_id, author_id, created_at in stream:
+        stats = replies.get(post_id)
+        if stats is None:
+            replies[post_id] = [1, reply_id, author_id, created_at]
+        else:
+            stats[0] += 1
+            stats[1:] = [reply_id, author_id, created_at]
+
+    posts = db.session.query(
+        ForumPost.id, ForumPost.category_id, ForumPost.author_id, ForumPost.is_deleted, ForumPost.created_at,
+        ForumPost.updated_at, ForumPost.reply_count, ForumPost.last_reply_id, ForumPost.last_reply_author_id,
+        ForumPost.last_reply_at
+    ).all()
+
+    post_updates = []
+    categories = defaultdict(lambda: {'thread_count': 0, 'reply_count': 0, 'last': None})
+    for post in posts:
+        count, last_id, last_author, last_at = replies.get(post.id, (0, None, None, None))
+        if (post.reply_count, post.last_reply_id, post.last_reply_author_id, post.last_reply_at) != \
+                (count, last_id, last_author, last_at):
+            post_updates.append({
+                'id': post.id, 'reply_count': count, 'last_reply_id': last_id,
+                'last_reply_author_id': last_author, 'last_reply_at': last_at, 'updated_at': post.updated_at
+            })
+        if post.is_deleted:
+            continue
+        summary = categories[post.category_id]
+        summary['thread_count'] += 1
+        summary['reply_count'] += count
+        activity = (last_at or post.created_at, post.id, last_author if last_at else post.author_id)
+        if summary['last'] is None or activity[:2] > summary['last'][:2]:
+            summary['last'] = activity
+
+    category_updates = []
+    for category in db.session.query(
+        ForumCategory.id, ForumCategory.updated_at, ForumCategory.thread_count, ForumCategory.reply_count,
+        ForumCategory.last_activity_at, ForumCategory.last_post_id, ForumCategory.last_author_id
+    ).all():
+        summary = categories.get(category.id, {'thread_count': 0, 'reply_count': 0, 'last': None})
+        last_at, last_post, last_author = summary['last'] or (None, None, None)
+        expected = (summary['thread_count'], summary['reply_count'], last_at, last_post, last_author)
+        if (category.thread_count, category.reply_count, category.last_activity_at,
+                category.last_post_id, category.last_author_id) != expected:
+            category_updates.append(dict(zip(
+                ('thread_count', 'reply_count', 'last_activity_at', 'last_post_id', 'last_author_id'), expected
+            ), id=category.id, updated_at=category.updated_at))
+
+    for model, rows in ((ForumPost, post_updates), (ForumCategory, category_updates)):
+        for start in range(0, len(rows), REBUILD_CHUNK_SIZE):
+            db.session.execute(db.update(model), rows[start:start + REBUILD_CHUNK_SIZE])
+    db.session.commit()
+
+    logger.info(f"Forum summaries rebuilt: {len(post_updates)} threads, {len(category_updates)} categories fixed")
+    return {'posts': len(post_updates), 'categories': len(category_updates)}
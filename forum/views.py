@@ -0,0 +1,249 @@
+"""
+Buffered ForumPost view counters.
+
+Counting a view with ``UPDATE forum_posts SET view_count = view_count + 1``
+on every page load makes popular threads a hot row. Views are instead
+accumulated per post (a Redis hash via HINCRBY, or an in-process Counter
+when Redis is unavailable) and a background thread flushes them every
+``FORUM_VIEW_FLUSH_SECONDS`` with one batched UPDATE per chunk of posts.
+
+A member viewing the same post again within ``FORUM_VIEW_DEDUPE_SECONDS``
+is not counted twice. Reads add the still-pending views to the stored
+``view_count``, including views a flush has claimed but not yet written,
+so counts do not go backwards between flushes. (Right after a flush
+commits, and until it deletes its claim, a read may briefly count those
+views twice.)
+
+A flush claims the Redis hash by renaming it to a key listed in
+``forum:views:flushing``. If the database write fails, the claimed views
+are merged back into the shared hash. Claims left behind by a crashed
+worker are merged back once they are ``STALE_CLAIM_SECONDS`` old.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from models import ForumPost, db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SECONDS = 5.0
+DEFAULT_DEDUPE_SECONDS = 1800
+FLUSH_CHUNK_SIZE = 500
+MAX_LOCAL_SEEN = 200000
+
+PENDING_KEY = 'forum:views:pending'
+FLUSHING_KEY = 'forum:views:flushing'  # set of claimed ``forum:views:pending:flushing:<time>:<id>`` hashes
+STALE_CLAIM_SECONDS = 600
+SEEN_KEY = 'forum:views:seen:{post_id}:{viewer}'
+
+
+class ViewCounter:
+    """Coalesces post views and writes them in batches"""
+
+    def __init__(self, redis_client=None, flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+                 dedupe_seconds: int = DEFAULT_DEDUPE_SECONDS):
+        self.redis = redis_client
+        self.flush_seconds = flush_seconds
+        self.dedupe_seconds = dedupe_seconds
+        self.app = None
+        self._lock = threading.Lock()
+        self._pending: Counter = Counter()
+        self._seen: Dict[tuple, float] = {}
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self.flushed = 0
+
+    def init_app(self, app, redis_client=None):
+        self.app = app
+        self.redis = redis_client
+        self.flush_seconds = app.config.get('FORUM_VIEW_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+        self.dedupe_seconds = app.config.get('FORUM_VIEW_DEDUPE_SECONDS', DEFAULT_DEDUPE_SECONDS)
+        atexit.register(self.shutdown)
+
+    # Recording and reading
+
+    def record(self, post_id: int, viewer) -> bool:
+        """Count a view unless ``viewer`` already viewed the post recently"""
+        self._ensure_started()
+        if self.redis is not None:
+            try:
+                key = SEEN_KEY.format(post_id=post_id, viewer=viewer)
+                if not self.redis.set(key, 1, nx=True, ex=self.dedupe_seconds):
+                    return False
+                self.redis.hincrby(PENDING_KEY, post_id, 1)
+                return True
+            except Exception as e:
+                logger.warning(f"Redis view counter unavailable, counting locally: {e}")
+
+        now = time.monotonic()
+        with self._lock:
+            seen_key = (post_id, viewer)
+            if self._seen.get(seen_key, 0) > now:
+                return False
+            if len(self._seen) >= MAX_LOCAL_SEEN:
+                self._seen = {key: expiry for key, expiry in self._seen.items() if expiry > now}
+            self._seen[seen_key] = now + self.dedupe_seconds
+            self._pending[post_id] += 1
+        return True
+
+    def pending(self, post_ids: Iterable[int]) -> Dict[int, int]:
+        """Views recorded but not yet written, for the given posts"""
+        post_ids = list(post_ids)
+        with self._lock:
+            counts = {post_id: self._pending.get(post_id, 0) for post_id in post_ids}
+        if self.redis is not None and post_ids:
+            try:
+                for key in [PENDING_KEY] + sorted(self.redis.smembers(FLUSHING_KEY)):
+                    for post_id, value in zip(post_ids, self.redis.hmget(key, post_ids)):
+                        counts[post_id] += int(value or 0)
+            except Exception as e:
+                logger.warning(f"Could not read pending views from Redis: {e}")
+        return counts
+
+    def view_count(self, post_id: int, stored: Optional[int]) -> int:
+        return (stored or 0) + self.pending([post_id])[post_id]
+
+    # Flushing
+
+    def flush(self) -> int:
+        """Write pending views to the database; returns the views written"""
+        with self._lock:
+            local, self._pending = self._pending, Counter()
+        increments = Counter(local)
+        self._recover_stale_claims()
+        redis_key = self._take_redis_pending()
+        if redis_key is not None:
+            try:
+                for post_id, value in self.redis.hgetall(redis_key).items():
+                    increments[int(post_id)] += int(value)
+            except Exception as e:
+                # The claim stays listed and is merged back once stale
+                logger.error(f"Could not read views taken from Redis: {e}")
+                increments, redis_key = Counter(local), None
+
+        if not increments:
+            return 0
+        try:
+            self._write(increments)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error flushing {sum(increments.values())} forum views: {e}")
+            with self._lock:
+                self._pending.update(local)  # retried on the next flush
+            if redis_key is not None:
+                self._release_claim(redis_key, merge=True)
+            return 0
+
+        if redis_key is not None:
+            self._release_claim(redis_key, merge=False)
+        written = sum(increments.values())
+        self.flushed += written
+        return written
+
+    def _take_redis_pending(self) -> Optional[str]:
+        """Atomically move the shared pending hash aside for this flush"""
+        if self.redis is None:
+            return None
+        key = f'{PENDING_KEY}:flushing:{int(time.time())}:{uuid.uuid4().hex}'
+        try:
+            # Listed before the rename, so readers and recovery always find the claim
+            self.redis.sadd(FLUSHING_KEY, key)
+        except Exception:
+            return None  # Redis down
+        try:
+            self.redis.rename(PENDING_KEY, key)
+            return key
+        except Exception:
+            self._release_claim(key, merge=False)  # nothing pending (no such key)
+            return None
+
+    def _release_claim(self, key: str, merge: bool):
+        """Drop a claimed hash, first adding its views back to the shared one if ``merge``"""
+        try:
+            with self.redis.pipeline() as pipe:
+                if merge:
+                    # WATCH: if another worker releases the claim first, this one aborts
+                    pipe.watch(key)
+                    views = pipe.hgetall(key)
+                    pipe.multi()
+                    for post_id, value in views.items():
+                        pipe.hincrby(PENDING_KEY, post_id, int(value))
+                pipe.delete(key)
+                pipe.srem(FLUSHING_KEY, key)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not release forum view claim {key}: {e}")
+
+    def _recover_stale_claims(self):
+        """Merge back claims whose flush died before writing or releasing them"""
+        if self.redis is None:
+            return
+        try:
+            claims = self.redis.smembers(FLUSHING_KEY)
+        except Exception:
+            return
+        cutoff = time.time() - STALE_CLAIM_SECONDS
+        for key in claims:
+            try:
+                claimed_at = int(key.rsplit(':', 2)[1])
+            except (IndexError, ValueError):
+                claimed_at = 0
+            if claimed_at < cutoff:
+                logger.warning(f"Recovering stale forum view claim {key}")
+                self._release_claim(key, merge=True)
+
+    def _write(self, increments: Counter):
+        post_ids = sorted(increments)  # consistent lock order across workers
+        for start in range(0, len(post_ids), FLUSH_CHUNK_SIZE):
+            chunk = post_ids[start:start + FLUSH_CHUNK_SIZE]
+            db.session.execute(
+                db.update(ForumPost)
+                .where(ForumPost.id.in_(chunk))
+                .values(
+                    view_count=db.func.coalesce(ForumPost.view_count, 0)
+                    + db.case({post_id: increments[post_id] for post_id in chunk}, value=ForumPost.id, else_=0),
+                    # A view is not an edit
+                    updated_at=ForumPost.updated_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+
+    # Background thread
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so pre-forking servers start one per worker
+        if self.app is None or (self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='forum-view-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Forum view flusher error: {e}")
+
+    def shutdown(self):
+        self._stop.set()
+        if self.app is not None:
+            with self.app.app_context():
+                self.flush()
+
+
+view_counter = ViewCounter()
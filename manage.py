@@ -19,6 +19,18 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app import create_app, db
 from models import User, GuildEvent, WikiArticle, ForumPost, ForumCategory, GuildRole, BDOBossTimer, UsefulLink
 from config import config
+from auth.permissions import DEFAULT_ROLES
+from admin.rollups import prune_activity_logs, rebuild_rollups
+from events.load_test import run_rsvp_load_test
+from events.rsvp import recount_attendance
+from bosses.schedule import schedule as boss_schedule
+from forum.summaries import rebuild_summaries
+from forum.search import rebuild_index as rebuild_forum_search_index
+from wiki.revisions import DEFAULT_SNAPSHOT_INTERVAL, compress_all
+from wiki.benchmark import run_revision_benchmark
+from wiki.search import rebuild_index as rebuild_wiki_search_index
+from wiki.links import rebuild_links
+from admin.export import ACTIVITY_LOG_COLUMNS, USER_COLUMNS, iter_activity_logs, iter_users, encode, write_export
 
 # Create Flask app
 app = create_app(os.getenv('FLASK_ENV', 'development'))
@@ -97,12 +109,15 @@ def seed_data():
         {'name': 'Recrue', 'hierarchy_level': 2, 'description': 'Guild Recruit'},
         {'name': 'Invité', 'hierarchy_level': 1, 'description': 'Guest'}
     ]
+    default_permissions = {name: permissions for name, _, permissions in DEFAULT_ROLES}
     
     for role_data in roles:
         existing_role = GuildRole.query.filter_by(name=role_data['name']).first()
         if not existing_role:
-            role = GuildRole(**role_data)
+            role = GuildRole(permissions=default_permissions[role_data['name']], **role_data)
             db.session.add(role)
+        elif existing_role.permissions is None:
+            existing_role.permissions = default_permissions[role_data['name']]
     
     # Create forum categories
     categories = [
@@ -124,19 +139,22 @@ def seed_data():
     
     # Create BDO boss timers
     boss_timers = [
-        {'boss_name': 'Kzarka', 'location': 'Serendia', 'difficulty': 'Easy', 'next_spawn': datetime.utcnow()},
-        {'boss_name': 'Nouver', 'location': 'Valencia', 'difficulty': 'Medium', 'next_spawn': datetime.utcnow()},
-        {'boss_name': 'Karanda', 'location': 'Calpheon', 'difficulty': 'Medium', 'next_spawn': datetime.utcnow()},
-        {'boss_name': 'Kutum', 'location': 'Valencia', 'difficulty': 'Medium', 'next_spawn': datetime.utcnow()},
-        {'boss_name': 'Offin Tett', 'location': 'Kamasylvia', 'difficulty': 'Hard', 'next_spawn': datetime.utcnow()},
-        {'boss_name': 'Vell', 'location': 'Ocean', 'difficulty': 'Very Hard', 'next_spawn': datetime.utcnow()},
-        {'boss_name': 'Garmoth', 'location': 'Drieghan', 'difficulty': 'Very Hard', 'next_spawn': datetime.utcnow()},
-        {'boss_name': 'Quint', 'location': 'Valencia', 'difficulty': 'Easy', 'next_spawn': datetime.utcnow()},
-        {'boss_name': 'Muraka', 'location': 'Valencia', 'difficulty': 'Easy', 'next_spawn': datetime.utcnow()},
-        {'boss_name': 'Rednose', 'location': 'Serendia', 'difficulty': 'Easy', 'next_spawn': datetime.utcnow()}
+        {'boss_name': 'Kzarka', 'location': 'Serendia', 'difficulty': 'Easy'},
+        {'boss_name': 'Nouver', 'location': 'Valencia', 'difficulty': 'Medium'},
+        {'boss_name': 'Karanda', 'location': 'Calpheon', 'difficulty': 'Medium'},
+        {'boss_name': 'Kutum', 'location': 'Valencia', 'difficulty': 'Medium'},
+        {'boss_name': 'Offin Tett', 'location': 'Kamasylvia', 'difficulty': 'Hard'},
+        {'boss_name': 'Vell', 'location': 'Ocean', 'difficulty': 'Very Hard'},
+        {'boss_name': 'Garmoth', 'location': 'Drieghan', 'difficulty': 'Very Hard'},
+        {'boss_name': 'Quint', 'location': 'Valencia', 'difficulty': 'Easy'},
+        {'boss_name': 'Muraka', 'location': 'Valencia', 'difficulty': 'Easy'},
+        {'boss_name': 'Rednose', 'location': 'Serendia', 'difficulty': 'Easy'}
     ]
     
     for boss_data in boss_timers:
+        # Informational only; live spawn times come from bosses.schedule
+        spawn = boss_schedule.next_spawn(boss_data['boss_name'])
+        boss_data['next_spawn'] = spawn.at.replace(tzinfo=None) if spawn else datetime.utcnow()
         existing_boss = BDOBossTimer.query.filter_by(boss_name=boss_data['boss_name']).first()
         if not existing_boss:
             boss = BDOBossTimer(**boss_data)
@@ -208,6 +226,135 @@ def backup_db():
     click.echo(f'Backup created: {backup_file}')
     click.echo('Note: Implement proper backup strategy for production!')
 
+@app.cli.command()
+@click.option('--days', type=int, default=None, help='Retention window in days (defaults to ACTIVITY_LOG_RETENTION_DAYS)')
+@click.option('--archive', default=None, help='Append pruned rows to this gzipped NDJSON file')
+@click.option('--chunk-size', default=5000, help='Rows deleted per transaction')
+def prune_activity(days, archive, chunk_size):
+    """Delete (and optionally archive) old activity logs"""
+    if days is None:
+        days = app.config.get('ACTIVITY_LOG_RETENTION_DAYS', 180)
+    
+    click.echo(f'Pruning activity logs older than {days} days...')
+    deleted = prune_activity_logs(days, archive_path=archive, chunk_size=chunk_size)
+    click.echo(f'{deleted} activity log rows pruned.')
+
+@app.cli.command()
+@click.option('--since', default=None, help='Only rebuild days on or after this date (YYYY-MM-DD, '
+                                              'defaults to the oldest raw log day)')
+def rebuild_activity_rollups(since):
+    """Recompute daily activity rollups from the raw activity log"""
+    since_date = datetime.strptime(since, '%Y-%m-%d').date() if since else None
+    
+    click.echo('Rebuilding activity rollups...')
+    try:
+        rows = rebuild_rollups(since_date)
+    except ValueError as e:
+        click.echo(f'Error: {e}')
+        sys.exit(1)
+    click.echo(f'{rows} rollup rows written.')
+
+@app.cli.command()
+@click.argument('table', type=click.Choice(['activity-logs', 'users']))
+@click.option('--output', required=True, help='Output file (gzipped when it ends in .gz)')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson', help='Output format')
+@click.option('--user-id', type=int, default=None, help='Activity logs: only this user')
+@click.option('--action', default='', help='Activity logs: action substring')
+@click.option('--search', default='', help='Users: username/email/Discord substring')
+@click.option('--role', default='', help='Users: exact role')
+def export_data(table, output, fmt, user_id, action, search, role):
+    """Stream a full table export to a file"""
+    click.echo(f'Exporting {table} to {output}...')
+    
+    if table == 'activity-logs':
+        rows, columns = iter_activity_logs(user_id, action), ACTIVITY_LOG_COLUMNS
+    else:
+        rows, columns = iter_users(search, role), USER_COLUMNS
+    
+    write_export(encode(rows, columns, fmt), output)
+    click.echo('Export completed!')
+
+@app.cli.command()
+@click.option('--event-id', type=int, default=None, help='Only this event')
+def recount_event_attendance(event_id):
+    """Resynchronise GuildEvent.attending_count from participant rows"""
+    fixed = recount_attendance(event_id)
+    click.echo(f'Fixed attendance counters on {fixed} events')
+
+@app.cli.command()
+def repair_forum_summaries():
+    """Recompute forum thread and category counters and last activity"""
+    fixed = rebuild_summaries()
+    click.echo(f"Fixed summaries on {fixed['posts']} threads and {fixed['categories']} categories")
+
+@app.cli.command()
+@click.option('--chunk-size', default=2000, help='Documents written per transaction')
+def rebuild_forum_search(chunk_size):
+    """Rebuild the forum full-text search index (stop forum writes first)"""
+    totals = rebuild_forum_search_index(chunk_size)
+    click.echo(f"Indexed {totals['documents']} documents ({totals['terms']} terms, {totals['postings']} postings)")
+    if totals['concurrent_writes']:
+        click.echo('WARNING: the forum changed during the rebuild; run it again with forum writes stopped')
+        sys.exit(1)
+
+@app.cli.command()
+@click.option('--interval', type=int, default=None, help='Snapshot interval (defaults to WIKI_SNAPSHOT_INTERVAL)')
+@click.option('--article-id', type=int, default=None, help='Only this article')
+def compress_wiki_revisions(interval, article_id):
+    """Convert wiki revisions to snapshots plus compressed deltas"""
+    interval = interval or app.config.get('WIKI_SNAPSHOT_INTERVAL', DEFAULT_SNAPSHOT_INTERVAL)
+    totals = compress_all(interval, article_id)
+    click.echo(f"Compressed {totals['revisions']} revisions of {totals['articles']} articles: "
+               f"{totals['bytes_before']} -> {totals['bytes_after']} bytes")
+
+@app.cli.command()
+def rebuild_wiki_search():
+    """Rebuild the wiki search and tag index from articles (stop wiki edits first)"""
+    totals = rebuild_wiki_search_index()
+    click.echo(f"Indexed {totals['articles']} articles ({totals['terms']} terms, {totals['tags']} tags)")
+
+@app.cli.command()
+def rebuild_wiki_links():
+    """Rebuild the wiki link graph from article contents"""
+    totals = rebuild_links()
+    click.echo(f"Extracted {totals['links']} links from {totals['articles']} articles")
+
+@app.cli.command()
+@click.option('--samples', default=500, help='Revisions to read')
+def benchmark_wiki_revisions(samples):
+    """Report wiki revision storage and reconstruction latency"""
+    report = run_revision_benchmark(samples)
+    storage = report['storage']
+    click.echo(f"{storage['revisions']} revisions ({storage['uncompressed_revisions']} uncompressed): "
+               f"{storage['stored_bytes']} bytes stored for {storage['text_bytes']} bytes of text "
+               f"(ratio {storage['ratio']})")
+    reads = report['reads']
+    if reads:
+        click.echo(f"{reads['samples']} reads: p50 {reads['p50_ms']} ms, p95 {reads['p95_ms']} ms, "
+                   f"max {reads['max_ms']} ms, chain depth mean {reads['mean_chain_depth']} / max {reads['max_chain_depth']}")
+
+@app.cli.command()
+@click.option('--members', default=300, help='Members signing up at once')
+@click.option('--capacity', default=50, help='Event max_participants')
+@click.option('--workers', default=50, help='Concurrent worker threads')
+@click.option('--cancellations', default=25, help='Attendees cancelling concurrently afterwards')
+def load_test_rsvp(members, capacity, workers, cancellations):
+    """Load test concurrent RSVPs against the configured database"""
+    click.echo(f'Signing up {members} members for {capacity} seats with {workers} workers...')
+    report = run_rsvp_load_test(app, members, capacity, workers, cancellations)
+    
+    for phase in ('sign_ups', 'cancellations'):
+        stats = report[phase]
+        click.echo(f"{phase}: {stats['requests']} requests, {stats['per_second']}/s, "
+                   f"p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms")
+    
+    if report['ok']:
+        click.echo('No overbooking, counters consistent, waitlist promoted in order')
+    else:
+        for failure in report['failures']:
+            click.echo(f'FAILED: {failure}')
+        sys.exit(1)
+
 @app.cli.command()
 @click.option('--env', default='development', help='Environment (development/production/testing)')
 def run_server(env):
@@ -0,0 +1 @@
+# Members package
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""
+Batch member updates.
+
+Officers update gear scores and roles for many members at once after node
+wars. A batch is validated up front (the actor's permissions are resolved
+once, all targets are loaded in one projection query), then every valid
+patch is applied with executemany UPDATEs by primary key in a single
+transaction. Each item gets its own result so the caller can tell what was
+applied, skipped or rejected.
+
+Bulk UPDATEs bypass the ORM unit of work, so the member indexes and the
+principal cache are refreshed explicitly after the commit.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import User, db
+from auth import permissions
+from auth.principals import invalidate_principal
+from members.events import SNAPSHOT_FIELDS, notify_users_changed
+
+MAX_BATCH_SIZE = 500
+
+# Fields members may set on their own profile
+PROFILE_FIELDS = ('character_name', 'character_class', 'equipment_score', 'family_name', 'bio')
+# Fields that require manage_members
+ADMIN_FIELDS = ('role', 'is_validated')
+
+# Columns loaded to compare against (bio can be large and is not compared)
+LOADED_FIELDS = (
+    'username', 'role', 'is_validated', 'character_name', 'character_class',
+    'equipment_score', 'family_name'
+)
+
+STRING_LIMITS = {'character_name': 100, 'character_class': 50, 'family_name': 100}
+
+
+class BatchError(ValueError):
+    """The batch as a whole is malformed"""
+
+
+def _item_result(member_id, status: str, message: Optional[str] = None, **extra) -> Dict[str, Any]:
+    result = {'id': member_id, 'status': status}
+    if message:
+        result['message'] = message
+    result.update(extra)
+    return result
+
+
+def _validate_fields(patch: Dict[str, Any], snapshot) -> Optional[str]:
+    """Return an error message for the first invalid field, if any"""
+    for field, value in patch.items():
+        if field not in PROFILE_FIELDS and field not in ADMIN_FIELDS:
+            return f'Unknown field: {field}'
+        if field == 'equipment_score':
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                return 'equipment_score must be a non-negative integer'
+        elif field == 'is_validated':
+            if not isinstance(value, bool):
+                return 'is_validated must be a boolean'
+        elif field == 'role':
+            if not isinstance(value, str) or value not in snapshot.roles:
+                return 'Invalid role'
+        elif value is not None and not isinstance(value, str):
+            return f'{field} must be a string'
+        elif field in STRING_LIMITS and value and len(value) > STRING_LIMITS[field]:
+            return f'{field} is too long'
+    return None
+
+
+def apply_member_patches(actor, items: List[Dict[str, Any]],
+                         atomic: bool = False) -> Tuple[List[Dict[str, Any]], List[Tuple[str, Dict[str, Any]]]]:
+    """Validate and apply member patches in one transaction
+
+    ``items`` are dicts with an ``id`` plus the fields to change. Returns the
+    per-item results (in request order) and the (action, details) activity
+    entries to log. With ``atomic``, any rejected item aborts the whole
+    batch and nothing is written.
+    """
+    if not isinstance(items, list) or not items:
+        raise BatchError('members must be a non-empty list')
+    if len(items) > MAX_BATCH_SIZE:
+        raise BatchError(f'At most {MAX_BATCH_SIZE} members per batch')
+
+    # Permissions are resolved once for the whole batch
+    snapshot = permissions.permission_engine.snapshot()
+    can_manage = snapshot.has(actor.role, 'manage_members')
+    is_super_admin = snapshot.is_super_admin(actor.role)
+    actor_level = snapshot.level(actor.role)
+
+    ids = {item.get('id') for item in items if isinstance(item, dict) and isinstance(item.get('id'), int)}
+    current = {}
+    if ids:
+        query = db.session.query(User.id, *[getattr(User, field) for field in LOADED_FIELDS])
+        current = {row.id: row for row in query.filter(User.id.in_(ids)).all()}
+
+    results = []
+    seen = set()
+    updates: Dict[int, Dict[str, Any]] = {}
+    changes: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        member_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(member_id, int):
+            results.append(_item_result(member_id, 'invalid', 'Each item needs an integer id'))
+            continue
+        if member_id in seen:
+            results.append(_item_result(member_id, 'invalid', 'Duplicate member in batch'))
+            continue
+        seen.add(member_id)
+
+        row = current.get(member_id)
+        if row is None:
+            results.append(_item_result(member_id, 'not_found', 'Member not found'))
+            continue
+
+        patch = {field: value for field, value in item.items() if field != 'id'}
+        error = _validate_fields(patch, snapshot)
+        if error:
+            results.append(_item_result(member_id, 'invalid', error))
+            continue
+
+        if member_id != actor.id and not can_manage:
+            results.append(_item_result(member_id, 'forbidden', 'Insufficient permissions'))
+            continue
+        if not can_manage and any(field in ADMIN_FIELDS for field in patch):
+            results.append(_item_result(member_id, 'forbidden', 'Admin fields require manage_members'))
+            continue
+
+        if 'role' in patch and patch['role'] != row.role:
+            if member_id == actor.id and not snapshot.is_super_admin(patch['role']):
+                results.append(_item_result(member_id, 'forbidden', 'Cannot demote yourself'))
+                continue
+            if not is_super_admin and max(snapshot.level(row.role), snapshot.level(patch['role'])) >= actor_level:
+                results.append(_item_result(member_id, 'forbidden', 'Cannot assign roles at or above your own'))
+                continue
+
+        # bio is not loaded (it can be large), so it always counts as a change
+        changed = {
+            field: value for field, value in patch.items()
+            if field == 'bio' or getattr(row, field) != value
+        }
+        if not changed:
+            results.append(_item_result(member_id, 'unchanged'))
+            continue
+
+        updates[member_id] = changed
+        changes[member_id] = {
+            field: {'old': getattr(row, field), 'new': value}
+            for field, value in changed.items() if field != 'bio'
+        }
+        results.append(_item_result(member_id, 'updated', fields=sorted(changed)))
+
+    if atomic and any(result['status'] not in ('updated', 'unchanged') for result in results):
+        for result in results:
+            if result['status'] == 'updated':
+                result['status'] = 'skipped'
+                result['message'] = 'Batch rejected'
+        return results, []
+
+    if updates:
+        now = datetime.utcnow()
+        rows = [dict(changed, id=member_id, updated_at=now) for member_id, changed in updates.items()]
+        try:
+            # ORM bulk UPDATE by primary key: one executemany per distinct field set
+            db.session.execute(db.update(User), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        _refresh_member_caches(list(updates))
+
+    activity = []
+    for member_id, changed in changes.items():
+        username = current[member_id].username
+        if 'role' in changed:
+            activity.append(('change_user_role', {
+                'target_user_id': member_id,
+                'old_role': changed['role']['old'],
+                'new_role': changed['role']['new'],
+                'username': username
+            }))
+        fields = {field: change for field, change in changed.items() if field != 'role'}
+        if fields or 'bio' in updates[member_id]:
+            activity.append(('update_member', {
+                'target_user_id': member_id,
+                'username': username,
+                'changes': fields,
+                'batch': True
+            }))
+
+    return results, activity
+
+
+def _refresh_member_caches(member_ids: List[int]):
+    rows = db.session.query(*[getattr(User, field) for field in SNAPSHOT_FIELDS]).filter(
+        User.id.in_(member_ids)
+    ).all()
+    notify_users_changed(dict(row._mapping) for row in rows)
+    for member_id in member_ids:
+        invalidate_principal(member_id)
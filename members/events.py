@@ -0,0 +1,67 @@
+"""
+Commit hooks for in-process member indexes.
+
+User inserts and updates are captured during flush (while the attributes
+are still loaded) and handed to registered listeners only once the
+transaction commits; rolled-back changes are discarded. Bulk UPDATE
+statements bypass the ORM, so callers issuing them should call
+``notify_users_changed`` themselves.
+"""
+
+import logging
+from typing import Callable, Dict, Iterable, List
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models import User
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = (
+    'id', 'username', 'email', 'discord_username', 'role', 'character_name',
+    'character_class', 'equipment_score', 'is_active', 'created_at'
+)
+
+_SESSION_KEY = 'changed_users'
+_listeners: List[Callable[[List[Dict]], None]] = []
+
+
+def on_users_committed(listener: Callable[[List[Dict]], None]):
+    """Register ``listener(snapshots)`` to run after user changes commit"""
+    _listeners.append(listener)
+    return listener
+
+
+def snapshot_user(user) -> Dict:
+    return {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+
+
+def notify_users_changed(snapshots: Iterable[Dict]):
+    snapshots = list(snapshots)
+    if not snapshots:
+        return
+    for listener in _listeners:
+        try:
+            listener(snapshots)
+        except Exception as e:
+            logger.error(f"Error updating member index: {str(e)}")
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+def _user_flushed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_SESSION_KEY, {})[target.id] = snapshot_user(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    changes = session.info.pop(_SESSION_KEY, None)
+    if changes:
+        notify_users_changed(changes.values())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop(_SESSION_KEY, None)
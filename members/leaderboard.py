@@ -0,0 +1,206 @@
+"""
+Equipment-score leaderboard and gear tier analytics.
+
+Active members with an equipment score are kept in a list sorted by
+(-score, user_id), plus the same list per class. Top-N is a slice,
+a member's rank and percentile are binary searches, and tier histograms are
+one binary search per tier threshold over the sorted scores, so classifying
+the whole roster never walks it member by member. Updates are applied
+incrementally when user changes commit (see members.events).
+"""
+
+import bisect
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from models import User, db
+from members.events import on_users_committed
+
+DEFAULT_REBUILD_SECONDS = 600
+
+
+class GearTier(NamedTuple):
+    min_score: int
+    name: str
+    color: str
+    recommended_content: List[str]
+
+
+# Ascending by min_score
+GEAR_TIERS = (
+    GearTier(0, 'Beginner', '#94a3b8', ['Balenos', 'Serendia', 'Calpheon']),
+    GearTier(400, 'Novice', '#16a34a', ['Calpheon', 'Mediah', 'Guild Missions']),
+    GearTier(500, 'Intermediate', '#ca8a04', ['Mediah', 'Valencia', 'Node Wars']),
+    GearTier(600, 'Advanced', '#ea580c', ['Abyss Dungeons', 'Valencia', 'Kamasylvia', 'Drieghan']),
+    GearTier(700, 'Endgame', '#dc2626', ['Atoraxxion', 'Thornwood', 'Sycraia', 'Hadum'])
+)
+TIER_THRESHOLDS = [tier.min_score for tier in GEAR_TIERS]
+
+
+def classify_score(equipment_score: int) -> GearTier:
+    index = bisect.bisect_right(TIER_THRESHOLDS, equipment_score) - 1
+    return GEAR_TIERS[max(index, 0)]
+
+
+class LeaderboardEntry(NamedTuple):
+    user_id: int
+    score: int
+    username: str
+    character_name: Optional[str]
+    character_class: Optional[str]
+
+
+def _count_above(order: List[Tuple[int, int]], score: int) -> int:
+    """Members scoring strictly more than score in a (-score, user_id) list"""
+    return bisect.bisect_left(order, (-score,))
+
+
+def _count_at_least(order: List[Tuple[int, int]], score: int) -> int:
+    """Members scoring at least score in a (-score, user_id) list"""
+    return bisect.bisect_right(order, (-score, math.inf))
+
+
+class GearLeaderboard:
+    """Sorted equipment scores with incremental updates"""
+
+    def __init__(self, rebuild_seconds: float = DEFAULT_REBUILD_SECONDS):
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._entries: Dict[int, LeaderboardEntry] = {}
+        self._order: List[Tuple[int, int]] = []  # (-score, user_id), best first
+        self._by_class: Dict[str, List[Tuple[int, int]]] = {}  # same, per class
+
+    def ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.rebuild_seconds:
+            self.rebuild()
+
+    def rebuild(self):
+        rows = db.session.query(
+            User.id, User.equipment_score, User.username, User.character_name, User.character_class
+        ).filter(User.is_active == True, User.equipment_score.isnot(None)).all()
+
+        entries = {row.id: LeaderboardEntry(*row) for row in rows}
+        order = sorted((-entry.score, entry.user_id) for entry in entries.values())
+        by_class = {}
+        for key in order:
+            character_class = entries[key[1]].character_class
+            if character_class:
+                by_class.setdefault(character_class, []).append(key)
+
+        with self._lock:
+            self._entries = entries
+            self._order = order
+            self._by_class = by_class
+            self._built_at = time.monotonic()
+
+    def upsert(self, user: Dict[str, Any]):
+        with self._lock:
+            if self._built_at is None:
+                return  # built lazily on first read
+            score = user['equipment_score']
+            if score is not None:
+                try:
+                    score = int(score)  # snapshots hold the value as assigned, before the database coerced it
+                except (TypeError, ValueError):
+                    self._built_at = None  # reread what was stored on the next query
+                    return
+            self._remove(user['id'])
+            if user['is_active'] and score is not None:
+                entry = LeaderboardEntry(
+                    user['id'], score, user['username'],
+                    user['character_name'], user['character_class']
+                )
+                key = (-entry.score, entry.user_id)
+                self._entries[entry.user_id] = entry
+                bisect.insort(self._order, key)
+                if entry.character_class:
+                    bisect.insort(self._by_class.setdefault(entry.character_class, []), key)
+
+    def _remove(self, user_id: int):
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        key = (-entry.score, user_id)
+        del self._order[bisect.bisect_left(self._order, key)]
+        if entry.character_class:
+            ranked = self._by_class[entry.character_class]
+            del ranked[bisect.bisect_left(ranked, key)]
+
+    # Queries
+
+    def top(self, limit: int = 10, character_class: Optional[str] = None) -> List[Dict[str, Any]]:
+        self.ensure_fresh()
+        with self._lock:
+            ranked = self._by_class.get(character_class, []) if character_class else self._order
+            return [self._describe(self._entries[user_id]) for _, user_id in ranked[:limit]]
+
+    def rank_of(self, user_id: int) -> Optional[Dict[str, Any]]:
+        self.ensure_fresh()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            total = len(self._order)
+            lower = total - _count_at_least(self._order, entry.score)
+            result = self._describe(entry)
+            # Competition ranking: tied members share the best rank
+            result.update({
+                'rank': _count_above(self._order, entry.score) + 1,
+                'total': total,
+                'percentile': round(100.0 * lower / total, 1)
+            })
+            if entry.character_class:
+                ranked = self._by_class[entry.character_class]
+                result['class_rank'] = _count_above(ranked, entry.score) + 1
+                result['class_total'] = len(ranked)
+            return result
+
+    def histogram(self) -> Dict[str, Any]:
+        self.ensure_fresh()
+        with self._lock:
+            by_class = {
+                character_class: self._tier_counts(ranked)
+                for character_class, ranked in sorted(self._by_class.items()) if ranked
+            }
+            total = len(self._order)
+            return {
+                'total': total,
+                'median': -self._order[total // 2][0] if total else None,
+                'tiers': self._tier_counts(self._order),
+                'by_class': by_class
+            }
+
+    @staticmethod
+    def _tier_counts(ranked: List[Tuple[int, int]]) -> Dict[str, int]:
+        at_least = [_count_at_least(ranked, tier.min_score) for tier in GEAR_TIERS] + [0]
+        at_least[0] = len(ranked)  # scores below the first threshold still count as its tier
+        return {tier.name: at_least[index] - at_least[index + 1] for index, tier in enumerate(GEAR_TIERS)}
+
+    @staticmethod
+    def _describe(entry: LeaderboardEntry) -> Dict[str, Any]:
+        tier = classify_score(entry.score)
+        return {
+            'id': entry.user_id,
+            'username': entry.username,
+            'character_name': entry.character_name,
+            'character_class': entry.character_class,
+            'equipment_score': entry.score,
+            'tier': tier.name,
+            'tier_color': tier.color
+        }
+
+
+leaderboard = GearLeaderboard()
+
+
+def configure_leaderboard(app):
+    leaderboard.rebuild_seconds = app.config.get('LEADERBOARD_REBUILD_SECONDS', DEFAULT_REBUILD_SECONDS)
+
+
+@on_users_committed
+def _apply_user_changes(snapshots: Iterable[Dict[str, Any]]):
+    for user in snapshots:
+        leaderboard.upsert(user)
@@ -0,0 +1,89 @@
+"""
+Member roster reads for /api/members.
+
+The roster is read as a column projection (never the OAuth token columns)
+and streamed as JSON row by row. Its version is derived from
+max(updated_at) and the active member count, which one indexed aggregate
+query answers, so clients holding the current ETag get a 304 without any
+member rows being loaded.
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import func
+from models import User, db
+
+# Bump when the serialized member shape changes so cached ETags are invalidated
+ROSTER_FORMAT_VERSION = 1
+
+MEMBER_COLUMNS = (
+    User.id,
+    User.username,
+    User.email,
+    User.discord_id,
+    User.discord_username,
+    User.role,
+    User.character_name,
+    User.character_class,
+    User.equipment_score,
+    User.family_name,
+    User.bio,
+    User.profile_image,
+    User.is_validated,
+    User.created_at,
+    User.updated_at
+)
+
+STREAM_CHUNK_SIZE = 500
+
+
+def roster_version() -> Tuple[Optional[datetime], int]:
+    """(latest updated_at, member count) over active members"""
+    latest, count = db.session.query(
+        func.max(User.updated_at), func.count(User.id)
+    ).filter(User.is_active == True).one()
+    return latest, count
+
+
+def roster_etag(version: Tuple[Optional[datetime], int]) -> str:
+    latest, count = version
+    raw = f"{ROSTER_FORMAT_VERSION}|{latest.isoformat() if latest else ''}|{count}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def serialize_member(row) -> Dict[str, Any]:
+    return {
+        'id': row.id,
+        'username': row.username,
+        'email': row.email,
+        'discord_id': row.discord_id,
+        'discord_username': row.discord_username,
+        'role': row.role,
+        'character_name': row.character_name,
+        'character_class': row.character_class,
+        'equipment_score': row.equipment_score,
+        'family_name': row.family_name,
+        'bio': row.bio,
+        'profile_image': row.profile_image,
+        'is_validated': row.is_validated,
+        'created_at': row.created_at.isoformat(),
+        'updated_at': row.updated_at.isoformat()
+    }
+
+
+def iter_active_members() -> Iterator[Any]:
+    query = db.session.query(*MEMBER_COLUMNS).filter(User.is_active == True).order_by(User.id)
+    return query.execution_options(stream_results=True).yield_per(STREAM_CHUNK_SIZE)
+
+
+def stream_members_json(rows) -> Iterator[str]:
+    """Encode rows as ``{"members": [...]}`` without building the full list"""
+    yield '{"members": ['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(serialize_member(row), ensure_ascii=False)
+        separator = ', '
+    yield ']}'
@@ -0,0 +1,292 @@
+"""
+In-process member search index for the admin user list.
+
+``username LIKE '%q%' OR email LIKE ...`` cannot use an index, so every
+keystroke in the admin panel scanned the users table. This index keeps a
+trigram posting list over username, email and Discord username: queries of
+three or more characters intersect the postings of their trigrams and
+verify the few remaining candidates. Shorter queries use a sorted prefix
+list. Role and class filters are set intersections.
+
+The index is built lazily from a column projection, updated incrementally
+when user changes commit (see members.events) and rebuilt periodically to
+pick up writes made outside this process (other workers, the Discord bot).
+Periodic rebuilds run in a background thread while the old index keeps
+serving queries; changes committed while a rebuild reads the table are
+replayed onto the new index before it replaces the old one.
+"""
+
+import bisect
+import heapq
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from flask import current_app
+from models import User, db
+from members.events import on_users_committed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REBUILD_SECONDS = 600
+
+SEARCH_FIELDS = ('username', 'discord_username', 'email')
+
+# Higher is better: a match on the username outranks one on the email
+FIELD_WEIGHTS = {'username': 3, 'discord_username': 2, 'email': 1}
+EXACT, PREFIX = 2, 1
+
+
+class MemberDoc(NamedTuple):
+    id: int
+    values: Tuple[str, ...]  # lowercased SEARCH_FIELDS
+    joined: str  # values joined by NUL, for one substring check per doc
+    role: Optional[str]
+    character_class: Optional[str]
+    sort_key: str
+
+
+def trigrams(value: str) -> Set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class MemberSearchIndex:
+    """Trigram + prefix index over users, with role/class facets"""
+
+    def __init__(self, rebuild_seconds: float = DEFAULT_REBUILD_SECONDS):
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._rebuilding = False
+        self._rebuild_lock = threading.Lock()  # one rebuild at a time
+        self._changes: Optional[Dict[int, Optional[Dict]]] = None  # user id -> upsert (None: removal) during a rebuild
+        self._reset()
+
+    def _reset(self):
+        self._docs: Dict[int, MemberDoc] = {}
+        self._grams: Dict[str, Set[int]] = {}
+        self._prefixes: List[Tuple[str, int]] = []
+        self._by_role: Dict[str, Set[int]] = {}
+        self._by_class: Dict[str, Set[int]] = {}
+
+    # Building and maintenance
+
+    def ensure_fresh(self):
+        if self._built_at is None:
+            with self._rebuild_lock:
+                if self._built_at is None:  # unless a concurrent first search built it
+                    self._rebuild()
+            return
+        with self._lock:
+            if time.monotonic() - self._built_at <= self.rebuild_seconds or self._rebuilding:
+                return
+            self._rebuilding = True
+        # Keep serving the current index while a fresh one is built
+        app = current_app._get_current_object()
+        threading.Thread(target=self._rebuild_in_background, args=(app,), daemon=True).start()
+
+    def _rebuild_in_background(self, app):
+        try:
+            with app.app_context():
+                self.rebuild()
+        except Exception as e:
+            logger.error(f"Error rebuilding member search index: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+    def rebuild(self):
+        with self._rebuild_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        with self._lock:
+            self._changes = {}
+        try:
+            rows = db.session.query(
+                User.id, User.username, User.email, User.discord_username,
+                User.role, User.character_class
+            ).all()
+            fresh = MemberSearchIndex(self.rebuild_seconds)
+            for row in rows:
+                fresh._add(self._doc(row._mapping))
+            fresh._prefixes.sort()
+            fresh._built_at = time.monotonic()
+
+            with self._lock:
+                # The rows may predate changes committed since the query started
+                for user_id, user in self._changes.items():
+                    if user is None:
+                        fresh.remove(user_id)
+                    else:
+                        fresh.upsert(user)
+                self._docs, self._grams = fresh._docs, fresh._grams
+                self._prefixes = fresh._prefixes
+                self._by_role, self._by_class = fresh._by_role, fresh._by_class
+                self._built_at = fresh._built_at
+        finally:
+            with self._lock:
+                self._changes = None
+
+    def upsert(self, user: Dict):
+        with self._lock:
+            if self._changes is not None:
+                self._changes[user['id']] = user
+            if self._built_at is None:
+                return  # built lazily on first search, which will include this user
+            self._remove(user['id'])
+            doc = self._doc(user)
+            self._add(doc)
+            for value in doc.values:
+                if value:
+                    bisect.insort(self._prefixes, (value, doc.id))
+
+    def remove(self, user_id: int):
+        with self._lock:
+            if self._changes is not None:
+                self._changes[user_id] = None
+            self._remove(user_id)
+
+    @staticmethod
+    def _doc(user) -> MemberDoc:
+        values = tuple((user[field] or '').lower() for field in SEARCH_FIELDS)
+        return MemberDoc(user['id'], values, '\x00'.join(values), user['role'], user['character_class'], values[0])
+
+    def _add(self, doc: MemberDoc):
+        self._docs[doc.id] = doc
+        for value in doc.values:
+            for gram in trigrams(value):
+                self._grams.setdefault(gram, set()).add(doc.id)
+            if value and self._built_at is None:
+                self._prefixes.append((value, doc.id))  # sorted once by rebuild()
+        if doc.role:
+            self._by_role.setdefault(doc.role, set()).add(doc.id)
+        if doc.character_class:
+            self._by_class.setdefault(doc.character_class, set()).add(doc.id)
+
+    def _remove(self, user_id: int):
+        doc = self._docs.pop(user_id, None)
+        if doc is None:
+            return
+        for value in doc.values:
+            for gram in trigrams(value):
+                postings = self._grams.get(gram)
+                if postings:
+                    postings.discard(user_id)
+                    if not postings:
+                        del self._grams[gram]
+            if value:
+                position = bisect.bisect_left(self._prefixes, (value, user_id))
+                if position < len(self._prefixes) and self._prefixes[position] == (value, user_id):
+                    del self._prefixes[position]
+        if doc.role in self._by_role:
+            self._by_role[doc.role].discard(user_id)
+        if doc.character_class in self._by_class:
+            self._by_class[doc.character_class].discard(user_id)
+
+    # Queries
+
+    def search(self, query: str, role: Optional[str] = None, character_class: Optional[str] = None,
+               offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[int]]:
+        """Return (total matches, ids of the requested page), best match first
+
+        Matches are ranked in two tiers: exact/prefix matches on any field,
+        scored by field, then substring-only matches alphabetically. Only the
+        requested page of the substring tier is ordered, so broad queries
+        stay cheap.
+        """
+        self.ensure_fresh()
+        query = query.strip().lower()
+        end = offset + limit if limit is not None else None
+
+        with self._lock:
+            filters = [
+                allowed for allowed in (
+                    self._by_role.get(role, set()) if role else None,
+                    self._by_class.get(character_class, set()) if character_class else None
+                ) if allowed is not None
+            ]
+
+            if not query:
+                matches = set.intersection(*filters) if filters else set(self._docs)
+                ranked = self._alphabetical(matches, end)
+                return len(matches), ranked[offset:end]
+
+            prefixed = self._prefix_candidates(query)
+            for allowed in filters:
+                prefixed &= allowed
+
+            substring = set()
+            if len(query) >= 3:
+                candidates = self._trigram_candidates(query) - prefixed
+                for allowed in sorted(filters, key=len):
+                    candidates &= allowed
+                docs = self._docs
+                substring = {user_id for user_id in candidates if query in docs[user_id].joined}
+
+            total = len(prefixed) + len(substring)
+            score = lambda user_id: (-self._score(self._docs[user_id], query), self._docs[user_id].sort_key)
+            if end is None or end >= len(prefixed):
+                ranked = sorted(prefixed, key=score)
+            else:
+                ranked = heapq.nsmallest(end, prefixed, key=score)
+            if end is None or end > len(ranked):
+                remaining = None if end is None else end - len(ranked)
+                ranked += self._alphabetical(substring, remaining)
+            return total, ranked[offset:end]
+
+    def _alphabetical(self, user_ids: Set[int], count: Optional[int]) -> List[int]:
+        key = lambda user_id: self._docs[user_id].sort_key
+        if count is None or count >= len(user_ids):
+            return sorted(user_ids, key=key)
+        return heapq.nsmallest(count, user_ids, key=key)
+
+    def _trigram_candidates(self, query: str) -> Set[int]:
+        postings = [self._grams.get(gram) for gram in trigrams(query)]
+        if not all(postings):
+            return set()
+        postings.sort(key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def _prefix_candidates(self, query: str) -> Set[int]:
+        prefixes = self._prefixes
+        position = bisect.bisect_left(prefixes, (query,))
+        candidates = set()
+        while position < len(prefixes) and prefixes[position][0].startswith(query):
+            candidates.add(prefixes[position][1])
+            position += 1
+        return candidates
+
+    @staticmethod
+    def _score(doc: MemberDoc, query: str) -> int:
+        best = 0
+        for field, value in zip(SEARCH_FIELDS, doc.values):
+            if value == query:
+                match = EXACT
+            elif value.startswith(query):
+                match = PREFIX
+            else:
+                continue
+            best = max(best, match * 10 + FIELD_WEIGHTS[field])
+        return best
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': len(self._docs),
+                'trigrams': len(self._grams),
+                'built_seconds_ago': round(time.monotonic() - self._built_at, 1) if self._built_at else None
+            }
+
+
+member_index = MemberSearchIndex()
+
+
+def configure_member_search(app):
+    member_index.rebuild_seconds = app.config.get('MEMBER_SEARCH_REBUILD_SECONDS', DEFAULT_REBUILD_SECONDS)
+
+
+@on_users_committed
+def _apply_user_changes(snapshots: Iterable[Dict]):
+    for user in snapshots:
+        member_index.upsert(user)
@@ -7,6 +7,10 @@ db = SQLAlchemy()
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Roster version lookups: max(updated_at), count(*) over active members
+        db.Index('ix_users_active_updated', 'is_active', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -88,6 +92,14 @@ class GuildRole(db.Model):
 
 class GuildEvent(db.Model):
     __tablename__ = 'guild_events'
+    __table_args__ = (
+        # Calendar range queries, ordered by start
+        db.Index('ix_guild_events_date_time', 'event_date', 'event_time'),
+        # Incremental change polling by the Discord bot's reminder scheduler
+        db.Index('ix_guild_events_updated_at', 'updated_at'),
+        # Recurring series active in a window
+        db.Index('ix_guild_events_recurrence_end', 'recurrence_rule', 'recurrence_end'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -96,6 +108,15 @@ class GuildEvent(db.Model):
     event_time = db.Column(db.Time, nullable=False)
     event_type = db.Column(db.String(50), nullable=False)  # pvp, pve, meeting, raid, other
     max_participants = db.Column(db.Integer, nullable=True)
+    # Participants with status 'attending'; maintained by events.rsvp so
+    # capacity can be enforced with one conditional UPDATE
+    attending_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Recurrence: an RRULE subset (see events.recurrence); event_date/event_time
+    # are the first occurrence. recurrence_end is the last occurrence date,
+    # NULL when open-ended.
+    recurrence_rule = db.Column(db.String(255), nullable=True)
+    recurrence_end = db.Column(db.Date, nullable=True)
     
     # Location and additional info
     location = db.Column(db.String(255), nullable=True)
@@ -110,14 +131,21 @@ class GuildEvent(db.Model):
     
     # Relationships
     participants = db.relationship('EventParticipant', backref='event', lazy=True, cascade='all, delete-orphan')
+    overrides = db.relationship('EventOccurrenceOverride', backref='event', lazy=True, cascade='all, delete-orphan')
 
 class EventParticipant(db.Model):
     __tablename__ = 'event_participants'
+    __table_args__ = (
+        # Per-event participant ids and status counts without touching the table rows
+        db.Index('ix_event_participants_event_status_user', 'event_id', 'status', 'user_id'),
+        db.UniqueConstraint('event_id', 'user_id', name='uq_event_participants_event_user'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('guild_events.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    status = db.Column(db.String(20), default='attending')  # attending, maybe, declined
+    status = db.Column(db.String(20), default='attending')  # attending, maybe, declined, waitlisted
+    waitlisted_at = db.Column(db.DateTime, nullable=True)  # waitlist order
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -126,12 +154,54 @@ class EventParticipant(db.Model):
     # Relationships
     user = db.relationship('User', backref='event_participations')
 
+class EventOccurrenceOverride(db.Model):
+    """A cancelled or modified occurrence of a recurring event"""
+    __tablename__ = 'event_occurrence_overrides'
+    __table_args__ = (
+        db.UniqueConstraint('event_id', 'occurrence_date', name='uq_event_overrides_event_occurrence'),
+        db.Index('ix_event_overrides_event_date', 'event_id', 'event_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('guild_events.id', ondelete='CASCADE'), nullable=False)
+    occurrence_date = db.Column(db.Date, nullable=False)  # original date of the occurrence
+    is_cancelled = db.Column(db.Boolean, default=False, nullable=False)
+    
+    # Replacement values; NULL keeps the series' value
+    event_date = db.Column(db.Date, nullable=True)
+    event_time = db.Column(db.Time, nullable=True)
+    title = db.Column(db.String(200), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    location = db.Column(db.String(255), nullable=True)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class EventReminder(db.Model):
+    """Reminders already posted by the Discord bot, so restarts don't repeat them"""
+    __tablename__ = 'event_reminders'
+    __table_args__ = (
+        db.UniqueConstraint('event_id', 'offset_minutes', 'event_start', name='uq_event_reminders_event_offset_start'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('guild_events.id', ondelete='CASCADE'), nullable=False)
+    offset_minutes = db.Column(db.Integer, nullable=False)  # minutes before the start
+    event_start = db.Column(db.DateTime, nullable=False, index=True)  # UTC start the reminder was for
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class WikiArticle(db.Model):
     __tablename__ = 'wiki_articles'
+    __table_args__ = (
+        # Category browsing and facet counts
+        db.Index('ix_wiki_articles_category_published', 'category', 'is_published'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    content_hash = db.Column(db.String(40), nullable=True)  # sha1 of content, the render cache key
     category = db.Column(db.String(100), nullable=False)
     tags = db.Column(db.JSON, nullable=True)
     slug = db.Column(db.String(255), unique=True, nullable=False)
@@ -153,14 +223,72 @@ class WikiArticle(db.Model):
     author = db.relationship('User', backref='wiki_articles')
     revisions = db.relationship('WikiRevision', backref='article', lazy=True)
 
+# Wiki search index, maintained by wiki.search
+class WikiArticleTag(db.Model):
+    """Tag -> article posting (tags normalized: lower-case, accents folded)"""
+    __tablename__ = 'wiki_article_tags'
+    __table_args__ = (
+        db.Index('ix_wiki_article_tags_article', 'article_id'),
+    )
+
+    tag = db.Column(db.String(100), primary_key=True)
+    article_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+class WikiSearchDocument(db.Model):
+    __tablename__ = 'wiki_search_documents'
+
+    article_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    length = db.Column(db.Integer, nullable=False)  # weighted number of indexed tokens
+
+class WikiSearchTerm(db.Model):
+    __tablename__ = 'wiki_search_terms'
+
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), unique=True, nullable=False)
+    doc_count = db.Column(db.Integer, nullable=False, default=0)
+
+class WikiSearchPosting(db.Model):
+    __tablename__ = 'wiki_search_postings'
+    __table_args__ = (
+        db.Index('ix_wiki_search_postings_article', 'article_id'),
+    )
+
+    term_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    article_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    tf = db.Column(db.Integer, nullable=False)  # field-weighted term frequency
+
+# Wiki link graph, maintained by wiki.links
+class WikiLink(db.Model):
+    """An article's link to another by slug (the target may not exist: a broken link)"""
+    __tablename__ = 'wiki_links'
+    __table_args__ = (
+        # "What links here" and broken-link lookups by target
+        db.Index('ix_wiki_links_target', 'target_slug', 'source_id'),
+    )
+
+    source_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    target_slug = db.Column(db.String(255), primary_key=True)
+
 class WikiRevision(db.Model):
     __tablename__ = 'wiki_revisions'
+    __table_args__ = (
+        # An article's history, and the delta chain of any revision, in one range scan
+        db.Index('ix_wiki_revisions_article', 'article_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     article_id = db.Column(db.Integer, db.ForeignKey('wiki_articles.id'), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(db.Text, nullable=True)  # full copy (rows not yet compressed), else NULL
     change_summary = db.Column(db.String(500), nullable=True)
     
+    # Compressed storage, see wiki.revisions: a zlib snapshot, or a delta
+    # against the article's previous revision
+    is_snapshot = db.Column(db.Boolean, nullable=True)
+    chain_depth = db.Column(db.SmallInteger, nullable=True)  # deltas since the last snapshot
+    data = db.Column(db.LargeBinary(length=2 ** 24), nullable=True)
+    content_length = db.Column(db.Integer, nullable=True)  # UTF-8 bytes of the text
+    content_hash = db.Column(db.String(40), nullable=True)  # sha1 of the text, checked on read
+    
     # Author and timestamp
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -185,6 +313,13 @@ class ForumCategory(db.Model):
     color = db.Column(db.String(7), default='#6B7280')
     icon = db.Column(db.String(50), nullable=True)
     
+    # Summary of non-deleted threads, maintained by forum.summaries
+    thread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_activity_at = db.Column(db.DateTime, nullable=True)
+    last_post_id = db.Column(db.Integer, nullable=True)  # thread with the latest activity
+    last_author_id = db.Column(db.Integer, nullable=True)  # author of that activity
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -209,9 +344,11 @@ class ForumPost(db.Model):
     is_locked = db.Column(db.Boolean, default=False)
     is_deleted = db.Column(db.Boolean, default=False)
     
-    # Stats
+    # Stats (view_count is flushed by forum.views, reply stats by forum.summaries)
     view_count = db.Column(db.Integer, default=0)
     reply_count = db.Column(db.Integer, default=0)
+    last_reply_id = db.Column(db.Integer, nullable=True)
+    last_reply_author_id = db.Column(db.Integer, nullable=True)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -223,6 +360,10 @@ class ForumPost(db.Model):
 
 class ForumReply(db.Model):
     __tablename__ = 'forum_replies'
+    __table_args__ = (
+        # A whole thread in one index range scan, in display order
+        db.Index('ix_forum_replies_post_created', 'post_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -244,6 +385,40 @@ class ForumReply(db.Model):
     # Relationships
     child_replies = db.relationship('ForumReply', backref=db.backref('parent_reply', remote_side=[id]), lazy=True)
 
+# Forum full-text index, maintained by forum.search. Ids are plain integers
+# (no foreign keys) so the index can be bulk-rebuilt in any order.
+class ForumSearchDocument(db.Model):
+    """One indexed post (reply_id NULL) or reply"""
+    __tablename__ = 'forum_search_documents'
+    __table_args__ = (
+        db.Index('ix_forum_search_documents_post', 'post_id'),
+        db.Index('ix_forum_search_documents_reply', 'reply_id', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, nullable=False)
+    reply_id = db.Column(db.Integer, nullable=True)
+    category_id = db.Column(db.Integer, nullable=False)
+    length = db.Column(db.Integer, nullable=False)  # number of indexed tokens
+
+class ForumSearchTerm(db.Model):
+    __tablename__ = 'forum_search_terms'
+
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), unique=True, nullable=False)
+    doc_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ForumSearchPosting(db.Model):
+    __tablename__ = 'forum_search_postings'
+    __table_args__ = (
+        db.Index('ix_forum_search_postings_document', 'document_id'),
+    )
+
+    # (term_id, document_id) primary key: a term's posting list is one range scan
+    term_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    document_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    tf = db.Column(db.SmallInteger, nullable=False)
+
 class Message(db.Model):
     __tablename__ = 'messages'
     
@@ -266,6 +441,12 @@ class Message(db.Model):
 
 class ActivityLog(db.Model):
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        # Keyset pagination (newest first) with and without filters
+        db.Index('ix_activity_logs_created_id', 'created_at', 'id'),
+        db.Index('ix_activity_logs_user_created_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_activity_logs_action_created_id', 'action', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -277,6 +458,21 @@ class ActivityLog(db.Model):
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class ActivityDailyRollup(db.Model):
+    __tablename__ = 'activity_daily_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'action', 'user_id', name='uq_activity_rollup_day_action_user'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    action = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Timestamps
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class BDOBossTimer(db.Model):
     __tablename__ = 'bdo_boss_timers'
     
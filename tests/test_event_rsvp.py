@@ -0,0 +1,129 @@
+from datetime import date, time
+
+import pytest
+from flask import Flask
+
+from events import rsvp
+from models import EventParticipant, GuildEvent, User, db
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(User(id=user_id, username=f'user{user_id}', email=f'user{user_id}@example.com')
+                           for user_id in range(1, 6))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def make_event(max_participants=None, recurrence_rule=None):
+    event = GuildEvent(
+        title='Raid Kzarka', event_date=date(2026, 11, 2), event_time=time(21, 0), event_type='raid',
+        max_participants=max_participants, recurrence_rule=recurrence_rule, created_by=1
+    )
+    db.session.add(event)
+    db.session.commit()
+    return event.id
+
+
+def statuses(event_id):
+    return dict(db.session.query(EventParticipant.user_id, EventParticipant.status).filter_by(event_id=event_id))
+
+
+def attending_count(event_id):
+    return db.session.query(GuildEvent.attending_count).filter_by(id=event_id).scalar()
+
+
+def test_take_seat_stops_at_capacity(app):
+    event_id = make_event(max_participants=2)
+    assert [rsvp._take_seat(event_id) for _ in range(3)] == [True, True, False]
+    assert attending_count(event_id) == 2
+
+
+def test_take_seat_without_limit(app):
+    event_id = make_event()
+    assert all(rsvp._take_seat(event_id) for _ in range(3))
+    assert attending_count(event_id) == 3
+
+
+def test_join_beyond_capacity_waitlists_in_order(app):
+    event_id = make_event(max_participants=2)
+    results = [rsvp.rsvp(event_id, user_id) for user_id in (1, 2, 3, 4)]
+
+    assert [result['status'] for result in results] == ['attending', 'attending', 'waitlisted', 'waitlisted']
+    assert [result.get('waitlist_position') for result in results[2:]] == [1, 2]
+    assert results[-1]['attending'] == 2 and results[-1]['waitlisted'] == 2
+    assert attending_count(event_id) == 2
+
+
+def test_cancel_promotes_first_waitlisted(app):
+    event_id = make_event(max_participants=1)
+    for user_id in (1, 2, 3):
+        rsvp.rsvp(event_id, user_id)
+
+    result = rsvp.cancel(event_id, 1)
+    assert result['changed'] and result['promoted_user_id'] == 2
+    assert statuses(event_id) == {2: 'attending', 3: 'waitlisted'}
+    assert attending_count(event_id) == 1
+
+
+def test_declining_releases_the_seat(app):
+    event_id = make_event(max_participants=1)
+    rsvp.rsvp(event_id, 1)
+    rsvp.rsvp(event_id, 2)
+
+    result = rsvp.rsvp(event_id, 1, 'declined')
+    assert result['promoted_user_id'] == 2
+    assert statuses(event_id) == {1: 'declined', 2: 'attending'}
+    assert attending_count(event_id) == 1
+
+
+def test_cancel_without_waitlist_frees_the_seat(app):
+    event_id = make_event(max_participants=1)
+    rsvp.rsvp(event_id, 1)
+
+    assert rsvp.cancel(event_id, 1)['promoted_user_id'] is None
+    assert attending_count(event_id) == 0
+    assert rsvp.cancel(event_id, 1) == {'status': None, 'changed': False, 'attending': 0,
+                                        'max_participants': 1, 'waitlisted': 0}
+
+
+def test_double_join_is_idempotent(app):
+    event_id = make_event(max_participants=1)
+    assert rsvp.rsvp(event_id, 1)['changed']
+    assert not rsvp.rsvp(event_id, 1)['changed']
+    rsvp.rsvp(event_id, 2)
+    again = rsvp.rsvp(event_id, 2)
+
+    assert not again['changed'] and again['status'] == 'waitlisted' and again['waitlist_position'] == 1
+    assert db.session.query(EventParticipant).filter_by(event_id=event_id).count() == 2
+    assert attending_count(event_id) == 1
+
+
+def test_recurring_events_refuse_rsvps(app):
+    event_id = make_event(max_participants=5, recurrence_rule='FREQ=WEEKLY;BYDAY=MO')
+    with pytest.raises(ValueError, match='recurring'):
+        rsvp.rsvp(event_id, 1)
+    assert statuses(event_id) == {}
+    assert attending_count(event_id) == 0
+
+
+def test_existing_series_participation_can_be_cancelled(app):
+    event_id = make_event(recurrence_rule='FREQ=WEEKLY;BYDAY=MO')
+    db.session.add(EventParticipant(event_id=event_id, user_id=1, status='maybe'))
+    db.session.commit()
+
+    assert rsvp.cancel(event_id, 1)['changed']
+    assert statuses(event_id) == {}
+
+
+def test_unknown_event(app):
+    with pytest.raises(rsvp.EventNotFound):
+        rsvp.rsvp(999, 1)
+    with pytest.raises(rsvp.EventNotFound):
+        rsvp.cancel(999, 1)
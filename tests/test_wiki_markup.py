@@ -0,0 +1,46 @@
+from wiki.markup import outgoing_links, render
+
+
+def html(content):
+    return render(content)[0]
+
+
+def test_image_url_cannot_break_out_of_attribute():
+    out = html('![i](http://e/[) y](http://f/onerror=alert//)')
+    assert out == '<p><img src="http://e/[" alt="i"> y](http://f/onerror=alert//)</p>'
+    assert '<a' not in out
+
+
+def test_link_url_is_not_emphasized():
+    assert html('[a](http://x.com/_foo_bar_)') == '<p><a href="http://x.com/_foo_bar_">a</a></p>'
+
+
+def test_attribute_values_are_escaped():
+    assert html('![a"b](/img.png)') == '<p><img src="/img.png" alt="a&quot;b"></p>'
+    assert html('[x](/a"onclick="b)') == '<p><a href="/a&quot;onclick=&quot;b">x</a></p>'
+
+
+def test_unsafe_urls_keep_only_the_text():
+    assert html('[x](javascript:alert)') == '<p>x</p>'
+    assert html('![x](//evil.example/a.png)') == '<p>x</p>'
+
+
+def test_emphasis_around_links_and_code():
+    assert html('**see [doc](/wiki/doc)** `*raw*`') == (
+        '<p><strong>see <a href="/wiki/doc">doc</a></strong> <code>*raw*</code></p>'
+    )
+
+
+def test_wiki_links():
+    assert html('[[Guide Sorcière|le _guide_]]') == (
+        '<p><a href="/wiki/guide-sorciere" class="wiki-link">le <em>guide</em></a></p>'
+    )
+
+
+def test_placeholder_characters_in_input_are_dropped():
+    assert html('a\x000\x00 [b](/c)') == '<p>a0 <a href="/c">b</a></p>'
+
+
+def test_outgoing_links_match_rendered_links():
+    content = '[[A]] `[[b]]` [c](/wiki/c#x) ![d](/wiki/d)\n```\n[[e]]\n```'
+    assert outgoing_links(content) == {'a', 'c'}
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+from wiki.revisions import RevisionError, _decode_chain, apply_delta, delta_depth, encode, encode_delta
+
+
+def rows_for(texts, interval):
+    """Stored rows for successive revisions of one article, as add_revision encodes them"""
+    rows, previous = [], None
+    for number, text in enumerate(texts, 1):
+        values = encode(text, previous, delta_depth(rows[-1]) if rows else None, interval)
+        rows.append(SimpleNamespace(id=number, **values))
+        previous = text
+    return rows
+
+
+def chain(rows, index):
+    """The rows _chain would read for rows[index]"""
+    return rows[index - delta_depth(rows[index]):index + 1]
+
+
+def versions(count):
+    base = ''.join(f'Ligne {number} du guide de Kzarka\n' for number in range(200))
+    return [base + ''.join(f'Ajout {number}\n' for number in range(version)) for version in range(count)]
+
+
+@pytest.mark.parametrize('old, new', [
+    ('', 'a\nb\n'),
+    ('a\nb\n', ''),
+    ('a\nb\nc\n', 'a\nB\nc\nd'),
+    ('no trailing newline', 'no trailing newline\nmore'),
+    ('épée\r\nbouclier\n', 'épée\r\narc\nbouclier\n'),
+])
+def test_delta_round_trip(old, new):
+    assert apply_delta(old, encode_delta(old, new)) == new
+
+
+def test_small_edit_is_stored_as_delta():
+    texts = versions(2)
+    first, second = rows_for(texts, interval=20)
+    assert first.is_snapshot and first.chain_depth == 0
+    assert not second.is_snapshot and second.chain_depth == 1
+    assert len(second.data) < len(first.data)
+
+
+def test_chains_across_snapshot_boundaries():
+    texts = versions(12)
+    rows = rows_for(texts, interval=5)
+    assert [row.is_snapshot for row in rows] == [True, False, False, False, False] * 2 + [True, False]
+    assert max(row.chain_depth for row in rows) == 4
+    for index, text in enumerate(texts):
+        assert _decode_chain(chain(rows, index)) == text
+
+
+def test_uncompressed_rows_act_as_snapshots():
+    texts = versions(3)
+    rows = rows_for(texts, interval=5)
+    rows[0] = SimpleNamespace(id=1, content=texts[0], is_snapshot=False, chain_depth=0, data=None, content_hash=None)
+    assert delta_depth(rows[0]) == 0
+    assert _decode_chain(chain(rows, 2)) == texts[2]
+
+
+def test_delta_without_base_is_an_error():
+    rows = rows_for(versions(3), interval=5)
+    with pytest.raises(RevisionError, match='without a base snapshot'):
+        _decode_chain(rows[1:])
+
+
+def test_checksum_mismatch_is_an_error():
+    rows = rows_for(versions(2), interval=5)
+    rows[1].content_hash = '0' * 40
+    with pytest.raises(RevisionError, match='checksum mismatch'):
+        _decode_chain(rows)
@@ -3,10 +3,14 @@ import secrets
 import string
 from datetime import datetime, timedelta
 from functools import wraps
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import jwt
 from flask import request, jsonify, current_app
 from models import User, ActivityLog, db
+from auth.principals import load_principal
+from auth import permissions
+from admin.activity import activity_sink
+from members.leaderboard import classify_score
 import redis
 import logging
 from PIL import Image
@@ -62,7 +66,11 @@ def verify_jwt_token(token: str) -> Optional[Dict[str, Any]]:
         return None
 
 def token_required(f):
-    """Decorator to require valid JWT token"""
+    """Decorator to require valid JWT token
+    
+    The view receives a cached ``Principal`` (see auth.principals) rather than
+    a User row; load the row explicitly when full profile data is needed.
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('Authorization')
@@ -73,7 +81,7 @@ def token_required(f):
         if not payload:
             return jsonify({'message': 'Token is invalid or expired'}), 401
         
-        current_user = User.query.get(payload['user_id'])
+        current_user = load_principal(payload['user_id'])
         if not current_user or not current_user.is_active:
             return jsonify({'message': 'User not found or inactive'}), 401
         
@@ -85,21 +93,8 @@ def role_required(min_role: str):
     def decorator(f):
         @wraps(f)
         def decorated_function(current_user, *args, **kwargs):
-            role_hierarchy = {
-                'Invité': 1,
-                'Recrue': 2,
-                'Membre': 3,
-                'Quartier-Maître': 4,
-                'Officier': 5,
-                'Conseiller': 6,
-                'Maître': 7,
-                'SuperAdmin': 8
-            }
-            
-            user_role_level = role_hierarchy.get(current_user.role, 1)
-            required_level = role_hierarchy.get(min_role, 1)
-            
-            if user_role_level < required_level:
+            snapshot = permissions.permission_engine.snapshot()
+            if snapshot.level(current_user.role) < snapshot.level(min_role):
                 return jsonify({'message': 'Insufficient permissions'}), 403
             
             return f(current_user, *args, **kwargs)
@@ -110,8 +105,7 @@ def admin_required(f):
     """Decorator to require admin role"""
     @wraps(f)
     def decorated_function(current_user, *args, **kwargs):
-        admin_roles = ['SuperAdmin', 'Maître', 'Conseiller']
-        if current_user.role not in admin_roles:
+        if not permissions.has_permission(current_user.role, 'manage_members'):
             return jsonify({'message': 'Admin access required'}), 403
         return f(current_user, *args, **kwargs)
     return decorated_function
@@ -120,23 +114,43 @@ def super_admin_required(f):
     """Decorator to require super admin role"""
     @wraps(f)
     def decorated_function(current_user, *args, **kwargs):
-        if current_user.role != 'SuperAdmin':
+        if not permissions.is_super_admin(current_user.role):
             return jsonify({'message': 'SuperAdmin access required'}), 403
         return f(current_user, *args, **kwargs)
     return decorated_function
 
 def log_activity(user_id: int, action: str, details: Optional[Dict[str, Any]] = None):
-    """Log user activity"""
+    """Log user activity
+    
+    Entries are queued on the activity sink and written in batches, so the
+    caller's request does not pay for an extra commit.
+    """
+    try:
+        activity_sink.submit({
+            'user_id': user_id,
+            'action': action,
+            'details': details or {},
+            'ip_address': request.remote_addr,
+            'user_agent': request.headers.get('User-Agent', '')
+        })
+    except Exception as e:
+        logger.error(f"Error logging activity: {str(e)}")
+
+def log_activities(user_id: int, entries: List[Tuple[str, Optional[Dict[str, Any]]]]):
+    """Log several (action, details) entries for one request in one batch"""
     try:
-        activity_log = ActivityLog(
-            user_id=user_id,
-            action=action,
-            details=details or {},
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent', '')
-        )
-        db.session.add(activity_log)
-        db.session.commit()
+        ip_address = request.remote_addr
+        user_agent = request.headers.get('User-Agent', '')
+        activity_sink.submit_many([
+            {
+                'user_id': user_id,
+                'action': action,
+                'details': details or {},
+                'ip_address': ip_address,
+                'user_agent': user_agent
+            }
+            for action, details in entries
+        ])
     except Exception as e:
         logger.error(f"Error logging activity: {str(e)}")
 
@@ -292,23 +306,11 @@ def validate_discord_id(discord_id: str) -> bool:
 
 def get_user_permissions(user: User) -> List[str]:
     """Get list of permissions for user based on role"""
-    role_permissions = {
-        'Invité': ['read_public'],
-        'Recrue': ['read_public', 'read_member'],
-        'Membre': ['read_public', 'read_member', 'write_forum', 'write_wiki'],
-        'Quartier-Maître': ['read_public', 'read_member', 'write_forum', 'write_wiki', 'manage_events'],
-        'Officier': ['read_public', 'read_member', 'write_forum', 'write_wiki', 'manage_events', 'moderate_forum'],
-        'Conseiller': ['read_public', 'read_member', 'write_forum', 'write_wiki', 'manage_events', 'moderate_forum', 'manage_members'],
-        'Maître': ['read_public', 'read_member', 'write_forum', 'write_wiki', 'manage_events', 'moderate_forum', 'manage_members', 'admin_access'],
-        'SuperAdmin': ['all']
-    }
-    
-    return role_permissions.get(user.role, ['read_public'])
+    return list(permissions.role_permissions(user.role))
 
 def has_permission(user: User, permission: str) -> bool:
     """Check if user has specific permission"""
-    user_permissions = get_user_permissions(user)
-    return 'all' in user_permissions or permission in user_permissions
+    return permissions.has_permission(user.role, permission)
 
 def sanitize_html(html_content: str) -> str:
     """Sanitize HTML content (basic implementation)"""
@@ -327,34 +329,12 @@ def get_client_ip() -> str:
 
 def calculate_bdo_stats(equipment_score: int) -> Dict[str, Any]:
     """Calculate BDO-related statistics"""
-    stats = {
-        'tier': 'Beginner',
-        'tier_color': '#94a3b8',
-        'recommended_content': []
+    tier = classify_score(equipment_score)
+    return {
+        'tier': tier.name,
+        'tier_color': tier.color,
+        'recommended_content': list(tier.recommended_content)
     }
-    
-    if equipment_score >= 700:
-        stats['tier'] = 'Endgame'
-        stats['tier_color'] = '#dc2626'
-        stats['recommended_content'] = ['Atoraxxion', 'Thornwood', 'Sycraia', 'Hadum']
-    elif equipment_score >= 600:
-        stats['tier'] = 'Advanced'
-        stats['tier_color'] = '#ea580c'
-        stats['recommended_content'] = ['Abyss Dungeons', 'Valencia', 'Kamasylvia', 'Drieghan']
-    elif equipment_score >= 500:
-        stats['tier'] = 'Intermediate'
-        stats['tier_color'] = '#ca8a04'
-        stats['recommended_content'] = ['Mediah', 'Valencia', 'Node Wars']
-    elif equipment_score >= 400:
-        stats['tier'] = 'Novice'
-        stats['tier_color'] = '#16a34a'
-        stats['recommended_content'] = ['Calpheon', 'Mediah', 'Guild Missions']
-    else:
-        stats['tier'] = 'Beginner'
-        stats['tier_color'] = '#94a3b8'
-        stats['recommended_content'] = ['Balenos', 'Serendia', 'Calpheon']
-    
-    return stats
 
 def get_pagination_params(request) -> Dict[str, int]:
     """Get pagination parameters from request"""
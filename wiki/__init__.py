@@ -0,0 +1 @@
+# Wiki blueprint package
@@ -0,0 +1,115 @@
+"""
+Wiki article writes.
+
+Creating or editing an article records its new text as a compressed
+revision (wiki.revisions), reindexes it for search (wiki.search) and
+refreshes its outgoing links (wiki.links) in the same transaction, so the
+history always ends with the current content and search and backlinks
+never lag behind an edit. Published articles are then rendered into
+the render cache (wiki.render) so the first reader does not pay for it.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from models import WikiArticle, WikiRevision, db
+from utils import create_slug
+from wiki.links import update_links
+from wiki.render import content_hash, render_cache
+from wiki.revisions import add_revision
+from wiki.search import index_article
+
+logger = logging.getLogger(__name__)
+
+# Fields a create/update request may set besides title, content and slug
+ARTICLE_FIELDS = ('category', 'tags', 'meta_description', 'featured_image', 'is_published', 'is_featured')
+
+
+class ArticleError(ValueError):
+    """Invalid article data"""
+
+
+def _unique_slug(base: str, article_id: Optional[int] = None) -> str:
+    base = create_slug(base) or 'article'
+    taken = {
+        slug for (slug,) in db.session.query(WikiArticle.slug).filter(
+            db.or_(WikiArticle.slug == base, WikiArticle.slug.like(f'{base}-%')),
+            WikiArticle.id != (article_id or 0)
+        )
+    }
+    slug, suffix = base, 2
+    while slug in taken:
+        slug, suffix = f'{base}-{suffix}', suffix + 1
+    return slug
+
+
+def _apply_fields(article: WikiArticle, data: Dict[str, Any]):
+    for field in ARTICLE_FIELDS:
+        if field in data:
+            setattr(article, field, data[field])
+    if article.tags is not None and not isinstance(article.tags, list):
+        raise ArticleError('tags must be a list')
+
+
+def _warm(article: WikiArticle):
+    if not article.is_published:
+        return
+    try:
+        render_cache.warm(article)
+    except Exception as e:
+        logger.warning(f"Could not pre-render wiki article {article.id}: {e}")
+
+
+def create_article(data: Dict[str, Any], author_id: int) -> WikiArticle:
+    """Create an article and its first revision"""
+    title = (data.get('title') or '').strip()
+    content = data.get('content') or ''
+    if not title or not content.strip() or not data.get('category'):
+        raise ArticleError('title, content and category are required')
+
+    article = WikiArticle(
+        title=title[:200], content=content, content_hash=content_hash(content),
+        slug=_unique_slug(data.get('slug') or title), created_by=author_id
+    )
+    _apply_fields(article, data)
+    try:
+        db.session.add(article)
+        add_revision(article, content, author_id, data.get('change_summary') or 'Création')
+        index_article(article)
+        update_links(article)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    _warm(article)
+    return article
+
+
+def update_article(article: WikiArticle, data: Dict[str, Any], author_id: int) -> Optional[WikiRevision]:
+    """Apply an edit; returns the new revision, or None if the text is unchanged"""
+    if 'title' in data:
+        title = (data['title'] or '').strip()
+        if not title:
+            raise ArticleError('title cannot be empty')
+        article.title = title[:200]
+    if data.get('slug'):
+        article.slug = _unique_slug(data['slug'], article.id)
+    _apply_fields(article, data)
+
+    revision = None
+    try:
+        content = data.get('content')
+        if content is not None and content != article.content:
+            if not content.strip():
+                raise ArticleError('content cannot be empty')
+            article.content = content
+            article.content_hash = content_hash(content)
+            revision = add_revision(article, content, author_id, data.get('change_summary'))
+        index_article(article)
+        update_links(article)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    _warm(article)
+    return revision
@@ -0,0 +1,48 @@
+"""
+Storage and read-latency benchmark for wiki revisions
+(``manage.py benchmark-wiki-revisions``).
+
+Reports how many bytes the revisions take against the size of their full
+texts, and times reconstructing a random sample of revisions. The session is
+expired before each read so every row is fetched from the database.
+"""
+
+import random
+import statistics
+import time
+from typing import Any, Dict
+
+from models import WikiRevision, db
+from wiki.revisions import delta_depth, revision_content, storage_stats
+
+
+def run_revision_benchmark(samples: int = 500, seed: int = 0) -> Dict[str, Any]:
+    """Measure revision storage and reconstruction latency"""
+    report: Dict[str, Any] = {'storage': storage_stats()}
+    storage = report['storage']
+    report['storage']['ratio'] = round(storage['stored_bytes'] / storage['text_bytes'], 4) if storage['text_bytes'] else None
+
+    ids = [row.id for row in db.session.query(WikiRevision.id).all()]
+    if not ids:
+        report['reads'] = None
+        return report
+
+    timings, depths = [], []
+    for revision_id in random.Random(seed).sample(ids, min(samples, len(ids))):
+        db.session.expire_all()
+        started = time.perf_counter()
+        revision = WikiRevision.query.get(revision_id)
+        revision_content(revision)
+        timings.append((time.perf_counter() - started) * 1000)
+        depths.append(delta_depth(revision))
+
+    timings.sort()
+    report['reads'] = {
+        'samples': len(timings),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+        'max_ms': round(timings[-1], 2),
+        'mean_chain_depth': round(statistics.mean(depths), 2),
+        'max_chain_depth': max(depths)
+    }
+    return report
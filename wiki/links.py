@@ -0,0 +1,107 @@
+"""
+Wiki link graph.
+
+Every article's outgoing links (``[[target]]`` and ``[text](/wiki/slug)``,
+see ``wiki.markup.outgoing_links``) are stored as (source_id, target_slug)
+rows in ``wiki_links`` when the article is saved. The primary key is the
+forward adjacency list and ``ix_wiki_links_target`` the reverse one, so:
+
+- "what links here" reads the target's index entries: O(in-degree);
+- broken links are rows whose target slug has no article;
+- orphans are articles with no index entry as a target.
+
+Targets are kept by slug rather than id, so a link written before its
+article exists starts resolving as soon as the article is created, and
+renaming a slug shows up as broken links instead of going unnoticed.
+``rebuild_links`` (``manage.py rebuild-wiki-links``) re-extracts every
+article.
+"""
+
+import logging
+from typing import Dict
+
+from models import WikiArticle, WikiLink, db
+from wiki.markup import outgoing_links
+
+logger = logging.getLogger(__name__)
+
+
+def update_links(article: WikiArticle) -> Dict[str, int]:
+    """Sync an article's outgoing links with its content; runs in the caller's transaction"""
+    targets = outgoing_links(article.content)
+    targets.discard(article.slug)
+    current = {
+        slug for (slug,) in db.session.query(WikiLink.target_slug).filter(WikiLink.source_id == article.id)
+    }
+
+    removed, added = current - targets, targets - current
+    if removed:
+        db.session.execute(
+            db.delete(WikiLink).where(WikiLink.source_id == article.id, WikiLink.target_slug.in_(removed))
+            .execution_options(synchronize_session=False)
+        )
+    if added:
+        db.session.execute(db.insert(WikiLink), [
+            {'source_id': article.id, 'target_slug': slug} for slug in sorted(added)
+        ])
+    return {'added': len(added), 'removed': len(removed)}
+
+
+def backlinks(slug: str, include_unpublished: bool = False):
+    """Query of the articles linking to ``slug``, by title"""
+    query = db.session.query(WikiArticle).join(WikiLink, WikiLink.source_id == WikiArticle.id).filter(
+        WikiLink.target_slug == slug
+    )
+    if not include_unpublished:
+        query = query.filter(WikiArticle.is_published.is_(True))
+    return query.order_by(WikiArticle.title, WikiArticle.id)
+
+
+def backlink_count(slug: str) -> int:
+    return db.session.query(db.func.count()).select_from(WikiLink).filter(WikiLink.target_slug == slug).scalar()
+
+
+def orphans():
+    """Query of the articles no other article links to, oldest first"""
+    linked = db.exists().where(WikiLink.target_slug == WikiArticle.slug)
+    return WikiArticle.query.filter(~linked).order_by(WikiArticle.created_at, WikiArticle.id)
+
+
+def broken_links():
+    """Query of (source article, missing target slug) rows, by target"""
+    target = db.aliased(WikiArticle)
+    return db.session.query(WikiArticle, WikiLink.target_slug).join(
+        WikiLink, WikiLink.source_id == WikiArticle.id
+    ).outerjoin(target, target.slug == WikiLink.target_slug).filter(
+        target.id.is_(None)
+    ).order_by(WikiLink.target_slug, WikiArticle.id)
+
+
+def rebuild_links(chunk_size: int = 5000) -> Dict[str, int]:
+    """Re-extract the links of every article"""
+    db.session.execute(db.delete(WikiLink))
+    rows, totals = [], {'articles': 0, 'links': 0}
+    # Keyset pagination rather than a streaming cursor, so inserts can run in between
+    last_id = 0
+    while True:
+        articles = db.session.query(WikiArticle.id, WikiArticle.slug, WikiArticle.content).filter(
+            WikiArticle.id > last_id
+        ).order_by(WikiArticle.id).limit(500).all()
+        if not articles:
+            break
+        for article in articles:
+            targets = outgoing_links(article.content)
+            targets.discard(article.slug)
+            rows.extend({'source_id': article.id, 'target_slug': slug} for slug in sorted(targets))
+            totals['articles'] += 1
+            if len(rows) >= chunk_size:
+                db.session.execute(db.insert(WikiLink), rows)
+                totals['links'] += len(rows)
+                rows = []
+        last_id = articles[-1].id
+    if rows:
+        db.session.execute(db.insert(WikiLink), rows)
+        totals['links'] += len(rows)
+    db.session.commit()
+    logger.info(f"Wiki link graph rebuilt: {totals}")
+    return totals
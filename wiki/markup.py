@@ -0,0 +1,260 @@
+"""
+Markdown rendering for wiki articles.
+
+A deliberately small Markdown dialect, rendered without third-party
+dependencies:
+
+- ATX headings (``#`` to ``######``), which get ids and feed the table of
+  contents;
+- paragraphs, ``>`` blockquotes, ``-``/``*``/``+`` and ``1.`` lists,
+  fenced code blocks, ``---`` rules and pipe tables;
+- inline ``code``, **bold**, *italic*, ``[text](url)``, ``![alt](url)``
+  and wiki links ``[[slug]]`` / ``[[slug|text]]``.
+
+Inline markup is tokenized once per line: code spans, links and images
+are cut out of the source and replaced by placeholders, and their HTML is
+built from the captured groups (escaped, attribute values included).
+Emphasis is then applied to the remaining escaped text, and the
+placeholders are swapped back last, so no pass ever scans markup an
+earlier pass produced. Only the tags above are emitted and link targets
+are limited to http(s), mailto and site-relative URLs. Bump
+``RENDERER_VERSION`` whenever the output changes, so cached renders are
+invalidated.
+"""
+
+import re
+from typing import Any, Dict, List, Set, Tuple
+
+from utils import create_slug, sanitize_html
+
+RENDERER_VERSION = 2
+WIKI_PATH = '/wiki/'
+
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+_FENCE_RE = re.compile(r'^(```|~~~)\s*([\w+-]*)\s*$')
+_RULE_RE = re.compile(r'^\s{0,3}([-*_])(\s*\1){2,}\s*$')
+_BULLET_RE = re.compile(r'^\s{0,3}[-*+]\s+(.*)$')
+_ORDERED_RE = re.compile(r'^\s{0,3}\d{1,9}[.)]\s+(.*)$')
+_QUOTE_RE = re.compile(r'^\s{0,3}>\s?(.*)$')
+_TABLE_SEPARATOR_RE = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+
+# Inline tokens, tried in this order at the leftmost position
+_INLINE_TOKEN_RE = re.compile(
+    r'(?P<code>(?P<ticks>`+)(?P<code_text>.+?)(?P=ticks))'
+    r'|(?P<wiki>\[\[(?P<wiki_target>[^\]|]+?)(?:\|(?P<wiki_label>[^\]]+?))?\]\])'
+    r'|(?P<image>!\[(?P<image_alt>[^\]]*)\]\((?P<image_url>[^)\s]+)\))'
+    r'|(?P<link>\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)\))'
+)
+_PLACEHOLDER_RE = re.compile(r'\x00(\d+)\x00')
+_BOLD_RE = re.compile(r'(\*\*|__)(?=\S)(.+?)(?<=\S)\1')
+_ITALIC_RE = re.compile(r'(?<![\w*])([*_])(?=\S)(.+?)(?<=\S)\1(?![\w*])')
+_SAFE_URL_RE = re.compile(r'^(https?://|mailto:|/|#)', re.IGNORECASE)
+
+
+def wiki_slug(target: str) -> str:
+    """Article slug a wiki link points to ("Guide Sorcière" -> "guide-sorciere")"""
+    return create_slug(target.strip())
+
+
+def outgoing_links(content: str) -> Set[str]:
+    """Slugs of the articles ``content`` links to, as ``render`` would link them
+
+    Both ``[[target]]`` and ``[text](/wiki/slug)`` count; links inside code
+    are ignored, like when rendering.
+    """
+    slugs = set()
+    in_fence = None
+    for line in (content or '').replace('\r\n', '\n').split('\n'):
+        fence = _FENCE_RE.match(line)
+        if in_fence:
+            if line.strip().startswith(in_fence):
+                in_fence = None
+            continue
+        if fence:
+            in_fence = fence.group(1)
+            continue
+        for token in _INLINE_TOKEN_RE.finditer(line):
+            if token.group('wiki') and token.group('wiki_target').strip():
+                slugs.add(wiki_slug(token.group('wiki_target')))
+            elif token.group('link') and token.group('link_url').startswith(WIKI_PATH):
+                url = token.group('link_url')
+                slugs.add(url[len(WIKI_PATH):].split('#')[0].split('?')[0].strip('/')[:255])
+    slugs.discard('')
+    return slugs
+
+
+def _safe_url(url: str) -> bool:
+    return bool(_SAFE_URL_RE.match(url)) and not url.startswith('//')
+
+
+def _emphasis(escaped: str) -> str:
+    escaped = _BOLD_RE.sub(r'<strong>\2</strong>', escaped)
+    return _ITALIC_RE.sub(r'<em>\2</em>', escaped)
+
+
+def _token_html(token) -> str:
+    if token.group('code'):
+        return f"<code>{sanitize_html(token.group('code_text').strip())}</code>"
+    if token.group('wiki'):
+        label = _emphasis(sanitize_html((token.group('wiki_label') or token.group('wiki_target')).strip()))
+        return f'<a href="{WIKI_PATH}{wiki_slug(token.group("wiki_target"))}" class="wiki-link">{label}</a>'
+    if token.group('image'):
+        alt, url = sanitize_html(token.group('image_alt')), token.group('image_url')
+        return f'<img src="{sanitize_html(url)}" alt="{alt}">' if _safe_url(url) else alt
+    label, url = _emphasis(sanitize_html(token.group('link_text'))), token.group('link_url')
+    return f'<a href="{sanitize_html(url)}">{label}</a>' if _safe_url(url) else label
+
+
+def _inline(text: str) -> str:
+    """Escape ``text`` and apply inline markup"""
+    tokens: List[str] = []
+
+    def placeholder(token):
+        tokens.append(_token_html(token))
+        return f'\x00{len(tokens) - 1}\x00'
+
+    text = _INLINE_TOKEN_RE.sub(placeholder, text.replace('\x00', ''))
+    text = _emphasis(sanitize_html(text))
+    return _PLACEHOLDER_RE.sub(lambda match: tokens[int(match.group(1))], text)
+
+
+def _plain(text: str) -> str:
+    """Heading text without inline markup, for the table of contents"""
+    def token_text(token):
+        if token.group('code'):
+            return token.group('code_text').strip()
+        if token.group('wiki'):
+            return token.group('wiki_label') or token.group('wiki_target')
+        return token.group('image_alt') if token.group('image') else token.group('link_text')
+
+    text = _INLINE_TOKEN_RE.sub(token_text, text)
+    return _ITALIC_RE.sub(r'\2', _BOLD_RE.sub(r'\2', text)).strip()
+
+
+def _table_cells(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split('|')]
+
+
+def _list_kind(line: str):
+    if _BULLET_RE.match(line):
+        return _BULLET_RE, 'ul'
+    if _ORDERED_RE.match(line):
+        return _ORDERED_RE, 'ol'
+    return None
+
+
+class _Renderer:
+    def __init__(self):
+        self.toc: List[Dict[str, Any]] = []
+        self._ids: Dict[str, int] = {}
+
+    def heading_id(self, text: str) -> str:
+        base = create_slug(text)
+        count = self._ids.get(base, 0)
+        self._ids[base] = count + 1
+        return base if count == 0 else f'{base}-{count + 1}'
+
+    def blocks(self, lines: List[str]) -> List[str]:
+        html = []
+        paragraph: List[str] = []
+        index = 0
+
+        def end_paragraph():
+            if paragraph:
+                html.append(f"<p>{_inline(' '.join(line.strip() for line in paragraph))}</p>")
+                paragraph.clear()
+
+        while index < len(lines):
+            line = lines[index]
+
+            fence = _FENCE_RE.match(line)
+            if fence:
+                end_paragraph()
+                end = index + 1
+                while end < len(lines) and not lines[end].strip().startswith(fence.group(1)):
+                    end += 1
+                language = f' class="language-{fence.group(2)}"' if fence.group(2) else ''
+                html.append(f"<pre><code{language}>{sanitize_html(chr(10).join(lines[index + 1:end]))}</code></pre>")
+                index = end + 1
+                continue
+
+            if not line.strip():
+                end_paragraph()
+                index += 1
+                continue
+
+            heading = _HEADING_RE.match(line)
+            if heading:
+                end_paragraph()
+                level, text = len(heading.group(1)), heading.group(2)
+                anchor = self.heading_id(_plain(text))
+                self.toc.append({'level': level, 'id': anchor, 'title': _plain(text)})
+                html.append(f'<h{level} id="{anchor}">{_inline(text)}</h{level}>')
+                index += 1
+                continue
+
+            if _RULE_RE.match(line):
+                end_paragraph()
+                html.append('<hr>')
+                index += 1
+                continue
+
+            if _QUOTE_RE.match(line):
+                end_paragraph()
+                quoted = []
+                while index < len(lines) and _QUOTE_RE.match(lines[index]):
+                    quoted.append(_QUOTE_RE.match(lines[index]).group(1))
+                    index += 1
+                html.append(f"<blockquote>{''.join(self.blocks(quoted))}</blockquote>")
+                continue
+
+            list_kind = _list_kind(line)
+            if list_kind:
+                end_paragraph()
+                pattern, tag = list_kind
+                items = []
+                while index < len(lines) and lines[index].strip():
+                    item = pattern.match(lines[index])
+                    if item:
+                        items.append(item.group(1))
+                    elif lines[index].startswith((' ', '\t')):
+                        items[-1] += ' ' + lines[index].strip()  # continuation line
+                    else:
+                        break
+                    index += 1
+                html.append(f"<{tag}>{''.join(f'<li>{_inline(item)}</li>' for item in items)}</{tag}>")
+                continue
+
+            if '|' in line and index + 1 < len(lines) and _TABLE_SEPARATOR_RE.match(lines[index + 1]):
+                end_paragraph()
+                header = _table_cells(line)
+                rows = []
+                index += 2
+                while index < len(lines) and '|' in lines[index] and lines[index].strip():
+                    rows.append(_table_cells(lines[index]))
+                    index += 1
+                head = ''.join(f'<th>{_inline(cell)}</th>' for cell in header)
+                body = ''.join(
+                    '<tr>' + ''.join(f'<td>{_inline(cell)}</td>' for cell in row[:len(header)]) + '</tr>'
+                    for row in rows
+                )
+                html.append(f'<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>')
+                continue
+
+            paragraph.append(line)
+            index += 1
+
+        end_paragraph()
+        return html
+
+
+def render(content: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """(HTML, table of contents) for Markdown ``content``"""
+    renderer = _Renderer()
+    html = renderer.blocks((content or '').replace('\r\n', '\n').split('\n'))
+    return '\n'.join(html), renderer.toc
@@ -0,0 +1,146 @@
+"""
+Render cache for wiki articles.
+
+Rendering Markdown (wiki.markup) on every view would make the wiki, our
+most-read section, redo the same work over and over. Rendered HTML and the
+table of contents are cached under ``RENDERER_VERSION:sha1(content)``:
+
+1. an in-process LRU of ``WIKI_RENDER_CACHE_SIZE`` entries;
+2. Redis, shared by all workers, for ``WIKI_RENDER_CACHE_TTL`` seconds.
+
+Since the key is derived from the content, an edit never serves stale HTML
+and nothing has to be invalidated; changing the renderer bumps the
+version. ``WikiArticle.content_hash`` is kept on write, so reading an
+unchanged article is one dictionary lookup. Published articles are
+rendered ahead of time when they are saved (``warm``).
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional
+
+from models import WikiArticle
+from wiki.markup import RENDERER_VERSION, render
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZE = 512
+DEFAULT_TTL = 7 * 24 * 3600
+REDIS_KEY = 'wiki:render:{key}'
+
+
+def content_hash(content: Optional[str]) -> str:
+    return hashlib.sha1((content or '').encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """Two-level (process LRU, then Redis) cache of rendered articles"""
+
+    def __init__(self, maxsize: int = DEFAULT_SIZE, redis_client=None, ttl: int = DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.redis = redis_client
+        self.ttl = ttl
+        self._local: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics: Counter = Counter()
+        self._render_seconds = 0.0
+
+    def init_app(self, app, redis_client=None):
+        self.redis = redis_client
+        self.maxsize = app.config.get('WIKI_RENDER_CACHE_SIZE', DEFAULT_SIZE)
+        self.ttl = app.config.get('WIKI_RENDER_CACHE_TTL', DEFAULT_TTL)
+
+    @staticmethod
+    def key(article: WikiArticle) -> str:
+        return f"{RENDERER_VERSION}:{article.content_hash or content_hash(article.content)}"
+
+    def get(self, article: WikiArticle) -> Dict[str, Any]:
+        """{'html', 'toc'} for the article's current content"""
+        return self._get(article)
+
+    def warm(self, article: WikiArticle):
+        """Render ahead of the first read (no-op when already cached)"""
+        self._get(article, warming=True)
+
+    def _get(self, article: WikiArticle, warming: bool = False) -> Dict[str, Any]:
+        # Warm-ups are counted apart so they do not skew the read hit ratio
+        key = self.key(article)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                self._local.move_to_end(key)
+                self._metrics['warm_hits' if warming else 'local_hits'] += 1
+                return entry
+
+        entry = self._redis_get(key)
+        if entry is not None:
+            with self._lock:
+                self._metrics['warm_hits' if warming else 'redis_hits'] += 1
+        else:
+            started = time.perf_counter()
+            html, toc = render(article.content)
+            entry = {'html': html, 'toc': toc}
+            with self._lock:
+                self._render_seconds += time.perf_counter() - started
+                self._metrics['warmed' if warming else 'misses'] += 1
+            self._redis_set(key, entry)
+
+        with self._lock:
+            self._local[key] = entry
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+        return entry
+
+    def _redis_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(REDIS_KEY.format(key=key))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            self._count_error()
+            logger.warning(f"Wiki render cache: Redis read failed: {e}")
+            return None
+
+    def _redis_set(self, key: str, entry: Dict[str, Any]):
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(REDIS_KEY.format(key=key), json.dumps(entry), ex=self.ttl)
+        except Exception as e:
+            self._count_error()
+            logger.warning(f"Wiki render cache: Redis write failed: {e}")
+
+    def _count_error(self):
+        with self._lock:
+            self._metrics['redis_errors'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            size = len(self._local)
+            render_seconds = self._render_seconds
+        reads = sum(metrics.get(name, 0) for name in ('local_hits', 'redis_hits', 'misses'))
+        hits = metrics.get('local_hits', 0) + metrics.get('redis_hits', 0)
+        renders = metrics.get('misses', 0) + metrics.get('warmed', 0)
+        return {
+            'renderer_version': RENDERER_VERSION,
+            'local_hits': metrics.get('local_hits', 0),
+            'redis_hits': metrics.get('redis_hits', 0),
+            'misses': metrics.get('misses', 0),
+            'warmed': metrics.get('warmed', 0),
+            'redis_errors': metrics.get('redis_errors', 0),
+            'hit_ratio': round(hits / reads, 4) if reads else None,
+            'avg_render_ms': round(render_seconds * 1000 / renders, 3) if renders else None,
+            'local_size': size,
+            'local_maxsize': self.maxsize,
+            'redis': self.redis is not None
+        }
+
+
+render_cache = RenderCache()
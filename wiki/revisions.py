@@ -0,0 +1,237 @@
+"""
+Compressed storage for wiki revisions.
+
+Storing the whole article on every edit makes ``wiki_revisions`` mostly
+duplicate text, since long guides collect hundreds of small edits. Each
+revision is instead stored zlib-compressed as one of:
+
+- a snapshot: the full text;
+- a delta: the line ranges copied from the article's previous revision,
+  plus the inserted lines.
+
+A snapshot is written at least every ``WIKI_SNAPSHOT_INTERVAL`` revisions,
+or sooner when a delta would be no smaller than the compressed text.
+Reading any revision is therefore one range query for at most that many
+rows, then at most interval - 1 delta applications. Every row keeps a sha1
+of its text, which is checked after reconstruction.
+
+Rows written before this scheme keep their text in ``content`` and act as
+snapshots; ``compress_history`` (``manage.py compress-wiki-revisions``)
+converts them.
+"""
+
+import hashlib
+import json
+import logging
+import zlib
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence
+
+from flask import current_app
+
+from models import WikiArticle, WikiRevision, db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_INTERVAL = 20
+COMPRESSION_LEVEL = 9
+
+
+class RevisionError(Exception):
+    """A revision whose stored text cannot be reconstructed"""
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _lines(text: str) -> List[str]:
+    return text.splitlines(keepends=True)
+
+
+def encode_snapshot(text: str) -> bytes:
+    return zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def encode_delta(old: str, new: str) -> bytes:
+    """Delta from ``old`` to ``new``: [start, end] copies old lines, strings are inserted"""
+    old_lines, new_lines = _lines(old), _lines(new)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new_lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def apply_delta(old: str, data: bytes) -> str:
+    old_lines = _lines(old)
+    return ''.join(
+        ''.join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in json.loads(zlib.decompress(data).decode('utf-8'))
+    )
+
+
+def encode(text: str, previous: Optional[str], previous_depth: Optional[int], interval: int) -> Dict:
+    """Storage columns for ``text`` following a revision at ``previous_depth``"""
+    snapshot = encode_snapshot(text)
+    values = {
+        'content': None, 'is_snapshot': True, 'chain_depth': 0, 'data': snapshot,
+        'content_length': len(text.encode('utf-8')), 'content_hash': _hash(text)
+    }
+    if previous is not None and previous_depth + 1 < interval:
+        delta = encode_delta(previous, text)
+        if len(delta) < len(snapshot):
+            values.update(is_snapshot=False, chain_depth=previous_depth + 1, data=delta)
+    return values
+
+
+def delta_depth(row) -> int:
+    """Deltas to apply after the nearest snapshot to read ``row``"""
+    # Uncompressed rows hold their full text, like snapshots
+    return 0 if row.content is not None or row.is_snapshot else row.chain_depth
+
+
+def _decode(row, previous: Optional[str]) -> str:
+    """Text of ``row`` given the text of the article's previous revision"""
+    if row.content is not None:
+        text = row.content
+    elif row.is_snapshot:
+        text = zlib.decompress(row.data).decode('utf-8')
+    elif previous is None:
+        raise RevisionError(f"Revision {row.id}: delta without a base snapshot")
+    else:
+        text = apply_delta(previous, row.data)
+    if row.content_hash and _hash(text) != row.content_hash:
+        raise RevisionError(f"Revision {row.id}: checksum mismatch")
+    return text
+
+
+def _decode_chain(rows: Sequence) -> str:
+    """Text of the last row; ``rows`` run oldest first from a snapshot"""
+    text = None
+    for row in rows:
+        text = _decode(row, text)
+    return text
+
+
+def _chain(revision: WikiRevision, for_update: bool = False) -> List[WikiRevision]:
+    if delta_depth(revision) == 0:
+        return [revision]
+    query = WikiRevision.query.filter(
+        WikiRevision.article_id == revision.article_id,
+        WikiRevision.id <= revision.id
+    ).order_by(WikiRevision.id.desc()).limit(revision.chain_depth + 1)
+    if for_update:
+        query = query.with_for_update().populate_existing()
+    return list(reversed(query.all()))
+
+
+def revision_content(revision: WikiRevision) -> str:
+    """Full text of a revision"""
+    return _decode_chain(_chain(revision))
+
+
+def add_revision(article: WikiArticle, content: str, author_id: int,
+                 change_summary: Optional[str] = None, interval: Optional[int] = None) -> WikiRevision:
+    """Append a revision holding ``content``; the caller commits
+
+    The article row is locked so concurrent edits of one article chain
+    their deltas one after the other. The previous revision and its chain
+    are read with locking reads too: under REPEATABLE READ (InnoDB) a
+    plain SELECT would use the snapshot taken before the lock and could
+    miss a revision committed in between, encoding the delta against the
+    wrong base.
+    """
+    if interval is None:
+        interval = current_app.config.get('WIKI_SNAPSHOT_INTERVAL', DEFAULT_SNAPSHOT_INTERVAL)
+    if article.id is not None:
+        db.session.query(WikiArticle.id).filter(WikiArticle.id == article.id).with_for_update().one()
+
+    previous = WikiRevision.query.filter(WikiRevision.article_id == article.id).order_by(
+        WikiRevision.id.desc()
+    ).with_for_update().populate_existing().first() if article.id is not None else None
+    values = encode(
+        content,
+        _decode_chain(_chain(previous, for_update=True)) if previous is not None else None,
+        delta_depth(previous) if previous is not None else None,
+        max(interval, 1)
+    )
+    revision = WikiRevision(article=article, created_by=author_id, change_summary=change_summary, **values)
+    db.session.add(revision)
+    return revision
+
+
+def compress_history(article_id: int, interval: int = DEFAULT_SNAPSHOT_INTERVAL) -> Dict[str, int]:
+    """Re-encode every revision of an article; returns bytes before and after
+
+    Each re-encoded revision is decoded again and compared with the original
+    text before anything is written. The article row and its revisions are
+    locked, as in ``add_revision``, so an edit cannot append a delta whose
+    base is being rewritten.
+    """
+    db.session.query(WikiArticle.id).filter(WikiArticle.id == article_id).with_for_update().one()
+    rows = WikiRevision.query.filter(WikiRevision.article_id == article_id).order_by(
+        WikiRevision.id
+    ).with_for_update().populate_existing().all()
+    stats = {'revisions': 0, 'bytes_before': 0, 'bytes_after': 0}
+    updates = []
+    previous_text, previous_depth = None, None
+    for row in rows:
+        stats['bytes_before'] += len(row.data) if row.content is None else len(row.content.encode('utf-8'))
+        text = _decode(row, previous_text)
+
+        values = encode(text, previous_text, previous_depth, interval)
+        if values['is_snapshot']:
+            check = zlib.decompress(values['data']).decode('utf-8')
+        else:
+            check = apply_delta(previous_text, values['data'])
+        if check != text:
+            raise RevisionError(f"Revision {row.id}: re-encoding does not round-trip")
+
+        updates.append(dict(values, id=row.id))
+        stats['revisions'] += 1
+        stats['bytes_after'] += len(values['data'])
+        previous_text, previous_depth = text, values['chain_depth']
+
+    if updates:
+        db.session.execute(db.update(WikiRevision), updates)
+    return stats
+
+
+def compress_all(interval: int = DEFAULT_SNAPSHOT_INTERVAL, article_id: Optional[int] = None) -> Dict[str, int]:
+    """Run ``compress_history`` on every article, one transaction each"""
+    query = db.session.query(WikiRevision.article_id).distinct().order_by(WikiRevision.article_id)
+    if article_id is not None:
+        query = query.filter(WikiRevision.article_id == article_id)
+    totals = {'articles': 0, 'revisions': 0, 'bytes_before': 0, 'bytes_after': 0}
+    for (current_id,) in query.all():
+        try:
+            stats = compress_history(current_id, interval)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        totals['articles'] += 1
+        for key, value in stats.items():
+            totals[key] += value
+    logger.info(f"Wiki revisions compressed: {totals}")
+    return totals
+
+
+def storage_stats() -> Dict[str, int]:
+    """Stored bytes against the size of the full texts, over all revisions"""
+    count, stored_text, stored_data, logical, uncompressed = db.session.query(
+        db.func.count(WikiRevision.id),
+        db.func.coalesce(db.func.sum(db.func.length(WikiRevision.content)), 0),
+        db.func.coalesce(db.func.sum(db.func.length(WikiRevision.data)), 0),
+        db.func.coalesce(db.func.sum(WikiRevision.content_length), 0),
+        db.func.count(WikiRevision.content)
+    ).one()
+    return {
+        'revisions': count,
+        'uncompressed_revisions': uncompressed,
+        'stored_bytes': int(stored_text) + int(stored_data),
+        'text_bytes': int(stored_text) + int(logical)
+    }
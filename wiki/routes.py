@@ -0,0 +1,279 @@
+from flask import Blueprint, request, jsonify
+from models import WikiArticle, WikiRevision, User, db
+from utils import token_required, get_pagination_params, has_permission, admin_required
+from wiki.articles import ArticleError, create_article, update_article
+from wiki.revisions import RevisionError, revision_content
+from wiki.render import render_cache
+from wiki import links, search
+import logging
+
+wiki_bp = Blueprint('wiki', __name__)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+
+def _readable_article(current_user, slug):
+    article = WikiArticle.query.filter_by(slug=slug).first()
+    if article is None or (not article.is_published and not has_permission(current_user, 'write_wiki')):
+        return None
+    return article
+
+def _serialize_article(article, include_content=False):
+    data = {
+        'id': article.id,
+        'title': article.title,
+        'slug': article.slug,
+        'category': article.category,
+        'tags': article.tags or [],
+        'meta_description': article.meta_description,
+        'featured_image': article.featured_image,
+        'is_published': article.is_published,
+        'is_featured': article.is_featured,
+        'created_by': article.created_by,
+        'created_at': article.created_at.isoformat(),
+        'updated_at': article.updated_at.isoformat() if article.updated_at else None
+    }
+    if include_content:
+        data['content'] = article.content
+    return data
+
+@wiki_bp.route('/articles/<slug>', methods=['GET'])
+@token_required
+def get_article(current_user, slug):
+    """Get an article with its rendered HTML and table of contents"""
+    try:
+        article = _readable_article(current_user, slug)
+        if article is None:
+            return jsonify({'message': 'Article not found'}), 404
+        
+        data = _serialize_article(article, include_content=True)
+        data.update(render_cache.get(article))
+        return jsonify(data)
+    except Exception as e:
+        logger.error(f"Error fetching wiki article: {str(e)}")
+        return jsonify({'message': 'Error fetching wiki article'}), 500
+
+@wiki_bp.route('/search', methods=['GET'])
+@token_required
+def search_wiki(current_user):
+    """Search and browse articles, with tag and category facets
+    
+    ``q`` is an optional full-text query; ``tag`` (repeatable or
+    comma-separated) keeps articles carrying every given tag and
+    ``category`` narrows to one category. Without ``q``, featured articles
+    come first, then the most recently updated.
+    """
+    try:
+        tags = [tag for value in request.args.getlist('tag') for tag in value.split(',')]
+        limit = min(max(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), 1), MAX_SEARCH_LIMIT)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        results = search.search(
+            (request.args.get('q') or '').strip(), tags, request.args.get('category') or None,
+            include_unpublished=has_permission(current_user, 'write_wiki'), limit=limit, offset=offset
+        )
+        results['has_more'] = offset + len(results['articles']) < results['total']
+        return jsonify(results)
+    except Exception as e:
+        logger.error(f"Error searching wiki: {str(e)}")
+        return jsonify({'message': 'Error searching wiki'}), 500
+
+@wiki_bp.route('/articles', methods=['POST'])
+@token_required
+def create_wiki_article(current_user):
+    """Create an article (write_wiki)"""
+    try:
+        if not has_permission(current_user, 'write_wiki'):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        
+        try:
+            article = create_article(request.get_json(silent=True) or {}, current_user.id)
+        except ArticleError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        return jsonify({'message': 'Article created successfully', 'article_id': article.id, 'slug': article.slug}), 201
+    except Exception as e:
+        logger.error(f"Error creating wiki article: {str(e)}")
+        return jsonify({'message': 'Error creating wiki article'}), 500
+
+@wiki_bp.route('/articles/<slug>', methods=['PUT'])
+@token_required
+def update_wiki_article(current_user, slug):
+    """Edit an article (write_wiki); a content change records a revision"""
+    try:
+        if not has_permission(current_user, 'write_wiki'):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        article = WikiArticle.query.filter_by(slug=slug).first()
+        if article is None:
+            return jsonify({'message': 'Article not found'}), 404
+        
+        try:
+            revision = update_article(article, request.get_json(silent=True) or {}, current_user.id)
+        except ArticleError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        # Links still pointing at the old slug are now broken; report them rather than fail silently
+        broken_backlinks = links.backlink_count(slug) if article.slug != slug else 0
+        return jsonify({
+            'message': 'Article updated successfully',
+            'slug': article.slug,
+            'revision_id': revision.id if revision else None,
+            'broken_backlinks': broken_backlinks
+        })
+    except Exception as e:
+        logger.error(f"Error updating wiki article: {str(e)}")
+        return jsonify({'message': 'Error updating wiki article'}), 500
+
+@wiki_bp.route('/articles/<slug>/revisions', methods=['GET'])
+@token_required
+def get_article_revisions(current_user, slug):
+    """Get an article's history, newest first (metadata only)"""
+    try:
+        article = _readable_article(current_user, slug)
+        if article is None:
+            return jsonify({'message': 'Article not found'}), 404
+        
+        params = get_pagination_params(request)
+        pagination = db.session.query(
+            WikiRevision.id, WikiRevision.change_summary, WikiRevision.content_length,
+            WikiRevision.created_at, User.id.label('author_id'), User.username
+        ).outerjoin(User, User.id == WikiRevision.created_by).filter(
+            WikiRevision.article_id == article.id
+        ).order_by(WikiRevision.id.desc()).paginate(page=params['page'], per_page=params['per_page'], error_out=False)
+        
+        return jsonify({
+            'revisions': [{
+                'id': row.id,
+                'change_summary': row.change_summary,
+                'content_length': row.content_length,
+                'author': {'id': row.author_id, 'username': row.username},
+                'created_at': row.created_at.isoformat()
+            } for row in pagination.items],
+            'pagination': {
+                'page': pagination.page,
+                'per_page': pagination.per_page,
+                'total': pagination.total,
+                'pages': pagination.pages
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error fetching wiki revisions: {str(e)}")
+        return jsonify({'message': 'Error fetching wiki revisions'}), 500
+
+@wiki_bp.route('/articles/<slug>/revisions/<int:revision_id>', methods=['GET'])
+@token_required
+def get_article_revision(current_user, slug, revision_id):
+    """Get the full text of one revision"""
+    try:
+        article = _readable_article(current_user, slug)
+        revision = WikiRevision.query.get(revision_id) if article is not None else None
+        if revision is None or revision.article_id != article.id:
+            return jsonify({'message': 'Revision not found'}), 404
+        
+        try:
+            content = revision_content(revision)
+        except RevisionError as e:
+            logger.error(f"Corrupt wiki revision {revision_id}: {str(e)}")
+            return jsonify({'message': 'Revision cannot be read'}), 500
+        
+        return jsonify({
+            'id': revision.id,
+            'article_id': article.id,
+            'change_summary': revision.change_summary,
+            'created_by': revision.created_by,
+            'created_at': revision.created_at.isoformat(),
+            'content': content
+        })
+    except Exception as e:
+        logger.error(f"Error fetching wiki revision: {str(e)}")
+        return jsonify({'message': 'Error fetching wiki revision'}), 500
+
+@wiki_bp.route('/articles/<slug>/backlinks', methods=['GET'])
+@token_required
+def get_article_backlinks(current_user, slug):
+    """Get the articles linking to this one ("what links here")"""
+    try:
+        article = _readable_article(current_user, slug)
+        if article is None:
+            return jsonify({'message': 'Article not found'}), 404
+        
+        params = get_pagination_params(request)
+        pagination = links.backlinks(slug, include_unpublished=has_permission(current_user, 'write_wiki')).paginate(
+            page=params['page'], per_page=params['per_page'], error_out=False
+        )
+        
+        return jsonify({
+            'backlinks': [_serialize_article(source) for source in pagination.items],
+            'pagination': {
+                'page': pagination.page,
+                'per_page': pagination.per_page,
+                'total': pagination.total,
+                'pages': pagination.pages
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error fetching wiki backlinks: {str(e)}")
+        return jsonify({'message': 'Error fetching wiki backlinks'}), 500
+
+@wiki_bp.route('/links/orphans', methods=['GET'])
+@token_required
+def get_orphan_articles(current_user):
+    """Get articles no other article links to (write_wiki)"""
+    try:
+        if not has_permission(current_user, 'write_wiki'):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        
+        params = get_pagination_params(request)
+        pagination = links.orphans().paginate(page=params['page'], per_page=params['per_page'], error_out=False)
+        
+        return jsonify({
+            'articles': [_serialize_article(article) for article in pagination.items],
+            'pagination': {
+                'page': pagination.page,
+                'per_page': pagination.per_page,
+                'total': pagination.total,
+                'pages': pagination.pages
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error fetching orphan wiki articles: {str(e)}")
+        return jsonify({'message': 'Error fetching orphan wiki articles'}), 500
+
+@wiki_bp.route('/links/broken', methods=['GET'])
+@token_required
+def get_broken_links(current_user):
+    """Get links to slugs no article has (write_wiki)"""
+    try:
+        if not has_permission(current_user, 'write_wiki'):
+            return jsonify({'message': 'Insufficient permissions'}), 403
+        
+        params = get_pagination_params(request)
+        pagination = links.broken_links().paginate(page=params['page'], per_page=params['per_page'], error_out=False)
+        
+        return jsonify({
+            'broken_links': [{
+                'target_slug': target_slug,
+                'source': {'id': source.id, 'title': source.title, 'slug': source.slug}
+            } for source, target_slug in pagination.items],
+            'pagination': {
+                'page': pagination.page,
+                'per_page': pagination.per_page,
+                'total': pagination.total,
+                'pages': pagination.pages
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error fetching broken wiki links: {str(e)}")
+        return jsonify({'message': 'Error fetching broken wiki links'}), 500
+
+@wiki_bp.route('/render-cache', methods=['GET'])
+@token_required
+@admin_required
+def get_render_cache_stats(current_user):
+    """Get render cache hit/miss metrics"""
+    try:
+        return jsonify(render_cache.stats())
+    except Exception as e:
+        logger.error(f"Error fetching render cache stats: {str(e)}")
+        return jsonify({'message': 'Error fetching render cache stats'}), 500
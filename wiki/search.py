@@ -0,0 +1,248 @@
+"""
+Wiki search and tag/category browsing.
+
+``WikiArticle.tags`` is a JSON column and cannot be filtered without
+reading every article, so the wiki keeps its own index:
+
+- ``wiki_article_tags``: one (tag, article) posting per tag, tags
+  normalized (lower-case, accents folded), so "articles tagged X and Y" is
+  a primary-key range scan per tag;
+- ``wiki_search_terms`` / ``wiki_search_postings``: an inverted index
+  (tokenized like the forum index in forum.search) where a term's
+  frequency is weighted by field: title x3, meta description x2, content
+  x1;
+- the ``(category, is_published)`` index on ``wiki_articles``.
+
+A search returns one page of articles ranked by BM25 (or featured first,
+then most recently updated, when there is no text query), along with tag
+and category facet counts over every matching article. Articles are
+indexed when created or edited (wiki.articles), with term document counts
+written in batches as for the forum; ``rebuild_index`` (``manage.py
+rebuild-wiki-search``) reindexes everything.
+"""
+
+import logging
+import math
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from forum.search import adjust_doc_counts, doc_count_buffer, fold, term_ids, tokenize
+from models import WikiArticle, WikiArticleTag, WikiSearchDocument, WikiSearchPosting, WikiSearchTerm, db
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+FIELD_WEIGHTS = (('title', 3), ('meta_description', 2), ('content', 1))
+MAX_TAG_LENGTH = 100
+MAX_QUERY_TERMS = 8
+MAX_FACETS = 50
+
+
+def normalize_tag(tag: Any) -> str:
+    return ' '.join(fold(str(tag)).split())[:MAX_TAG_LENGTH]
+
+
+def article_tags(article: WikiArticle) -> List[str]:
+    return sorted({normalize_tag(tag) for tag in (article.tags or []) if normalize_tag(tag)})
+
+
+def _article_terms(article: WikiArticle) -> Counter:
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for token in tokenize(getattr(article, field)):
+            counts[token] += weight
+    return counts
+
+
+# Maintenance; runs inside the caller's transaction
+
+def remove_article(article_id: int):
+    """Drop an article's postings and tags"""
+    indexed = [term_id for (term_id,) in db.session.query(WikiSearchPosting.term_id).filter(
+        WikiSearchPosting.article_id == article_id
+    )]
+    adjust_doc_counts(WikiSearchTerm, {term_id: -1 for term_id in indexed})
+    for model in (WikiSearchPosting, WikiSearchDocument, WikiArticleTag):
+        db.session.execute(
+            db.delete(model).where(model.article_id == article_id).execution_options(synchronize_session=False)
+        )
+
+
+def index_article(article: WikiArticle):
+    """(Re)index an article's text and tags"""
+    remove_article(article.id)
+    tags = article_tags(article)
+    if tags:
+        db.session.execute(db.insert(WikiArticleTag), [{'tag': tag, 'article_id': article.id} for tag in tags])
+
+    counts = _article_terms(article)
+    if not counts:
+        return
+    db.session.add(WikiSearchDocument(article_id=article.id, length=sum(counts.values())))
+    ids = term_ids(WikiSearchTerm, counts)
+    db.session.execute(db.insert(WikiSearchPosting), [
+        {'term_id': ids[term], 'article_id': article.id, 'tf': tf} for term, tf in counts.items()
+    ])
+    adjust_doc_counts(WikiSearchTerm, {term_id: 1 for term_id in ids.values()})
+
+
+def rebuild_index(chunk_size: int = 5000) -> Dict[str, int]:
+    """Reindex every article
+
+    Wiki edits must be stopped while this runs: incremental indexing adds
+    terms with autoincrement ids to the vocabulary the rebuild fills with
+    explicit ids, so a concurrent edit can fail on a duplicate key or be
+    left out. Searches return partial results until the rebuild finishes.
+    """
+    for model in (WikiSearchPosting, WikiSearchDocument, WikiSearchTerm, WikiArticleTag):
+        db.session.execute(db.delete(model))
+    db.session.commit()
+    doc_count_buffer.discard(WikiSearchTerm)
+
+    vocabulary: Dict[str, int] = {}
+    doc_counts = Counter()
+    pending = {WikiSearchDocument: [], WikiSearchPosting: [], WikiArticleTag: []}
+    totals = Counter()
+
+    def flush(force=False):
+        for model, rows in pending.items():
+            if rows and (force or len(rows) >= chunk_size):
+                db.session.execute(db.insert(model), rows)
+                totals[model.__tablename__] += len(rows)
+                rows.clear()
+
+    # Keyset pagination rather than a streaming cursor, so inserts can run in between
+    last_id = 0
+    while True:
+        articles = db.session.query(
+            WikiArticle.id, WikiArticle.title, WikiArticle.meta_description, WikiArticle.content, WikiArticle.tags
+        ).filter(WikiArticle.id > last_id).order_by(WikiArticle.id).limit(500).all()
+        if not articles:
+            break
+        for article in articles:
+            pending[WikiArticleTag].extend({'tag': tag, 'article_id': article.id} for tag in article_tags(article))
+            counts = _article_terms(article)
+            if counts:
+                pending[WikiSearchDocument].append({'article_id': article.id, 'length': sum(counts.values())})
+                for term, tf in counts.items():
+                    term_id = vocabulary.setdefault(term, len(vocabulary) + 1)
+                    doc_counts[term_id] += 1
+                    pending[WikiSearchPosting].append({'term_id': term_id, 'article_id': article.id, 'tf': tf})
+            flush()
+        last_id = articles[-1].id
+    flush(force=True)
+
+    terms = [{'id': term_id, 'term': term, 'doc_count': doc_counts[term_id]} for term, term_id in vocabulary.items()]
+    for start in range(0, len(terms), chunk_size):
+        db.session.execute(db.insert(WikiSearchTerm), terms[start:start + chunk_size])
+    db.session.commit()
+
+    totals = {
+        'articles': totals[WikiSearchDocument.__tablename__],
+        'terms': len(terms),
+        'postings': totals[WikiSearchPosting.__tablename__],
+        'tags': totals[WikiArticleTag.__tablename__]
+    }
+    logger.info(f"Wiki search index rebuilt: {totals}")
+    return totals
+
+
+# Querying
+
+def _scores(terms: List[str]):
+    """Ranked (article_id, score) query for the text terms, or None if nothing matches"""
+    found = db.session.query(WikiSearchTerm.id, WikiSearchTerm.doc_count).filter(
+        WikiSearchTerm.term.in_(terms), WikiSearchTerm.doc_count > 0
+    ).all()
+    if not found:
+        return None
+    total, average_length = db.session.query(
+        db.func.count(WikiSearchDocument.article_id), db.func.avg(WikiSearchDocument.length)
+    ).one()
+    total = max(total or 0, max(row.doc_count for row in found))
+    average_length = float(average_length or 1.0)
+    idf = {row.id: math.log(1 + (total - row.doc_count + 0.5) / (row.doc_count + 0.5)) for row in found}
+
+    tf = WikiSearchPosting.tf * 1.0
+    length_norm = K1 * (1 - B + B * WikiSearchDocument.length * (1.0 / average_length))
+    score = db.func.sum(
+        db.case(idf, value=WikiSearchPosting.term_id, else_=0.0) * tf * (K1 + 1) / (tf + length_norm)
+    ).label('score')
+    return db.session.query(WikiSearchPosting.article_id.label('article_id'), score).join(
+        WikiSearchDocument, WikiSearchDocument.article_id == WikiSearchPosting.article_id
+    ).filter(WikiSearchPosting.term_id.in_(list(idf))).group_by(WikiSearchPosting.article_id)
+
+
+def search(query: Optional[str] = None, tags: Iterable[str] = (), category: Optional[str] = None,
+           include_unpublished: bool = False, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """A page of matching articles plus tag/category facets over all matches
+
+    Articles must carry every tag in ``tags``; a text query matches
+    articles containing any of its terms, best first.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    tags = sorted({normalize_tag(tag) for tag in tags if normalize_tag(tag)})
+
+    filters = []
+    if not include_unpublished:
+        filters.append(WikiArticle.is_published.is_(True))
+    if category:
+        filters.append(WikiArticle.category == category)
+    if tags:
+        tagged = db.session.query(WikiArticleTag.article_id).filter(WikiArticleTag.tag.in_(tags)).group_by(
+            WikiArticleTag.article_id
+        ).having(db.func.count() == len(tags))
+        filters.append(WikiArticle.id.in_(tagged))
+
+    result = {'query': query or '', 'terms': terms, 'tags': tags, 'category': category}
+    if query and not terms:
+        return dict(result, total=0, articles=[], facets={'tags': [], 'categories': []})
+
+    if terms:
+        scores = _scores(terms)
+        if scores is None:
+            return dict(result, total=0, articles=[], facets={'tags': [], 'categories': []})
+        scores = scores.subquery()
+        matches = db.session.query(WikiArticle, scores.c.score).join(
+            scores, scores.c.article_id == WikiArticle.id
+        ).filter(*filters)
+        ordered = matches.order_by(scores.c.score.desc(), WikiArticle.id.desc())
+    else:
+        matches = db.session.query(WikiArticle, db.literal(None).label('score')).filter(*filters)
+        ordered = matches.order_by(WikiArticle.is_featured.desc(), WikiArticle.updated_at.desc(), WikiArticle.id.desc())
+
+    matching_ids = matches.with_entities(WikiArticle.id).subquery()
+    total = db.session.query(db.func.count()).select_from(matching_ids).scalar()
+    tag_facets = db.session.query(WikiArticleTag.tag, db.func.count().label('count')).filter(
+        WikiArticleTag.article_id.in_(db.select(matching_ids.c.id))
+    ).group_by(WikiArticleTag.tag).order_by(db.desc('count'), WikiArticleTag.tag).limit(MAX_FACETS).all()
+    category_facets = db.session.query(WikiArticle.category, db.func.count().label('count')).filter(
+        WikiArticle.id.in_(db.select(matching_ids.c.id))
+    ).group_by(WikiArticle.category).order_by(db.desc('count'), WikiArticle.category).limit(MAX_FACETS).all()
+
+    articles = []
+    for article, score in ordered.offset(offset).limit(limit).all():
+        articles.append({
+            'id': article.id,
+            'title': article.title,
+            'slug': article.slug,
+            'category': article.category,
+            'tags': article.tags or [],
+            'meta_description': article.meta_description,
+            'is_featured': article.is_featured,
+            'updated_at': article.updated_at.isoformat() if article.updated_at else None,
+            'score': round(float(score), 4) if score is not None else None
+        })
+
+    return dict(
+        result,
+        total=total,
+        articles=articles,
+        facets={
+            'tags': [{'tag': tag, 'count': count} for tag, count in tag_facets],
+            'categories': [{'category': name, 'count': count} for name, count in category_facets]
+        }
+    )